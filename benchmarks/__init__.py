@@ -0,0 +1,6 @@
+"""
+Benchmarks for the sitelog service layer, CLI and reports.
+
+    python -m benchmarks.run --scale small --scale medium -o before.json
+    python -m benchmarks.compare before.json after.json
+"""
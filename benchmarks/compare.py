@@ -0,0 +1,45 @@
+"""
+Compares two benchmark result files, e.g. from before and after a change.
+"""
+import json
+
+import click
+
+
+def _load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {(r["scale"], r["group"], r["name"]): r for r in report["results"]}
+
+@click.command()
+@click.argument('before', type=click.Path(exists=True, dir_okay=False))
+@click.argument('after', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', type=float, default=0.2, show_default=True,
+              help="Flag medians that grew by more than this fraction")
+@click.option('--fail', is_flag=True, help="Exit with status 1 if anything regressed")
+def main(before, after, threshold, fail):
+    """Show the median time of every benchmark in BEFORE and AFTER side by side."""
+    before_meta, old = _load(before)
+    after_meta, new = _load(after)
+    click.echo(f"before: {before_meta.get('commit')}  after: {after_meta.get('commit')}")
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        was, now = old[key]["median"], new[key]["median"]
+        change = (now - was) / was if was else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+        scale, group, name = key
+        click.echo(f"{scale:<7} {group:<9} {name:<45} {was * 1000:10.3f} -> {now * 1000:10.3f} ms  {change:+7.1%}{flag}")
+    for key in sorted(old.keys() ^ new.keys()):
+        click.echo(f"{' '.join(key)}: only in {'before' if key in old else 'after'}")
+    click.echo(f"{regressions} regression(s) over {threshold:.0%}")
+    if fail and regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Seeded generator for realistic sitelog datasets.
+
+The same seed and scale always give the same rows, so timings taken on
+different commits compare like with like.
+"""
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
+from sitelog import db
+from sitelog.changes import install_change_tracking, seed_changes
+from sitelog.models import Project, DailyLog, Worker, Task
+from sitelog.search import install_search, rebuild_search
+from sitelog.stats import install_triggers, rebuild_stats
+
+# Scale name -> (projects, daily logs per project, tasks per log, workers)
+SCALES = {
+    "small": (5, 20, 5, 20),
+    "medium": (20, 100, 10, 100),
+    "large": (50, 200, 20, 400),
+}
+
+TRADES = ("carpenter", "electrician", "plumber", "mason", "labourer", "welder", "painter", "roofer")
+WEATHER = ("sunny", "overcast", "light rain", "heavy rain", "windy", "frost", "snow")
+WORDS = (
+    "concrete", "pour", "slab", "formwork", "rebar", "scaffold", "drywall", "conduit",
+    "trench", "backfill", "inspection", "roof", "cladding", "brickwork", "steel", "crane",
+    "delivery", "east", "west", "north", "south", "level", "stair", "core", "facade",
+)
+STATUSES = ("completed", "completed", "completed", "pending", "in progress")
+START = date(2023, 1, 2)
+BATCH_SIZE = 5000
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _insert(conn, model, rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(model), rows[i:i + BATCH_SIZE])
+
+def generate(url, projects, logs_per_project, tasks_per_log, workers, seed=0):
+    """
+    Fills the empty database at url (it is created if missing) and returns
+    the row counts. The summary, search and change triggers are dropped
+    while rows go in and rebuilt once at the end, which is much faster than
+    firing them per row and leaves the same result.
+    """
+    rng = random.Random(seed)
+    db.configure(url)
+    engine = db.get_engine()
+    counts = {}
+    with engine.begin() as conn:
+        triggers = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars().all()
+        for name in triggers:
+            conn.execute(text(f"DROP TRIGGER {name}"))
+
+        rows = [
+            {"id": i, "name": f"Worker {i}", "trade": rng.choice(TRADES), "contact": f"07{rng.randrange(10**9):09d}"}
+            for i in range(1, workers + 1)
+        ]
+        _insert(conn, Worker, rows)
+        counts["workers"] = len(rows)
+
+        project_rows, log_rows, task_rows = [], [], []
+        log_id = task_id = 0
+        for project_id in range(1, projects + 1):
+            start = START + timedelta(days=rng.randrange(365))
+            # Logs are kept on working days, with the odd day missed
+            days = sorted(rng.sample(range(logs_per_project * 2), logs_per_project))
+            project_rows.append({
+                "id": project_id, "name": f"Project {project_id}", "location": f"Site {rng.randrange(1000)}",
+                "start_date": start, "end_date": start + timedelta(days=days[-1] + 30),
+            })
+            for day in days:
+                log_id += 1
+                log_rows.append({
+                    "id": log_id, "date": start + timedelta(days=day), "weather": rng.choice(WEATHER),
+                    "summary": _sentence(rng, 12), "project_id": project_id,
+                })
+                for _ in range(tasks_per_log):
+                    task_id += 1
+                    task_rows.append({
+                        "id": task_id, "description": _sentence(rng, 5), "hours": rng.randint(1, 10),
+                        "status": rng.choice(STATUSES), "log_id": log_id, "worker_id": rng.randint(1, workers),
+                    })
+        _insert(conn, Project, project_rows)
+        _insert(conn, DailyLog, log_rows)
+        _insert(conn, Task, task_rows)
+        counts.update(projects=len(project_rows), daily_logs=len(log_rows), tasks=len(task_rows))
+
+        install_triggers(conn)
+        install_search(conn)
+        install_change_tracking(conn)
+        rebuild_stats(conn)
+        rebuild_search(conn)
+        seed_changes(conn)
+        conn.execute(text("ANALYZE"))
+    return counts
+
+def generate_scale(url, scale, seed=0):
+    return generate(url, *SCALES[scale], seed=seed)
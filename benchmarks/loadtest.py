@@ -0,0 +1,169 @@
+"""
+Load test for the HTTP API: starts `serve` on a generated dataset in its own
+process, drives it from concurrent keep-alive clients for a while, and
+reports requests per second and latency percentiles per kind of request.
+
+    python -m benchmarks.loadtest --clients 16 --threads 8 --duration 10
+"""
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import click
+
+from benchmarks.datagen import SCALES, generate_scale
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class Client(threading.Thread):
+    """One keep-alive connection sending a seeded mix of reads and writes."""
+    def __init__(self, port, counts, seed, deadline, write_ratio, batch):
+        super().__init__(daemon=True)
+        self.port = port
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.deadline = deadline
+        self.write_ratio = write_ratio
+        self.batch = batch
+        self.latencies = {}  # kind -> [seconds]
+        self.errors = 0
+
+    def _next_request(self):
+        pick = self.rng.random()
+        if pick < self.write_ratio:
+            task = {"description": "load test", "hours": self.rng.randint(1, 10), "status": "pending",
+                    "log_id": self.rng.randint(1, self.counts["daily_logs"]),
+                    "worker_id": self.rng.randint(1, self.counts["workers"])}
+            if self.batch > 1:
+                requests = [{"method": "POST", "path": "/tasks", "body": task} for _ in range(self.batch)]
+                return f"batch of {self.batch} creates", "POST", "/batch", requests
+            return "create task", "POST", "/tasks", task
+        pick = self.rng.random()
+        project = self.rng.randint(1, self.counts["projects"])
+        if pick < 0.4:
+            return "get project", "GET", f"/projects/{project}", None
+        if pick < 0.6:
+            return "get task", "GET", f"/tasks/{self.rng.randint(1, self.counts['tasks'])}", None
+        if pick < 0.8:
+            return "list project tasks", "GET", f"/tasks?project_id={project}&limit=50", None
+        if pick < 0.95:
+            return "list project logs", "GET", f"/daily-logs?project_id={project}&limit=20", None
+        return "hours report", "GET", f"/reports/hours?by=worker&project={project}", None
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        while time.perf_counter() < self.deadline:
+            kind, method, path, body = self._next_request()
+            data = json.dumps(body).encode() if body is not None else None
+            headers = {"Content-Type": "application/json"} if data else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            elapsed = time.perf_counter() - start
+            if ok:
+                self.latencies.setdefault(kind, []).append(elapsed)
+            else:
+                self.errors += 1
+        conn.close()
+
+
+def start_server(url, threads, single_writer=False):
+    """Starts `serve` on a free port. Returns (process, port)."""
+    env = dict(os.environ, SITELOG_DB_URL=url)
+    args = ["serve", "--port", "0", "--threads", str(threads)] + (["--single-writer"] if single_writer else [])
+    process = subprocess.Popen([sys.executable, "-m", "sitelog.cli", *args],
+                               cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # "Serving on http://127.0.0.1:PORT ..."
+    if not line.startswith("Serving on"):
+        process.kill()
+        raise click.ClickException(f"serve did not start: {line!r}")
+    return process, int(line.split()[2].rsplit(":", 1)[1])
+
+def summarize(latencies, seconds):
+    """Requests/s and p50/p95/p99 in ms for a list of latencies."""
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / seconds,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+@click.command()
+@click.option('--scale', type=click.Choice(list(SCALES)), default="medium", show_default=True,
+              help="Size of the generated dataset")
+@click.option('--clients', type=int, default=16, show_default=True, help="Concurrent client connections")
+@click.option('--threads', type=int, default=8, show_default=True, help="Server worker threads")
+@click.option('--duration', type=float, default=10, show_default=True, help="Seconds to run for")
+@click.option('--write-ratio', type=float, default=0.1, show_default=True, help="Fraction of requests that write")
+@click.option('--batch', type=int, default=1, show_default=True,
+              help="Send writes as /batch requests of this many creates")
+@click.option('--single-writer', is_flag=True, help="Run serve with --single-writer (group commit)")
+@click.option('--seed', type=int, default=0, show_default=True, help="Seed for the data and the request mix")
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help="Also write the results to this JSON file")
+def main(scale, clients, threads, duration, write_ratio, batch, single_writer, seed, output):
+    """Measure the HTTP API's throughput and tail latency under concurrent clients."""
+    with tempfile.TemporaryDirectory(prefix="sitelog-load-") as directory:
+        url = f"sqlite:///{Path(directory) / 'load.db'}"
+        counts = generate_scale(url, scale, seed)
+        click.echo(f"{scale}: {counts}", err=True)
+        process, port = start_server(url, threads, single_writer)
+        try:
+            deadline = time.perf_counter() + duration
+            started = time.perf_counter()
+            workers = [Client(port, counts, seed + i, deadline, write_ratio, batch) for i in range(clients)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait()
+
+    by_kind = {}
+    for worker in workers:
+        for kind, latencies in worker.latencies.items():
+            by_kind.setdefault(kind, []).extend(latencies)
+    everything = [latency for latencies in by_kind.values() for latency in latencies]
+    errors = sum(worker.errors for worker in workers)
+    results = {
+        "scale": scale, "clients": clients, "threads": threads, "duration": seconds,
+        "write_ratio": write_ratio, "batch": batch, "single_writer": single_writer, "errors": errors,
+        "total": summarize(everything, seconds),
+        "by_kind": {kind: summarize(latencies, seconds) for kind, latencies in sorted(by_kind.items())},
+    }
+    click.echo(f"{'request':<28} {'count':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, r in [*results["by_kind"].items(), ("all", results["total"])]:
+        click.echo(f"{kind:<28} {r['requests']:>8} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} "
+                   f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+    click.echo(f"errors: {errors}")
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares the read paths: ORM objects from sitelog.services against the
+named tuple records from sitelog.records, listing every task of a generated
+dataset. Reports rows per second, and the memory the listed rows hold on to
+and peak while listing, measured with tracemalloc in separate runs.
+
+    python -m benchmarks.records --scale large
+"""
+import gc
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+from benchmarks.datagen import SCALES, generate_scale
+from sitelog import records, services
+
+READS = {
+    "tasks, ORM": services.list_tasks,
+    "tasks, records": records.list_tasks,
+    "task details, ORM": services.list_task_details,
+    "task details, records": records.list_task_details,
+    "daily logs, ORM": services.list_daily_logs,
+    "daily logs, records": records.list_daily_logs,
+}
+
+
+def _throughput(read, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rows = read()
+        timings.append(time.perf_counter() - start)
+        del rows
+    return statistics.median(timings), len(read())
+
+def _memory(read):
+    """(bytes the result holds, peak bytes while reading), tracemalloc's view."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        rows = read()
+        gc.collect()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del rows
+    return held, peak
+
+
+@click.command()
+@click.option('--scale', type=click.Choice(list(SCALES)), default="large", show_default=True,
+              help="Size of the generated dataset")
+@click.option('--repeat', type=int, default=3, show_default=True, help="Timings taken per read")
+@click.option('--seed', type=int, default=0, show_default=True, help="Seed for the generated data")
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help="Also write the results to this JSON file")
+def main(scale, repeat, seed, output):
+    """Measure ORM objects against records for listing whole tables."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="sitelog-records-") as directory:
+        counts = generate_scale(f"sqlite:///{Path(directory) / 'records.db'}", scale, seed)
+        click.echo(f"{scale}: {counts}", err=True)
+        click.echo(f"{'read':<24} {'rows':>8} {'seconds':>8} {'rows/s':>10} {'held MB':>8} {'B/row':>6} {'peak MB':>8}")
+        for name, read in READS.items():
+            seconds, rows = _throughput(read, repeat)
+            held, peak = _memory(read)
+            results.append({"read": name, "rows": rows, "seconds": seconds, "rows_per_second": rows / seconds,
+                            "held_bytes": held, "peak_bytes": peak})
+            click.echo(f"{name:<24} {rows:>8} {seconds:>8.2f} {rows / seconds:>10,.0f} {held / 1e6:>8.1f} "
+                       f"{held / max(rows, 1):>6.0f} {peak / 1e6:>8.1f}")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"scale": scale, "counts": counts, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
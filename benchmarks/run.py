@@ -0,0 +1,500 @@
+"""
+Times every service function, the show-* commands, the reports and CLI
+start-up against generated datasets, and writes the results as JSON.
+"""
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import click
+import sqlalchemy
+from click.testing import CliRunner
+
+from benchmarks.datagen import SCALES, generate_scale
+from sitelog import analytics, db, records, services
+from sitelog.cli import cli
+from sitelog.export import export
+from sitelog.reports import hours_report, day_stats
+from sitelog.search import search
+from tests.test_startup import STARTUP_BUDGETS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (group, name) -> (function, setup, calls per timing)
+BENCHMARKS = {}
+
+
+def benchmark(group, name, setup=None, number=1):
+    """
+    Registers fn(ctx, arg) as a benchmark. setup(ctx), when given, runs
+    before each timing and its result is passed as arg. The reported time is
+    per call: number calls are timed together and divided.
+    """
+    def register(fn):
+        BENCHMARKS[group, name] = (fn, setup, number)
+        return fn
+    return register
+
+
+class Context:
+    """The generated dataset's sizes plus a seeded RNG for picking rows."""
+    def __init__(self, url, counts, seed):
+        self.url = url
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.day = date(2023, 6, 1)
+
+    def pick(self, table):
+        return self.rng.randint(1, self.counts[table])
+
+
+# ---------- Services ----------
+def _new_project(ctx, arg=None):
+    return services.create_project("Bench", "Nowhere", date(2024, 1, 1), date(2024, 12, 31)).id
+
+def _new_log(ctx, arg=None):
+    return services.create_daily_log(ctx.day, "sunny", "bench log", ctx.pick("projects")).id
+
+def _new_worker(ctx, arg=None):
+    return services.create_worker("Bench", "carpenter", "000").id
+
+def _new_task(ctx, arg=None):
+    return services.create_task("bench task", 4, "pending", ctx.pick("daily_logs"), ctx.pick("workers")).id
+
+benchmark("services", "create_project", number=20)(_new_project)
+benchmark("services", "create_daily_log", number=20)(_new_log)
+benchmark("services", "create_worker", number=20)(_new_worker)
+benchmark("services", "create_task", number=20)(_new_task)
+
+@benchmark("services", "get_project", number=100)
+def _(ctx, arg):
+    services.get_project(ctx.pick("projects"))
+
+@benchmark("services", "get_daily_log", number=100)
+def _(ctx, arg):
+    services.get_daily_log(ctx.pick("daily_logs"))
+
+@benchmark("services", "get_worker", number=100)
+def _(ctx, arg):
+    services.get_worker(ctx.pick("workers"))
+
+@benchmark("services", "get_task", number=100)
+def _(ctx, arg):
+    services.get_task(ctx.pick("tasks"))
+
+@benchmark("services", "update_project", number=20)
+def _(ctx, arg):
+    services.update_project(ctx.pick("projects"), location=f"Site {ctx.rng.randrange(1000)}")
+
+@benchmark("services", "update_daily_log", number=20)
+def _(ctx, arg):
+    services.update_daily_log(ctx.pick("daily_logs"), weather=ctx.rng.choice(("sunny", "windy")))
+
+@benchmark("services", "update_worker", number=20)
+def _(ctx, arg):
+    services.update_worker(ctx.pick("workers"), contact=f"07{ctx.rng.randrange(10**9):09d}")
+
+@benchmark("services", "update_task", number=20)
+def _(ctx, arg):
+    services.update_task(ctx.pick("tasks"), status=ctx.rng.choice(("completed", "pending")))
+
+@benchmark("services", "delete_project", setup=_new_project)
+def _(ctx, project_id):
+    services.delete_project(project_id)
+
+@benchmark("services", "delete_daily_log", setup=_new_log)
+def _(ctx, log_id):
+    services.delete_daily_log(log_id)
+
+@benchmark("services", "delete_worker", setup=_new_worker)
+def _(ctx, worker_id):
+    services.delete_worker(worker_id)
+
+@benchmark("services", "delete_task", setup=_new_task)
+def _(ctx, task_id):
+    services.delete_task(task_id)
+
+@benchmark("services", "unit_of_work (log + 10 tasks)", number=5)
+def _(ctx, arg):
+    with services.unit_of_work():
+        log_id = _new_log(ctx)
+        for _ in range(10):
+            services.create_task("bench task", 2, "pending", log_id, ctx.pick("workers"))
+
+@benchmark("services", "list_projects")
+def _(ctx, arg):
+    services.list_projects()
+
+@benchmark("services", "list_workers")
+def _(ctx, arg):
+    services.list_workers()
+
+@benchmark("services", "list_daily_logs")
+def _(ctx, arg):
+    services.list_daily_logs()
+
+@benchmark("services", "list_daily_logs (page of 500 after a date)")
+def _(ctx, arg):
+    services.list_daily_logs(after=ctx.day, limit=500)
+
+@benchmark("services", "list_tasks")
+def _(ctx, arg):
+    services.list_tasks()
+
+@benchmark("services", "list_tasks (page of 500)")
+def _(ctx, arg):
+    services.list_tasks(after=ctx.counts["tasks"] // 2, limit=500)
+
+@benchmark("services", "list_task_details (page of 500)")
+def _(ctx, arg):
+    services.list_task_details(after=ctx.counts["tasks"] // 2, limit=500)
+
+@benchmark("services", "records.list_tasks")
+def _(ctx, arg):
+    records.list_tasks()
+
+@benchmark("services", "records.list_task_details (page of 500)")
+def _(ctx, arg):
+    records.list_task_details(after=ctx.counts["tasks"] // 2, limit=500)
+
+# A month of one project: the full scan filters every row in Python, the
+# service filters in SQL
+def _project_month(ctx):
+    project_id = ctx.pick("projects")
+    first = services.list_daily_logs(limit=1, project_id=project_id)
+    start = first[0].date if first else ctx.day
+    return project_id, start, start + timedelta(days=30)
+
+@benchmark("services", "logs of a project month, full scan", setup=_project_month)
+def _(ctx, arg):
+    project_id, start, end = arg
+    [log for log in services.iter_daily_logs() if log.project_id == project_id and start <= log.date <= end]
+
+@benchmark("services", "list_daily_logs (project, month)", setup=_project_month)
+def _(ctx, arg):
+    project_id, start, end = arg
+    services.list_daily_logs(project_id=project_id, start=start, end=end)
+
+@benchmark("services", "tasks of a project month, full scan", setup=_project_month)
+def _(ctx, arg):
+    project_id, start, end = arg
+    [task for task in services.iter_task_details()
+     if task.log.project_id == project_id and start <= task.log.date <= end]
+
+@benchmark("services", "list_task_details (project, month)", setup=_project_month)
+def _(ctx, arg):
+    project_id, start, end = arg
+    services.list_task_details(project_id=project_id, start=start, end=end)
+
+@benchmark("services", "list_task_details (worker, pending)")
+def _(ctx, arg):
+    services.list_task_details(where={"worker_id": ctx.pick("workers"), "status": "pending"})
+
+
+# ---------- Reports, search and export ----------
+@benchmark("reports", "hours by project")
+def _(ctx, arg):
+    hours_report()
+
+@benchmark("reports", "hours by worker and week")
+def _(ctx, arg):
+    hours_report(("worker", "week"))
+
+@benchmark("reports", "hours by trade, one quarter, completed")
+def _(ctx, arg):
+    hours_report(("trade",), date(2023, 4, 1), date(2023, 6, 30), ["completed"])
+
+@benchmark("reports", "day_stats of a project")
+def _(ctx, arg):
+    day_stats(ctx.pick("projects"))
+
+@benchmark("reports", "search")
+def _(ctx, arg):
+    with services.session_scope() as session:
+        search(session, "concrete pour")
+
+@benchmark("reports", "export ledger (csv)")
+def _(ctx, arg):
+    with open(os.devnull, "w", newline="") as f:
+        export("ledger", f)
+
+
+# ---------- Analytics ----------
+def _snapshot(ctx):
+    return analytics.load()[0]
+
+@benchmark("analytics", "snapshot rebuild")
+def _(ctx, arg):
+    analytics.load(rebuild=True)
+
+@benchmark("analytics", "snapshot refresh, nothing new")
+def _(ctx, arg):
+    analytics.load()
+
+@benchmark("analytics", "hours by project (snapshot)", setup=_snapshot)
+def _(ctx, columns):
+    analytics.summarize(columns, ("project",))
+
+@benchmark("analytics", "hours by worker and week (snapshot)", setup=_snapshot)
+def _(ctx, columns):
+    analytics.summarize(columns, ("worker", "week"))
+
+@benchmark("analytics", "hours by trade, one quarter, completed (snapshot)", setup=_snapshot)
+def _(ctx, columns):
+    mask = columns.select(date(2023, 4, 1), date(2023, 6, 30), statuses=["completed"])
+    analytics.summarize(columns, ("trade",), mask)
+
+
+# ---------- Change feed ----------
+CHURN = 1000
+
+def _recent_cursor(ctx):
+    """A cursor CHURN changes behind the latest one, as a nightly sync would hold."""
+    from sitelog.changes import latest_seq
+    with services.session_scope() as session:
+        return max(0, latest_seq(session) - CHURN)
+
+@benchmark("changes", f"changes since a cursor ({CHURN} changes)", setup=_recent_cursor)
+def _(ctx, cursor):
+    for _ in services.iter_changes(cursor):
+        pass
+
+@benchmark("changes", "changes since 0 (everything)")
+def _(ctx, arg):
+    for _ in services.iter_changes(0):
+        pass
+
+@benchmark("changes", "full export of every table (csv)")
+def _(ctx, arg):
+    with open(os.devnull, "w", newline="") as f:
+        for entity in ("projects", "daily-logs", "workers", "tasks"):
+            export(entity, f)
+
+
+# ---------- CLI ----------
+def _invoke(*args, input=None):
+    result = CliRunner().invoke(cli, args, input=input, catch_exceptions=False)
+    if result.exit_code:
+        raise RuntimeError(f"{' '.join(args)} exited with {result.exit_code}: {result.output}")
+
+@benchmark("cli", "show-projects")
+def _(ctx, arg):
+    _invoke("show-projects")
+
+@benchmark("cli", "show-workers")
+def _(ctx, arg):
+    _invoke("show-workers")
+
+@benchmark("cli", "show-daily-logs")
+def _(ctx, arg):
+    _invoke("show-daily-logs")
+
+@benchmark("cli", "show-daily-logs --limit 500")
+def _(ctx, arg):
+    _invoke("show-daily-logs", "--limit", "500")
+
+@benchmark("cli", "show-tasks --limit 500")
+def _(ctx, arg):
+    _invoke("show-tasks", "--limit", "500")
+
+@benchmark("cli", "report hours --by worker")
+def _(ctx, arg):
+    _invoke("report", "hours", "--by", "worker")
+
+# A foreman's day of entries as one shell script: one process and one
+# transaction, where separate commands pay the startup timing each
+SCRIPT_TASKS = 40
+
+def _task_script(ctx):
+    return "".join(
+        f"add-task --description 'bench task' --hours 4 --status pending "
+        f"--log-id {ctx.pick('daily_logs')} --worker-id {ctx.pick('workers')}\n"
+        for _ in range(SCRIPT_TASKS)
+    )
+
+@benchmark("cli", f"shell script of {SCRIPT_TASKS} add-task", setup=_task_script)
+def _(ctx, script):
+    _invoke("shell", "-", input=script)
+
+
+# ---------- Async ----------
+async def _crew(ctx, rng):
+    from sitelog import async_services
+    async with async_services.unit_of_work():
+        log = await async_services.create_daily_log(ctx.day, "sunny", "crew log", rng.randint(1, ctx.counts["projects"]))
+        for _ in range(5):
+            await async_services.create_task("crew task", 3, "pending", log.id, rng.randint(1, ctx.counts["workers"]))
+
+async def _crews(ctx, count):
+    from sitelog import async_services
+    try:
+        await asyncio.gather(*(_crew(ctx, random.Random(i)) for i in range(count)))
+    finally:
+        await async_services.dispose()
+
+@benchmark("async", "50 concurrent crews (log + 5 tasks each)")
+def _(ctx, arg):
+    asyncio.run(_crews(ctx, 50))
+
+
+# ---------- Concurrent writers ----------
+WRITER_THREADS = 32
+WRITES_PER_THREAD = 10
+
+def _concurrent_creates(ctx, create):
+    """WRITER_THREADS threads each creating WRITES_PER_THREAD tasks through create()."""
+    errors = []
+
+    def crew(seed):
+        rng = random.Random(seed)
+        for _ in range(WRITES_PER_THREAD):
+            try:
+                create("crew task", 3, "pending", rng.randint(1, ctx.counts["daily_logs"]),
+                       rng.randint(1, ctx.counts["workers"]))
+            except Exception as e:
+                errors.append(e)
+    threads = [threading.Thread(target=crew, args=(i,)) for i in range(WRITER_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {WRITER_THREADS * WRITES_PER_THREAD} writes failed: {errors[0]}")
+
+@benchmark("writer", f"{WRITER_THREADS} threads x {WRITES_PER_THREAD} create_task, a commit each")
+def _(ctx, arg):
+    _concurrent_creates(ctx, services.create_task)
+
+@benchmark("writer", f"{WRITER_THREADS} threads x {WRITES_PER_THREAD} create_task, group commit")
+def _(ctx, arg):
+    from sitelog.writer import Writer
+    writer = Writer().start()
+    try:
+        _concurrent_creates(ctx, lambda *args: writer.create_task(*args).result())
+    finally:
+        writer.stop()
+
+
+# ---------- Runner ----------
+def _time(fn, setup, number, ctx, repeat):
+    timings = []
+    for _ in range(repeat):
+        arg = setup(ctx) if setup else None
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(ctx, arg)
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+def _summary(timings):
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+def run_startup(url, repeat, only=None):
+    """Times fresh `python main.py ...` processes against the database at url."""
+    env = dict(os.environ, SITELOG_DB_URL=url)
+    results = []
+    for name, budget in STARTUP_BUDGETS.items():
+        if only and not any(word in f"startup {name}" for word in only):
+            continue
+        args = ["--help"] if name == "help" else name.split()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "main.py", *args], cwd=ROOT, env=env,
+                           stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        summary = _summary(timings)
+        results.append({
+            "group": "startup", "name": name, "repeat": repeat, "number": 1, **summary,
+            "budget": budget, "within_budget": summary["median"] <= budget,
+        })
+    return results
+
+def run_scale(scale, directory, repeat, seed, only=None):
+    """Generates one scale's dataset and runs every benchmark against it."""
+    url = f"sqlite:///{Path(directory) / f'bench-{scale}.db'}"
+    start = time.perf_counter()
+    counts = generate_scale(url, scale, seed)
+    click.echo(f"{scale}: generated {counts} in {time.perf_counter() - start:.1f}s", err=True)
+    ctx = Context(url, counts, seed)
+    results = []
+    for (group, name), (fn, setup, number) in BENCHMARKS.items():
+        if only and not any(word in f"{group} {name}" for word in only):
+            continue
+        summary = _summary(_time(fn, setup, number, ctx, repeat))
+        click.echo(f"  {group:<9} {name:<45} {summary['median'] * 1000:10.3f} ms", err=True)
+        results.append({"group": group, "name": name, "repeat": repeat, "number": number, **summary})
+    for result in run_startup(url, repeat, only):
+        flag = "" if result["within_budget"] else f"  OVER BUDGET ({result['budget']}s)"
+        click.echo(f"  {'startup':<9} {result['name']:<45} {result['median'] * 1000:10.3f} ms{flag}", err=True)
+        results.append(result)
+    for result in results:
+        result["scale"] = scale
+    db.get_engine().dispose()
+    return counts, results
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@click.command()
+@click.option('--scale', 'scales', multiple=True, type=click.Choice(list(SCALES)),
+              help="Dataset size to run (repeatable, default: small and medium)")
+@click.option('--repeat', type=int, default=5, show_default=True, help="Timings taken per benchmark")
+@click.option('--seed', type=int, default=0, show_default=True, help="Seed for the generated data")
+@click.option('--profile', default=None, help="Database performance profile (default: from the settings)")
+@click.option('--only', multiple=True, help="Only run benchmarks whose group or name contains this")
+@click.option('-o', '--output', type=click.Path(dir_okay=False), default="benchmark-results.json",
+              show_default=True, help="JSON file to write the results to")
+@click.option('--check-budget', is_flag=True, help="Exit with status 1 if start-up is over budget")
+def main(scales, repeat, seed, profile, only, output, check_budget):
+    """Run the sitelog benchmarks on generated datasets and save the timings."""
+    scales = scales or ("small", "medium")
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": seed,
+            "profile": profile or db.settings.profile,
+            "datasets": {},
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="sitelog-bench-") as directory:
+        for scale in scales:
+            db.configure(profile=profile)
+            counts, results = run_scale(scale, directory, repeat, seed, only)
+            report["meta"]["datasets"][scale] = counts
+            report["results"].extend(results)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    click.echo(f"Wrote {len(report['results'])} results to {output}", err=True)
+    if check_budget and not all(r.get("within_budget", True) for r in report["results"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
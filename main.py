@@ -1,6 +1,5 @@
 from sitelog.cli import cli
-from sitelog.db import init_db
 
 if __name__ == "__main__":
-    init_db()  # Make sure tables exist before CLI runs
+    # The database schema is checked lazily the first time a command opens it
     cli()
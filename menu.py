@@ -5,17 +5,181 @@ from rich.table import Table
 from rich.prompt import Prompt, IntPrompt
 from rich.panel import Panel
 from rich import box
+from collections import OrderedDict
 from datetime import date
 
+from sitelog.records import iter_projects, iter_daily_logs, iter_workers, iter_task_details
 from sitelog.services import (
-    create_project, list_projects, update_project, delete_project,
-    create_daily_log, list_daily_logs, update_daily_log, delete_daily_log,
-    create_worker, list_workers, update_worker, delete_worker,
-    create_task, list_tasks, update_task, delete_task
+    create_project, update_project, delete_project,
+    create_daily_log, update_daily_log, delete_daily_log,
+    create_worker, update_worker, delete_worker,
+    create_task, update_task, delete_task
 )
 
 console = Console()
 
+PAGE_SIZE = 20
+PAGE_CACHE = 10  # pages a viewer keeps in memory
+
+# Set by --profile / --slow-log; see sitelog.profiling
+profiler = None
+print_profile = False
+
+
+def profile_action(label):
+    """Starts profiling a menu action: queries from now on are counted under label."""
+    if profiler is not None:
+        profiler.reset()
+        profiler.label = label
+
+def show_profile():
+    """Prints what the last menu action cost in queries, when --profile is on."""
+    if profiler is not None and print_profile and profiler.label and profiler.queries:
+        from sitelog.cache import summary
+        report = profiler.report(profiler.label)
+        if summary():
+            report += "\n" + summary()
+        console.print(Panel(report, title="Query profile", box=box.ROUNDED))
+        profiler.label = None
+
+
+class PagedView:
+    """
+    Pages through a keyset-paginated listing one query per page. Pages are
+    kept as they load, up to cache_pages of them (least recently viewed are
+    dropped first), so going back and forth doesn't hit the database again.
+    Only the cursor each page starts at is kept for every page seen.
+    """
+    def __init__(self, fetch, key, page_size=PAGE_SIZE, cache_pages=PAGE_CACHE):
+        self.fetch = fetch  # fetch(after, limit, filters) -> list of rows
+        self.key = key      # row -> its keyset cursor
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.filters = {}
+        self.restart()
+
+    def restart(self, after=None):
+        self.starts = [after]
+        self.index = 0
+        self.pages = OrderedDict()  # page index -> (rows, whether more follow)
+
+    def page(self):
+        entry = self.pages.get(self.index)
+        if entry is not None:
+            self.pages.move_to_end(self.index)
+            return entry
+        # One row more than a page tells whether there is a next page
+        rows = self.fetch(self.starts[self.index], self.page_size + 1, self.filters)
+        entry = (rows[:self.page_size], len(rows) > self.page_size)
+        self.pages[self.index] = entry
+        while len(self.pages) > self.cache_pages:
+            self.pages.popitem(last=False)
+        return entry
+
+    def next(self):
+        rows, more = self.page()
+        if not more:
+            return False
+        if self.index + 1 == len(self.starts):
+            self.starts.append(self.key(rows[-1]))
+        self.index += 1
+        return True
+
+    def previous(self):
+        if self.index == 0:
+            return False
+        self.index -= 1
+        return True
+
+
+def fetcher(iterate):
+    """Adapts a records iter_* function to PagedView's fetch, one query per page."""
+    return lambda after, limit, filters: list(iterate(after, limit, chunk_size=limit, **filters))
+
+def parse_filter(entity, text):
+    """
+    Turns "COLUMN=VALUE; COLUMN=VALUE" into service filter arguments, with
+    the import converters. project_id also filters tasks, through their log.
+    """
+    from sitelog.importer import ENTITIES
+    columns = ENTITIES[entity][1]
+    if entity == "tasks":
+        columns = {**columns, "project_id": int}
+    where = {}
+    for item in filter(None, (part.strip() for part in text.split(";"))):
+        key, sep, value = (part.strip() for part in item.partition("="))
+        if not sep:
+            raise ValueError(f"use COLUMN=VALUE, not '{item}'")
+        if key not in columns:
+            raise ValueError(f"unknown column '{key}' (one of {', '.join(columns)})")
+        try:
+            where[key] = columns[key](value) if value else None
+        except ValueError:
+            raise ValueError(f"bad value for '{key}': {value!r}")
+    filters = {"where": where}
+    if entity == "tasks" and "project_id" in where:
+        filters["project_id"] = where.pop("project_id")
+    return filters
+
+def browse(view, entity, title, columns, style, to_row, by_date=False):
+    """
+    Shows view a page at a time until the user quits. Jumping goes to a date
+    when the listing is ordered by date (daily logs), otherwise to an ID.
+    """
+    jump = "date" if by_date else "ID"
+    jumped_to = filter_text = None
+    while True:
+        rows, more = view.page()
+        if not rows:
+            console.print(f"[yellow]No {title.lower()} found.")
+            if not (jumped_to or filter_text):
+                return
+        else:
+            first = view.index * view.page_size + 1
+            caption = [f"Page {view.index + 1}", f"rows {first}–{first + len(rows) - 1}"]
+            if jumped_to:
+                caption.append(f"from {jump} {jumped_to}")
+            if filter_text:
+                caption.append(f"filter: {filter_text}")
+            if not more:
+                caption.append("end")
+            table = Table(title=title, box=box.ROUNDED, caption=" · ".join(caption))
+            for col in columns:
+                table.add_column(col, style=style)
+            for row in rows:
+                table.add_row(*to_row(row))
+            console.print(table)
+
+        choices = (["n"] if more else []) + (["p"] if view.index else []) + ["j", "f", "q"]
+        labels = {"n": "next", "p": "previous", "j": f"jump to {jump}", "f": "filter", "q": "back"}
+        choice = Prompt.ask(" · ".join(f"[bold]{c}[/bold] {labels[c]}" for c in choices),
+                            choices=choices, default="n" if more else "q", show_choices=False)
+        if choice == "n":
+            view.next()
+        elif choice == "p":
+            view.previous()
+        elif choice == "j":
+            target = Prompt.ask(f"Jump to {jump}" + (" (YYYY-MM-DD)" if by_date else ""))
+            try:
+                # Cursors are "after this key"; these start at the target itself
+                view.restart((date.fromisoformat(target), 0) if by_date else (int(target) - 1,))
+                jumped_to = target
+            except ValueError:
+                console.print(f"[red]Error:[/red] not a valid {jump}: {target!r}")
+        elif choice == "f":
+            text = Prompt.ask("Filter as COLUMN=VALUE, several separated by ';' (empty for none)",
+                              default="", show_default=False)
+            try:
+                view.filters = parse_filter(entity, text) if text.strip() else {}
+            except ValueError as e:
+                console.print(f"[red]Error:[/red] {e}")
+                continue
+            filter_text = text.strip()
+            jumped_to = None
+            view.restart()
+        else:
+            return
+
 
 def main_menu():
     while True:
@@ -42,6 +206,7 @@ def main_menu():
 
 def project_menu():
     while True:
+        show_profile()
         console.rule("[bold cyan]🏗️ Manage Projects")
         console.print("1. Add Project")
         console.print("2. Show Projects")
@@ -50,6 +215,7 @@ def project_menu():
         console.print("5. Back to Main Menu")
 
         choice = Prompt.ask("Choose", choices=["1","2","3","4","5"])
+        profile_action(f"projects menu, option {choice}")
         if choice == "1":
             name = Prompt.ask("Project Name")
             location = Prompt.ask("Location")
@@ -62,16 +228,9 @@ def project_menu():
                 console.print(f"[red]Error:[/red] {e}")
 
         elif choice == "2":
-            projects = list_projects()
-            if not projects:
-                console.print("[yellow]No projects found.")
-                continue
-            table = Table(title="Projects", box=box.ROUNDED)
-            for col in ["ID","Name","Location","Start","End"]:
-                table.add_column(col, style="cyan")
-            for p in projects:
-                table.add_row(str(p.id), p.name, p.location, str(p.start_date), str(p.end_date))
-            console.print(table)
+            view = PagedView(fetcher(iter_projects), key=lambda p: (p.id,))
+            browse(view, "projects", "Projects", ["ID","Name","Location","Start","End"], "cyan",
+                   lambda p: (str(p.id), p.name, p.location, str(p.start_date), str(p.end_date)))
 
         elif choice == "3":
             pid = IntPrompt.ask("Project ID to update")
@@ -107,6 +266,7 @@ def project_menu():
 
 def log_menu():
     while True:
+        show_profile()
         console.rule("[bold cyan]📝 Manage Daily Logs")
         console.print("1. Add Daily Log")
         console.print("2. Show Logs")
@@ -115,6 +275,7 @@ def log_menu():
         console.print("5. Back to Main Menu")
 
         choice = Prompt.ask("Choose", choices=["1","2","3","4","5"])
+        profile_action(f"daily logs menu, option {choice}")
         if choice == "1":
             project_id = IntPrompt.ask("Project ID")
             log_date = Prompt.ask("Date (YYYY-MM-DD)")
@@ -127,16 +288,9 @@ def log_menu():
                 console.print(f"[red]Error:[/red] {e}")
 
         elif choice == "2":
-            logs = list_daily_logs()
-            if not logs:
-                console.print("[yellow]No logs found.")
-                continue
-            table = Table(title="Daily Logs", box=box.ROUNDED)
-            for col in ["ID","Project ID","Date","Weather","Summary"]:
-                table.add_column(col, style="magenta")
-            for l in logs:
-                table.add_row(str(l.id), str(l.project_id), str(l.date), l.weather, l.summary)
-            console.print(table)
+            view = PagedView(fetcher(iter_daily_logs), key=lambda l: (l.date, l.id))
+            browse(view, "daily-logs", "Daily Logs", ["ID","Project ID","Date","Weather","Summary"], "magenta",
+                   lambda l: (str(l.id), str(l.project_id), str(l.date), l.weather, l.summary), by_date=True)
 
         elif choice == "3":
             lid = IntPrompt.ask("Log ID to update")
@@ -170,6 +324,7 @@ def log_menu():
 
 def worker_menu():
     while True:
+        show_profile()
         console.rule("[bold cyan]👷 Manage Workers")
         console.print("1. Add Worker")
         console.print("2. Show Workers")
@@ -178,6 +333,7 @@ def worker_menu():
         console.print("5. Back to Main Menu")
 
         choice = Prompt.ask("Choose", choices=["1","2","3","4","5"])
+        profile_action(f"workers menu, option {choice}")
         if choice == "1":
             name = Prompt.ask("Worker Name")
             trade = Prompt.ask("Trade")
@@ -189,16 +345,9 @@ def worker_menu():
                 console.print(f"[red]Error:[/red] {e}")
 
         elif choice == "2":
-            workers = list_workers()
-            if not workers:
-                console.print("[yellow]No workers found.")
-                continue
-            table = Table(title="Workers", box=box.ROUNDED)
-            for col in ["ID","Name","Trade","Contact","Project ID"]:
-                table.add_column(col, style="green")
-            for w in workers:
-                table.add_row(str(w.id), w.name, w.trade, w.contact, str(getattr(w, "project_id", "N/A")))
-            console.print(table)
+            view = PagedView(fetcher(iter_workers), key=lambda w: (w.id,))
+            browse(view, "workers", "Workers", ["ID","Name","Trade","Contact","Project ID"], "green",
+                   lambda w: (str(w.id), w.name, w.trade, w.contact, str(getattr(w, "project_id", "N/A"))))
 
         elif choice == "3":
             wid = IntPrompt.ask("Worker ID to update")
@@ -230,8 +379,15 @@ def worker_menu():
             break
 
 
+def task_row(t):
+    log_date = str(t.log_date) if t.log_date else "-"
+    project = t.project_name or "-"
+    worker = t.worker_name or "-"
+    return (str(t.id), t.description, str(t.hours), t.status, str(t.log_id), log_date, project, worker)
+
 def task_menu():
     while True:
+        show_profile()
         console.rule("[bold cyan]🛠️ Manage Tasks")
         console.print("1. Add Task")
         console.print("2. Show Tasks")
@@ -240,6 +396,7 @@ def task_menu():
         console.print("5. Back to Main Menu")
 
         choice = Prompt.ask("Choose", choices=["1","2","3","4","5"])
+        profile_action(f"tasks menu, option {choice}")
         if choice == "1":
             desc = Prompt.ask("Task Description")
             hours = Prompt.ask("Hours")
@@ -253,16 +410,9 @@ def task_menu():
                 console.print(f"[red]Error:[/red] {e}")
 
         elif choice == "2":
-            tasks = list_tasks()
-            if not tasks:
-                console.print("[yellow]No tasks found.")
-                continue
-            table = Table(title="Tasks", box=box.ROUNDED)
-            for col in ["ID","Desc","Hours","Status","Log ID","Worker ID"]:
-                table.add_column(col, style="blue")
-            for t in tasks:
-                table.add_row(str(t.id), t.description, str(t.hours), t.status, str(t.log_id), str(t.worker_id))
-            console.print(table)
+            view = PagedView(fetcher(iter_task_details), key=lambda t: (t.id,))
+            browse(view, "tasks", "Tasks", ["ID","Desc","Hours","Status","Log ID","Date","Project","Worker"], "blue",
+                   task_row)
 
         elif choice == "3":
             tid = IntPrompt.ask("Task ID to update")
@@ -295,4 +445,15 @@ def task_menu():
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SiteLog interactive menu")
+    parser.add_argument("--profile", action="store_true", help="show query count, SQL time and rows after each action")
+    parser.add_argument("--slow-log", help="append statements slower than --slow-ms, with their query plan, to this file")
+    parser.add_argument("--slow-ms", type=float, default=100, help="slow-query threshold (default: 100)")
+    args = parser.parse_args()
+    if args.profile or args.slow_log:
+        from sitelog.profiling import Profiler
+        profiler = Profiler(args.slow_log, args.slow_ms).start()
+        print_profile = args.profile
     main_menu()
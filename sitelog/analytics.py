@@ -0,0 +1,321 @@
+"""
+Columnar snapshot of every task for ad-hoc analysis in memory.
+
+The tasks, joined to their daily log and worker, are loaded once into one
+compact array per column: ids, the log's day (a date ordinal), hours, and
+the status and trade as small integer codes into a dictionary of their
+distinct values. That is a few dozen bytes per task instead of an ORM object,
+and filters and group-bys run column at a time over the arrays without
+touching the database. Archived tasks are included.
+
+The snapshot is saved to settings.analytics_path and refreshed
+incrementally: tasks use AUTOINCREMENT, so the ones with an id above the
+snapshot's watermark are appended. The change log (sitelog.changes) tells
+whether a task, log or worker was updated, deleted or archived since the
+snapshot was taken, in which case it is rebuilt from scratch. A task count
+covers tombstones pruned in the meantime.
+
+    columns = load()
+    rows = columns.select(start=date.today() - timedelta(days=90))
+    for key, stats in summarize(columns, ("trade",), rows):
+        ...
+"""
+import json
+import math
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from datetime import date
+from itertools import compress
+
+from sqlalchemy import Float, Integer, cast, func, select, text
+
+from sitelog import db
+from sitelog.archive import with_archive
+from sitelog.changes import latest_seq
+from sitelog.models import Change, DailyLog, Task, Worker
+
+FORMAT_VERSION = 3
+MAGIC = b"SITELOG-ANALYTICS\n"
+CHUNK_SIZE = 10000
+JULIAN_DAY_OFFSET = 1721424.5  # julianday('0001-01-01') is date.toordinal() 1
+
+# Column -> array typecode. Missing ids (a task without a worker, or whose
+# log is gone) are 0.
+COLUMNS = {
+    "task_id": "i",
+    "log_id": "i",
+    "project_id": "i",
+    "worker_id": "i",
+    "day": "i",       # date.toordinal() of the log's date, 0 when it has none
+    "hours": "f",
+    "status": "H",    # index into TaskColumns.statuses
+    "trade": "H",     # index into TaskColumns.trades; 0 is "-", no worker or trade
+}
+GROUPINGS = ("project", "worker", "trade", "status", "week", "month")
+
+
+class TaskColumns:
+    def __init__(self):
+        self.arrays = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.statuses = []
+        self.trades = ["-"]
+        self.watermark = 0  # the highest task id handed out when it was taken
+        self.seq = 0  # the change log's sequence number then
+        self._lookups = {"statuses": {}, "trades": {"-": 0}}  # value -> code
+
+    def __len__(self):
+        return len(self.arrays["task_id"])
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in self.arrays.values())
+
+    def set_dictionaries(self, statuses, trades):
+        self.statuses = statuses
+        self.trades = trades
+        self._lookups = {name: {value: code for code, value in enumerate(values)}
+                         for name, values in (("statuses", statuses), ("trades", trades))}
+
+    def _encode(self, dictionary, values):
+        """Codes for values, adding the ones not seen yet to the dictionary."""
+        lookup = self._lookups[dictionary]
+        codes = []
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+                getattr(self, dictionary).append(value)
+            codes.append(code)
+        return codes
+
+    def append_rows(self, rows):
+        """Appends rows of (task id, log id, project id, worker id, day, hours, status, trade)."""
+        if not rows:
+            return
+        *numbers, statuses, trades = zip(*rows)
+        for name, values in zip(COLUMNS, numbers):
+            self.arrays[name].extend(values)
+        self.arrays["status"].extend(self._encode("statuses", statuses))
+        self.arrays["trade"].extend(self._encode("trades", trades))
+
+    # --- Filters ---
+    def select(self, start=None, end=None, project_id=None, statuses=None, trades=None, worker_id=None):
+        """Returns a bytearray mask of the rows matching every given filter (1 = selected)."""
+        mask = bytearray(b"\x01") * len(self)
+        if start or end:
+            low = start.toordinal() if start else 1
+            high = end.toordinal() if end else date.max.toordinal()
+            mask = bytearray(m and low <= d <= high for m, d in zip(mask, self.arrays["day"]))
+        if project_id is not None:
+            mask = bytearray(m and p == project_id for m, p in zip(mask, self.arrays["project_id"]))
+        if worker_id is not None:
+            mask = bytearray(m and w == worker_id for m, w in zip(mask, self.arrays["worker_id"]))
+        if statuses:
+            codes = {i for i, s in enumerate(self.statuses) if s in statuses}
+            mask = bytearray(m and c in codes for m, c in zip(mask, self.arrays["status"]))
+        if trades:
+            codes = {i for i, t in enumerate(self.trades) if t in trades}
+            mask = bytearray(m and c in codes for m, c in zip(mask, self.arrays["trade"]))
+        return mask
+
+    # --- Grouping keys ---
+    def keys(self, grouping):
+        """The column to group by for one of GROUPINGS, and a function turning its values into labels."""
+        if grouping == "project":
+            return self.arrays["project_id"], lambda p: str(p) if p else "-"
+        if grouping == "worker":
+            return self.arrays["worker_id"], lambda w: str(w) if w else "-"
+        if grouping == "trade":
+            return self.arrays["trade"], self.trades.__getitem__
+        if grouping == "status":
+            return self.arrays["status"], self.statuses.__getitem__
+        # Days are bucketed first, so rows group by week or month, not by day
+        days = self.arrays["day"]
+        if grouping == "week":
+            # Ordinal 1 is a Monday, so this is the day the ISO week starts
+            return array("i", (d - (d - 1) % 7 if d else 0 for d in days)), _week
+        firsts = {d: date.fromordinal(d).replace(day=1).toordinal() if d else 0 for d in set(days)}
+        return array("i", map(firsts.__getitem__, days)), _month
+
+
+def _week(day):
+    if not day:
+        return "-"
+    year, week, _ = date.fromordinal(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _month(day):
+    return date.fromordinal(day).strftime("%Y-%m") if day else "-"
+
+
+# --- Aggregation ---
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize(columns, group_by=("project",), mask=None, percentiles=(0.5, 0.9)):
+    """
+    Groups the selected rows and returns [(labels, stats)] sorted by labels,
+    stats being {tasks, hours, mean, max, p50, p90, ...} of the task hours.
+    """
+    unknown = set(group_by) - set(GROUPINGS)
+    if unknown:
+        raise ValueError(f"Unknown grouping: {', '.join(sorted(unknown))}")
+    keyed = [columns.keys(grouping) for grouping in group_by]
+    key_columns = [column for column, _ in keyed]
+    pairs = zip(zip(*key_columns) if len(key_columns) > 1 else key_columns[0], columns.arrays["hours"])
+    if mask is not None:
+        pairs = compress(pairs, mask)
+    groups = defaultdict(lambda: array("f"))
+    for key, hours in pairs:
+        groups[key].append(hours)
+    # Labels are worked out once per group rather than once per row
+    results = []
+    for key, hours in groups.items():
+        parts = key if len(key_columns) > 1 else (key,)
+        labels = tuple(label(part) for (_, label), part in zip(keyed, parts))
+        ordered = sorted(hours)
+        total = sum(ordered)
+        stats = {"tasks": len(ordered), "hours": total, "mean": total / len(ordered), "max": ordered[-1]}
+        for fraction in percentiles:
+            stats[f"p{round(fraction * 100)}"] = percentile(ordered, fraction)
+        results.append((labels, stats))
+    results.sort(key=lambda item: item[0])
+    return results
+
+
+# --- Loading ---
+def _rows_query(after, upto):
+    """
+    The snapshot's columns for the tasks with after < id <= upto, in id order,
+    already in their stored form so each chunk can be appended column-wise.
+    Every task is included, like the count in _changed(): one without a log
+    gets project 0 and day 0. Text hours are read as numbers, as SUM does.
+    """
+    return with_archive(
+        select(Task.id, func.coalesce(Task.log_id, 0), func.coalesce(DailyLog.project_id, 0),
+               func.coalesce(Task.worker_id, 0), _day(DailyLog.date),
+               func.coalesce(cast(Task.hours, Float), 0), func.coalesce(Task.status, "-"),
+               func.coalesce(Worker.trade, "-"))
+        .outerjoin(DailyLog, DailyLog.id == Task.log_id)
+        .outerjoin(Worker, Worker.id == Task.worker_id)
+        .where(Task.id > after, Task.id <= upto)
+        .order_by(Task.id)
+    )
+
+def _day(column):
+    """SQL for date.toordinal() of a date column, 0 when it is NULL."""
+    return func.coalesce(cast(func.julianday(column) - JULIAN_DAY_OFFSET, Integer), 0)
+
+def _changed(conn, columns):
+    """Whether a task, log or worker the snapshot has seen was changed or removed since."""
+    if latest_seq(conn) < columns.seq:
+        return True  # not the database the snapshot was taken from
+    changed = conn.execute(
+        select(Change.seq)
+        .where(Change.seq > columns.seq, Change.op != "insert",
+               Change.entity.in_((Task.__tablename__, DailyLog.__tablename__, Worker.__tablename__)))
+        .limit(1)
+    ).first()
+    if changed:
+        return True
+    count = conn.execute(with_archive(select(func.count(Task.id)).where(Task.id <= columns.watermark))).scalar()
+    return count != len(columns)
+
+def _watermark(conn):
+    """
+    The highest task id handed out so far. sqlite_sequence holds it for the
+    AUTOINCREMENT table, which is cheaper than max() over main and archive.
+    """
+    return conn.execute(
+        text("SELECT coalesce(max(seq), 0) FROM main.sqlite_sequence WHERE name = :name"),
+        {"name": Task.__tablename__},
+    ).scalar()
+
+def _append_since(conn, columns, watermark):
+    """Appends the tasks above the snapshot's watermark, up to watermark."""
+    query = _rows_query(columns.watermark, watermark)
+    result = conn.execute(query.execution_options(stream_results=True, yield_per=CHUNK_SIZE))
+    added = 0
+    for chunk in result.partitions():
+        columns.append_rows(chunk)
+        added += len(chunk)
+    return added
+
+def refresh(columns=None):
+    """
+    Brings a snapshot up to date, or builds one when columns is None.
+    Returns (columns, rows appended, whether it was rebuilt from scratch).
+    """
+    engine = db.get_engine()
+    # One read transaction, so the watermark, the change log and the rows agree
+    with engine.connect() as conn, conn.begin():
+        watermark, seq = _watermark(conn), latest_seq(conn)
+        rebuilt = columns is None or _changed(conn, columns)
+        if rebuilt:
+            columns = TaskColumns()
+        added = _append_since(conn, columns, watermark)
+        columns.watermark, columns.seq = watermark, seq
+    return columns, added, rebuilt
+
+
+# --- Snapshot file ---
+def save(columns, path=None):
+    """Writes the snapshot: a magic line, a length-prefixed JSON header, then each column's raw bytes."""
+    path = path or db.settings.analytics_path
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "url": db.settings.url,
+        "byteorder": sys.byteorder,
+        "rows": len(columns),
+        "columns": COLUMNS,
+        "statuses": columns.statuses,
+        "trades": columns.trades,
+        "watermark": columns.watermark,
+        "seq": columns.seq,
+    }).encode()
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name in COLUMNS:
+            columns.arrays[name].tofile(f)
+    tmp.replace(path)  # readers never see a half-written snapshot
+    return path
+
+def read(path=None):
+    """Reads a saved snapshot, or returns None when there is none usable for this database."""
+    path = path or db.settings.analytics_path
+    if path is None or not path.exists():
+        return None
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+        if (header["version"] != FORMAT_VERSION or header["url"] != db.settings.url
+                or header["byteorder"] != sys.byteorder or header["columns"] != COLUMNS):
+            return None
+        columns = TaskColumns()
+        for name in COLUMNS:
+            columns.arrays[name].fromfile(f, header["rows"])
+    columns.set_dictionaries(header["statuses"], header["trades"])
+    columns.watermark = header["watermark"]
+    columns.seq = header["seq"]
+    return columns
+
+def load(path=None, rebuild=False):
+    """
+    The saved snapshot refreshed with what changed since, or a new one, saved
+    back when anything changed. Returns (columns, rows appended, rebuilt).
+    """
+    path = path or db.settings.analytics_path
+    columns = None if rebuild else read(path)
+    columns, added, rebuilt = refresh(columns)
+    if (added or rebuilt) and path is not None:
+        save(columns, path)
+    return columns, added, rebuilt
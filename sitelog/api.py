@@ -0,0 +1,388 @@
+"""
+A local HTTP JSON API over sitelog.services, started with the serve command.
+
+    GET    /projects?after=&limit=    list, keyset paged: pass "next" back as after
+    GET    /projects/<id>
+    POST   /projects                  create from a JSON object, returns it with its id
+    PATCH  /projects/<id>             update the given columns
+    DELETE /projects/<id>
+    (the same for /daily-logs, /workers and /tasks)
+    GET    /reports/hours?by=&from=&to=&status=&project=
+    GET    /stats?project=&from=&to=
+    GET    /search?q=&project=&from=&to=&limit=
+    GET    /changes?since=&limit=&entity=   rows changed since a cursor, deletes as tombstones
+    POST   /batch                     [{"method", "path", "body"}, ...] in one transaction
+    GET    /health
+
+Lists take any column as a filter (/tasks?status=pending&worker_id=3, a,b,c
+for any of several values), project_id on tasks too, from= and to= log dates
+on daily logs and tasks, and include_archive=1.
+Errors come back as {"error": message} with a 4xx or 5xx status.
+
+Requests are handled by a fixed pool of threads, each using at most one
+pooled database connection at a time. With WAL (the balanced and safe
+profiles) reads run alongside a write instead of waiting for it; writes take
+turns, each waiting up to the profile's busy_timeout for the lock. With
+single_writer, writes and batches go to a sitelog.writer.Writer instead,
+which commits whatever arrives together in one transaction.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from sitelog import db, records, services
+from sitelog.changes import TRACKED
+from sitelog.importer import ENTITIES
+from sitelog.models import Project, DailyLog, Worker, Task, ProjectDayStat
+from sitelog.reports import GROUPINGS, day_stats, hours_report
+from sitelog.search import search as search_index
+
+THREADS = 8
+# Writes and batches go through this sitelog.writer.Writer when it is set
+writer = None
+LIST_LIMIT = 100
+MAX_LIST_LIMIT = 1000
+MAX_BATCH = 1000
+# Seconds an idle keep-alive connection may hold on to a worker thread
+IDLE_TIMEOUT = 5
+
+# Entity -> (model, create, get, update, delete, iterate)
+RESOURCES = {
+    "projects": (Project, services.create_project, services.get_project, services.update_project,
+                 services.delete_project, records.iter_projects),
+    "daily-logs": (DailyLog, services.create_daily_log, services.get_daily_log, services.update_daily_log,
+                   services.delete_daily_log, records.iter_daily_logs),
+    "workers": (Worker, services.create_worker, services.get_worker, services.update_worker,
+                services.delete_worker, records.iter_workers),
+    "tasks": (Task, services.create_task, services.get_task, services.update_task,
+              services.delete_task, records.iter_tasks),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _write(fn, *args):
+    """
+    Runs a service write in this thread, or on the writer in single-writer
+    mode. Writes made inside a batch run where the batch does.
+    """
+    if writer is None or services.current_unit_of_work() is not None:
+        return fn(*args)
+    return writer.submit(fn, *args).result()
+
+def _row(model, obj):
+    """Column values of an ORM object, cache snapshot or record as a dict."""
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(model).column_attrs}
+
+def _param(query, name, convert=str, default=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return convert(values[-1])
+    except ValueError:
+        raise ApiError(400, f"bad value for '{name}': {values[-1]!r}")
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _cursor(entity, value):
+    """The list cursor: an id, or DATE:ID (or just DATE) for daily logs."""
+    if entity != "daily-logs":
+        return (int(value),)
+    log_date, _, log_id = value.partition(":")
+    return (date.fromisoformat(log_date), int(log_id)) if log_id else (date.fromisoformat(log_date),)
+
+def _values(entity, body, partial=False):
+    """Converts a JSON object's values with the import converters."""
+    if not isinstance(body, dict):
+        raise ApiError(400, "expected a JSON object")
+    columns = ENTITIES[entity][1]
+    values = {}
+    for key, value in body.items():
+        if key not in columns or key == "id":
+            raise ApiError(400, f"unknown column '{key}'")
+        try:
+            values[key] = None if value is None else columns[key](value)
+        except (TypeError, ValueError):
+            raise ApiError(400, f"bad value for '{key}': {value!r}")
+    if not partial:
+        missing = [c for c in ENTITIES[entity][2] if values.get(c) is None]
+        if missing:
+            raise ApiError(400, f"missing {', '.join(missing)}")
+        # The create_* services take every column, so the rest default to NULL
+        values = {**dict.fromkeys(c for c in columns if c != "id"), **values}
+    return values
+
+
+# --- Resources ---
+def list_rows(entity, query):
+    model, *_, iterate = RESOURCES[entity]
+    limit = min(_param(query, "limit", int, LIST_LIMIT), MAX_LIST_LIMIT)
+    after = _param(query, "after", lambda v: _cursor(entity, v))
+    filters = {}
+    columns = ENTITIES[entity][1]
+    where = {}
+    for key, values in query.items():
+        if key in ("after", "limit", "include_archive"):
+            continue
+        if entity in ("daily-logs", "tasks") and key in ("from", "to"):
+            continue
+        if entity == "tasks" and key == "project_id":
+            filters["project_id"] = _param(query, key, int)
+            continue
+        if key not in columns:
+            raise ApiError(400, f"unknown filter '{key}'")
+        try:
+            where[key] = [columns[key](v) for v in values[-1].split(",")] if "," in values[-1] \
+                else columns[key](values[-1])
+        except ValueError:
+            raise ApiError(400, f"bad value for '{key}': {values[-1]!r}")
+    if where:
+        filters["where"] = where
+    if entity in ("daily-logs", "tasks"):
+        filters["include_archive"] = _param(query, "include_archive", _flag, False)
+        filters["start"] = _param(query, "from", date.fromisoformat)
+        filters["end"] = _param(query, "to", date.fromisoformat)
+    # One row more than asked for tells whether there is a next page
+    rows = list(iterate(after, limit + 1, chunk_size=limit + 1, **filters))
+    items = [_row(model, obj) for obj in rows[:limit]]
+    following = None
+    if len(rows) > limit:
+        last = items[-1]
+        following = f"{last['date']}:{last['id']}" if entity == "daily-logs" else str(last["id"])
+    return {"items": items, "next": following}
+
+def resource(method, entity, obj_id, query, body):
+    model, create, get, update, delete, _ = RESOURCES[entity]
+    # Writes return the row as a dict, built where the write ran
+    if obj_id is None:
+        if method == "GET":
+            return 200, list_rows(entity, query)
+        if method == "POST":
+            values = _values(entity, body)
+            return 201, _write(lambda: _row(model, create(**values)))
+        raise ApiError(405, f"{method} not allowed on /{entity}")
+    if method == "GET":
+        obj = get(obj_id)
+        row = None if obj is None else _row(model, obj)
+    elif method == "PATCH":
+        values = _values(entity, body, partial=True)
+
+        def patch():
+            obj = update(obj_id, **values)
+            return None if obj is None else _row(model, obj)
+        row = _write(patch)
+    elif method == "DELETE":
+        row = {"deleted": obj_id} if _write(delete, obj_id) else None
+    else:
+        raise ApiError(405, f"{method} not allowed on /{entity}/{obj_id}")
+    if row is None:
+        raise ApiError(404, f"{entity} {obj_id} not found")
+    return 200, row
+
+
+# --- Reports ---
+def hours(query):
+    group_by = tuple(query.get("by", ())) or ("project",)
+    unknown = [g for g in group_by if g not in GROUPINGS]
+    if unknown:
+        raise ApiError(400, f"unknown grouping '{unknown[0]}' (one of {', '.join(GROUPINGS)})")
+    rows = hours_report(group_by, _param(query, "from", date.fromisoformat), _param(query, "to", date.fromisoformat),
+                        query.get("status"), _param(query, "project", int),
+                        _param(query, "include_archive", _flag, False))
+    return {"items": [dict(row._mapping) for row in rows]}
+
+def stats(query):
+    rows = day_stats(_param(query, "project", int), _param(query, "from", date.fromisoformat),
+                     _param(query, "to", date.fromisoformat), _param(query, "include_archive", _flag, False))
+    return {"items": [_row(ProjectDayStat, row) for row in rows]}
+
+def search(query):
+    words = _param(query, "q")
+    if not words:
+        raise ApiError(400, "missing q")
+    with services.session_scope() as session:
+        hits = search_index(session, words, _param(query, "project", int), _param(query, "from", date.fromisoformat),
+                            _param(query, "to", date.fromisoformat), _param(query, "limit", int, 20),
+                            _param(query, "raw", _flag, False))
+    return {"items": [dict(hit._mapping) for hit in hits]}
+
+def changes(query):
+    """The change feed; "next" is the cursor to pass as since= next time."""
+    since = _param(query, "since", int, 0)
+    limit = min(_param(query, "limit", int, MAX_LIST_LIMIT), MAX_LIST_LIMIT)
+    entities = [entity.replace("-", "_") for entity in _param(query, "entity", str, "").split(",") if entity]
+    unknown = set(entities) - set(TRACKED)
+    if unknown:
+        raise ApiError(400, f"unknown entity: {', '.join(sorted(unknown))}")
+    items = list(services.iter_changes(since, limit, entities))
+    return {"items": items, "next": items[-1]["seq"] if items else since}
+
+
+def batch(body):
+    """
+    Runs a list of requests in one unit of work: one transaction and one
+    commit for all of them. The first failure rolls the whole batch back.
+    """
+    if not isinstance(body, list):
+        raise ApiError(400, "expected a JSON list of requests")
+    if len(body) > MAX_BATCH:
+        raise ApiError(400, f"at most {MAX_BATCH} requests per batch")
+    results = []
+    try:
+        with services.unit_of_work():
+            for index, request in enumerate(body):
+                if not isinstance(request, dict) or "path" not in request:
+                    raise ApiError(400, f"request {index}: expected {{\"method\", \"path\", \"body\"}}")
+                url = urlsplit(request["path"])
+                if url.path.strip("/") == "batch":
+                    raise ApiError(400, f"request {index}: batches cannot be nested")
+                status, payload = dispatch(request.get("method", "GET").upper(), url.path,
+                                           parse_qs(url.query), request.get("body"))
+                if status >= 400:
+                    raise ApiError(status, f"request {index}: {payload['error']}")
+                results.append({"status": status, "body": payload})
+    except IntegrityError as e:
+        raise ApiError(409, f"request {len(results)}: {e.orig}")
+    return {"results": results}
+
+
+def dispatch(method, path, query, body):
+    """Routes one request. Returns (HTTP status, JSON-able payload)."""
+    parts = [p for p in path.split("/") if p]
+    try:
+        if parts and parts[0] in RESOURCES and len(parts) <= 2:
+            obj_id = None
+            if len(parts) == 2:
+                if not parts[1].isdigit():
+                    raise ApiError(404, f"no such path: {path}")
+                obj_id = int(parts[1])
+            return resource(method, parts[0], obj_id, query, body)
+        route = "/".join(parts)
+        if route == "batch" and method == "POST":
+            return 200, _write(batch, body)
+        if method != "GET":
+            raise ApiError(405 if route in ("reports/hours", "stats", "search", "changes", "health") else 404,
+                           f"{method} not allowed on {path}")
+        if route == "reports/hours":
+            return 200, hours(query)
+        if route == "stats":
+            return 200, stats(query)
+        if route == "search":
+            return 200, search(query)
+        if route == "changes":
+            return 200, changes(query)
+        if route == "health":
+            return 200, {"status": "ok"}
+        raise ApiError(404, f"no such path: {path}")
+    except ApiError as e:
+        return e.status, {"error": str(e)}
+    except IntegrityError as e:
+        return 409, {"error": str(e.orig)}
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+
+# --- Server ---
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients reuse their connection
+    server_version = "SiteLog"
+    timeout = IDLE_TIMEOUT
+    # Headers and body are separate writes; with Nagle on, each response
+    # would wait for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        body = None
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            if length:
+                body = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            status, payload = 400, {"error": f"invalid JSON: {e}"}
+        else:
+            try:
+                status, payload = dispatch(method, url.path, parse_qs(url.query), body)
+            except Exception as e:
+                self.log_error("%s %s failed: %r", method, self.path, e)
+                status, payload = 500, {"error": "internal error"}
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """
+    An HTTPServer that hands each connection to a fixed pool of threads.
+    Closing it also stops the single writer, after its last commit.
+    """
+    request_queue_size = 128
+
+    def __init__(self, address, handler, threads=THREADS, verbose=False):
+        super().__init__(address, handler)
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="sitelog-api")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        global writer
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if writer is not None:
+            writer.stop()
+            writer = None
+
+
+def make_server(host="127.0.0.1", port=8000, threads=THREADS, verbose=False, single_writer=False):
+    """
+    Builds the server, with a connection pool of one connection per thread
+    (plus one for the writer). Returns (server, the database's journal mode).
+    """
+    global writer
+    db.configure(pool_size=threads + 1 if single_writer else threads)
+    if single_writer:
+        from sitelog.writer import Writer
+        writer = Writer().start()
+    with db.get_engine().connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    return ThreadPoolHTTPServer((host, port), RequestHandler, threads, verbose), journal_mode
@@ -0,0 +1,170 @@
+"""
+Archiving of closed projects into a second SQLite file.
+
+A closed project's daily logs and tasks move to the archive database
+(settings.archive_path, attached to every connection as "archive" once the
+file exists) a chunk of daily logs per transaction. The project itself and
+the workers stay in the main database, so they can still be listed and
+reported on. Ids never collide: daily logs and tasks use AUTOINCREMENT, so
+the main database never hands out an archived id again.
+
+Reads take the archive in with with_archive() for Core statements and
+archived() for ORM queries. Both read daily logs, tasks and day stats from
+a UNION ALL of the main and the archive tables.
+"""
+import sqlite3
+from datetime import date
+
+from sqlalchemy import (Column, Index, MetaData, Table, case, delete, exists, func, insert, select,
+                        union_all)
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.util import ClauseAdapter
+
+from sitelog import db
+from sitelog.changes import latest_seq, mark_archived, mark_deleted
+from sitelog.models import Project, DailyLog, Task, ProjectDayStat
+
+SCHEMA = "archive"
+CHUNK_SIZE = 500
+ARCHIVED = (DailyLog, Task, ProjectDayStat)
+
+# The archive's copies of the tables: same columns and indexes, no foreign
+# keys (the projects and workers they point at live in the main database)
+metadata = MetaData()
+
+def _archive_table(table):
+    columns = [Column(c.name, c.type, primary_key=c.primary_key) for c in table.columns]
+    indexes = [Index(index.name, *[c.name for c in index.columns]) for index in table.indexes]
+    return Table(table.name, metadata, *columns, *indexes, schema=SCHEMA)
+
+TABLES = {model: _archive_table(model.__table__) for model in ARCHIVED}
+
+
+class ArchiveResult:
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.logs = 0
+        self.tasks = 0
+        self.chunks = 0
+
+
+def archive_exists():
+    return db.settings.archive_path is not None and db.settings.archive_path.exists()
+
+def ensure_archive():
+    """Creates the archive file and its tables when needed. Returns the engine."""
+    path = db.settings.archive_path
+    if path is None:
+        raise RuntimeError("Archiving needs the main database to be a SQLite file.")
+    engine = db.get_engine()
+    if not path.exists():
+        sqlite3.connect(path).close()
+        # Pooled connections were opened before there was anything to attach
+        engine.dispose()
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+    return engine
+
+
+def closed_projects(before=None):
+    """Projects that ended before the given date (default today) and still have logs in the main database."""
+    with db.SessionLocal() as session:
+        return session.scalars(
+            select(Project)
+            .where(Project.end_date < (before or date.today()))
+            .where(exists().where(DailyLog.project_id == Project.id))
+            .order_by(Project.id)
+        ).all()
+
+def _archive_stats(conn, project_id):
+    """Recomputes the project's day stats in the archive from its archived logs and tasks."""
+    stats, logs, tasks = TABLES[ProjectDayStat], TABLES[DailyLog], TABLES[Task]
+    conn.execute(delete(stats).where(stats.c.project_id == project_id))
+    aggregate = (
+        select(
+            logs.c.project_id, logs.c.date, func.count(tasks.c.id),
+            func.coalesce(func.sum(case((tasks.c.status == "completed", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((tasks.c.status == "pending", 1), else_=0)), 0),
+            func.coalesce(func.sum(tasks.c.hours), 0),
+        )
+        .join(tasks, tasks.c.log_id == logs.c.id)
+        .where(logs.c.project_id == project_id, logs.c.date.is_not(None))
+        .group_by(logs.c.project_id, logs.c.date)
+    )
+    conn.execute(insert(stats).from_select(
+        ["project_id", "day", "tasks", "completed", "pending", "hours"], aggregate))
+
+def archive_project(project_id, chunk_size=CHUNK_SIZE):
+    """
+    Moves a project's daily logs and tasks to the archive, chunk_size logs
+    per transaction. Deleting the logs from the main database cascades to
+    their tasks, and the triggers take them out of the day stats and the
+    search index. Rows are copied with INSERT OR REPLACE, so after a crash
+    between the two databases' commits, running it again finishes the job.
+    """
+    engine = ensure_archive()
+    result = ArchiveResult(project_id)
+    logs, tasks = DailyLog.__table__, Task.__table__
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(logs.c.id).where(logs.c.project_id == project_id).order_by(logs.c.id).limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(insert(TABLES[DailyLog]).prefix_with("OR REPLACE")
+                         .from_select(list(logs.c.keys()), select(logs).where(logs.c.id.in_(ids))))
+            result.tasks += conn.execute(
+                insert(TABLES[Task]).prefix_with("OR REPLACE")
+                .from_select(list(tasks.c.keys()), select(tasks).where(tasks.c.log_id.in_(ids)))
+            ).rowcount
+            # The change log records the moved rows as archived, not deleted
+            before = latest_seq(conn)
+            result.logs += conn.execute(delete(logs).where(logs.c.id.in_(ids))).rowcount
+            mark_archived(conn, before)
+            result.chunks += 1
+    if result.chunks:
+        with engine.begin() as conn:
+            _archive_stats(conn, project_id)
+    return result
+
+def delete_archived(conn, project_ids):
+    """
+    Deletes the archived daily logs, tasks and day stats of the projects in
+    project_ids (a list or a SELECT of ids). The archive has no foreign keys
+    to cascade a project's deletion, so deleting a project calls this in the
+    same transaction. Their 'archive' entries in the change log become
+    tombstones.
+    """
+    if not archive_exists():
+        return
+    stats, logs, tasks = TABLES[ProjectDayStat], TABLES[DailyLog], TABLES[Task]
+    in_projects = logs.c.project_id.in_(project_ids)
+    for table, where in ((tasks, tasks.c.log_id.in_(select(logs.c.id).where(in_projects))), (logs, in_projects)):
+        mark_deleted(conn, table, where)
+        conn.execute(delete(table).where(where))
+    conn.execute(delete(stats).where(stats.c.project_id.in_(project_ids)))
+
+
+# --- Reading through the archive ---
+def union_source(model):
+    """The model's main and archived rows as one subquery with the table's columns."""
+    table = model.__table__
+    return union_all(select(table), select(TABLES[model])).subquery(f"all_{table.name}")
+
+def with_archive(statement):
+    """
+    Returns statement with daily_logs, tasks and project_day_stats replaced by
+    the union of main and archived rows. Unchanged when there is no archive.
+    """
+    if not archive_exists():
+        return statement
+    for model in ARCHIVED:
+        statement = ClauseAdapter(union_source(model)).traverse(statement)
+    return statement
+
+def archived(model):
+    """An ORM entity for model that also loads archived rows, or model itself when there is no archive."""
+    if not archive_exists():
+        return model
+    return aliased(model, union_source(model), adapt_on_names=True)
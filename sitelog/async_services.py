@@ -0,0 +1,325 @@
+"""
+Asyncio versions of the sitelog.services CRUD and reporting functions.
+
+They take the same arguments and return the same objects as their
+synchronous twins, for callers running inside an event loop:
+
+    from sitelog import async_services as services
+
+    project = await services.create_project("Tower", "Leeds", start, end)
+    async with services.unit_of_work():
+        log = await services.create_daily_log(day, "dry", "slab", project.id)
+        await services.create_task("pour", 6, "completed", log.id, worker_id)
+
+Every call outside a unit of work gets its own AsyncSession, so any number
+of tasks can call in at once. The current unit of work is tracked in a
+ContextVar, which asyncio copies per task, so tasks started inside a unit of
+work (asyncio.gather, create_task) join it and share its session. An
+AsyncSession can only do one thing at a time, so those calls take turns on
+it, one after another, and are committed together. Needs the aiosqlite
+driver.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from sitelog import db
+from sitelog.archive import archived, delete_archived, with_archive
+from sitelog.models import Project, DailyLog, Worker, Task
+from sitelog.reports import hours_query, day_stats_query
+from sitelog.query import CHUNK_SIZE, after_clause, aiter_keyset, filters
+from sitelog.services import TASK_DETAILS, project_cache, worker_cache
+
+_engine = None
+_sessions = None
+_current_uow = ContextVar("sitelog_async_unit_of_work", default=None)
+
+
+def async_url(url):
+    """Maps a sqlite:// URL onto the aiosqlite driver."""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+async def get_engine():
+    """
+    Returns the async engine, creating it on first use. The schema check is
+    shared with the synchronous engine and runs once, in a worker thread.
+    """
+    global _engine, _sessions
+    if _engine is None:
+        await asyncio.to_thread(db.get_engine)
+        try:
+            engine = create_async_engine(async_url(db.settings.url), echo=db.settings.echo)
+        except ModuleNotFoundError as e:
+            raise RuntimeError("The async services need the aiosqlite driver (pip install aiosqlite).") from e
+        if engine.dialect.name == "sqlite":
+            event.listen(engine.sync_engine, "connect", db.apply_pragmas)
+            event.listen(engine.sync_engine, "connect", db.attach_archive)
+        _sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        _engine = engine
+    return _engine
+
+async def dispose():
+    """Closes the pooled connections, e.g. before the event loop shuts down."""
+    global _engine, _sessions
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = _sessions = None
+
+
+# --- Sessions ---
+class UnitOfWork:
+    def __init__(self, session):
+        self.session = session
+        # Held by each service call using the session, so concurrent tasks
+        # in the unit of work take turns instead of interleaving flushes
+        self.lock = asyncio.Lock()
+        self.after_commit = []  # callables run once the commit succeeded
+
+    async def flush(self):
+        async with self.lock:
+            await self.session.flush()
+
+@asynccontextmanager
+async def unit_of_work():
+    """The async twin of services.unit_of_work(): one session, one commit."""
+    current = _current_uow.get()
+    if current is not None:
+        yield current
+        return
+    await get_engine()
+    uow = UnitOfWork(_sessions())
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+        await uow.session.commit()
+    except BaseException:
+        await uow.session.rollback()
+        raise
+    finally:
+        _current_uow.reset(token)
+        await uow.session.close()
+    for callback in uow.after_commit:
+        callback()
+
+@asynccontextmanager
+async def session_scope():
+    """
+    Yields the unit of work's session, once no other task is using it, or a
+    session of its own for a standalone call.
+    """
+    uow = _current_uow.get()
+    if uow is not None:
+        async with uow.lock:
+            yield uow.session
+        return
+    await get_engine()
+    session = _sessions()
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def _invalidate(cache, key):
+    """services._invalidate() for this module's units of work: drops key once the change is committed."""
+    uow = _current_uow.get()
+    if uow is not None:
+        uow.after_commit.append(lambda: cache.invalidate(key))
+    else:
+        cache.invalidate(key)
+
+
+# --- Generic CRUD ---
+async def _create(model, **values):
+    async with session_scope() as session:
+        obj = model(**values)
+        session.add(obj)
+        await session.flush()
+    return obj
+
+async def _get(model, obj_id):
+    async with session_scope() as session:
+        return await session.get(model, obj_id)
+
+async def _update(model, obj_id, **kwargs):
+    async with session_scope() as session:
+        obj = await session.get(model, obj_id)
+        if not obj:
+            return None
+        for key, value in kwargs.items():
+            if hasattr(obj, key):
+                setattr(obj, key, value)
+    return obj
+
+async def _delete(model, obj_id):
+    # Children are left to the database's ON DELETE rules (passive_deletes),
+    # so nothing needs loading, which asyncio could not do lazily anyway.
+    async with session_scope() as session:
+        obj = await session.get(model, obj_id)
+        if not obj:
+            return False
+        await session.delete(obj)
+    return True
+
+def _iter_keyset(model, order_by, after=None, limit=None, chunk_size=CHUNK_SIZE, options=(), where=()):
+    """Async twin of services._iter_keyset(), through query.aiter_keyset()."""
+    async def fetch(after, size):
+        query = select(model).options(*options).where(*where)
+        if after is not None:
+            query = query.where(after_clause(order_by, after))
+        async with session_scope() as session:
+            return (await session.scalars(query.order_by(*order_by).limit(size))).unique().all()
+    return aiter_keyset(fetch, lambda row: tuple(getattr(row, c.key) for c in order_by), after, limit, chunk_size)
+
+async def _list(rows):
+    return [row async for row in rows]
+
+
+# --- Project CRUD ---
+async def create_project(name, location, start_date, end_date):
+    return await _create(Project, name=name, location=location, start_date=start_date, end_date=end_date)
+
+async def get_project(project_id):
+    """Like services.get_project(): a cached read-only snapshot, or the attached Project inside a unit of work."""
+    if _current_uow.get() is not None:
+        return await _get(Project, project_id)
+    return await project_cache.get_async(project_id, lambda: _get(Project, project_id))
+
+async def update_project(project_id, **kwargs):
+    project = await _update(Project, project_id, **kwargs)
+    _invalidate(project_cache, project_id)
+    return project
+
+async def delete_project(project_id):
+    async with session_scope() as session:
+        project = await session.get(Project, project_id)
+        if project is not None:
+            await session.run_sync(delete_archived, [project_id])
+            await session.delete(project)
+    _invalidate(project_cache, project_id)
+    return project is not None
+
+def iter_projects(after=None, limit=None, chunk_size=CHUNK_SIZE, where=None):
+    return _iter_keyset(Project, (Project.id,), after, limit, chunk_size, where=filters(Project, where))
+
+async def list_projects(after=None, limit=None, where=None):
+    return await _list(iter_projects(after, limit, where=where))
+
+
+# --- DailyLog CRUD ---
+async def create_daily_log(date, weather, summary, project_id):
+    return await _create(DailyLog, date=date, weather=weather, summary=summary, project_id=project_id)
+
+async def get_daily_log(log_id):
+    return await _get(DailyLog, log_id)
+
+async def update_daily_log(log_id, **kwargs):
+    return await _update(DailyLog, log_id, **kwargs)
+
+async def delete_daily_log(log_id):
+    return await _delete(DailyLog, log_id)
+
+def iter_daily_logs(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+                    where=None, project_id=None, start=None, end=None):
+    logs = archived(DailyLog) if include_archive else DailyLog
+    return _iter_keyset(logs, (logs.date, logs.id), after, limit, chunk_size,
+                        where=filters(logs, where, project_id, start, end))
+
+async def list_daily_logs(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                          start=None, end=None):
+    return await _list(iter_daily_logs(after, limit, include_archive=include_archive, where=where,
+                                       project_id=project_id, start=start, end=end))
+
+
+# --- Worker CRUD ---
+async def create_worker(name, trade, contact):
+    return await _create(Worker, name=name, trade=trade, contact=contact)
+
+async def get_worker(worker_id):
+    """Like services.get_worker(): a cached read-only snapshot, or the attached Worker inside a unit of work."""
+    if _current_uow.get() is not None:
+        return await _get(Worker, worker_id)
+    return await worker_cache.get_async(worker_id, lambda: _get(Worker, worker_id))
+
+async def update_worker(worker_id, **kwargs):
+    worker = await _update(Worker, worker_id, **kwargs)
+    _invalidate(worker_cache, worker_id)
+    return worker
+
+async def delete_worker(worker_id):
+    deleted = await _delete(Worker, worker_id)
+    _invalidate(worker_cache, worker_id)
+    return deleted
+
+def iter_workers(after=None, limit=None, chunk_size=CHUNK_SIZE, where=None):
+    return _iter_keyset(Worker, (Worker.id,), after, limit, chunk_size, where=filters(Worker, where))
+
+async def list_workers(after=None, limit=None, where=None):
+    return await _list(iter_workers(after, limit, where=where))
+
+
+# --- Task CRUD ---
+async def create_task(description, hours, status, log_id, worker_id):
+    return await _create(Task, description=description, hours=hours, status=status, log_id=log_id, worker_id=worker_id)
+
+async def get_task(task_id):
+    return await _get(Task, task_id)
+
+async def update_task(task_id, **kwargs):
+    return await _update(Task, task_id, **kwargs)
+
+async def delete_task(task_id):
+    return await _delete(Task, task_id)
+
+def iter_tasks(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+               where=None, project_id=None, start=None, end=None):
+    tasks = archived(Task) if include_archive else Task
+    return _iter_keyset(tasks, (tasks.id,), after, limit, chunk_size,
+                        where=filters(tasks, where, project_id, start, end))
+
+async def list_tasks(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                     start=None, end=None):
+    return await _list(iter_tasks(after, limit, include_archive=include_archive, where=where,
+                                  project_id=project_id, start=start, end=end))
+
+def iter_task_details(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+                      where=None, project_id=None, start=None, end=None):
+    if not include_archive:
+        return _iter_keyset(Task, (Task.id,), after, limit, chunk_size, TASK_DETAILS,
+                            filters(Task, where, project_id, start, end))
+    tasks, logs = archived(Task), archived(DailyLog)
+    details = (
+        joinedload(tasks.worker),
+        joinedload(tasks.log.of_type(logs)).joinedload(logs.project),
+    )
+    return _iter_keyset(tasks, (tasks.id,), after, limit, chunk_size, details,
+                        filters(tasks, where, project_id, start, end))
+
+async def list_task_details(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                            start=None, end=None):
+    return await _list(iter_task_details(after, limit, include_archive=include_archive, where=where,
+                                         project_id=project_id, start=start, end=end))
+
+
+# --- Reports ---
+async def hours_report(group_by=("project",), start=None, end=None, statuses=None, project_id=None,
+                       include_archive=False):
+    query = hours_query(group_by, start, end, statuses, project_id)
+    if include_archive:
+        query = with_archive(query)
+    async with session_scope() as session:
+        return (await session.execute(query)).all()
+
+async def day_stats(project_id=None, start=None, end=None, include_archive=False):
+    async with session_scope() as session:
+        return (await session.scalars(day_stats_query(project_id, start, end, include_archive))).all()
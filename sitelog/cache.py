@@ -0,0 +1,141 @@
+"""
+In-process read-through cache for rows that rarely change.
+
+Entries are read-only Snapshot copies of a row's columns, so a cached value
+can be handed to any number of callers and threads without one of them
+changing it for the others, and without a session to go stale in.
+
+Set SITELOG_CACHE=0 to turn caching off, or call set_enabled(False), e.g.
+in tests that count queries.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+
+MAX_SIZE = 1024
+TTL = 60.0  # seconds
+
+enabled = os.environ.get("SITELOG_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+_caches = {}
+
+
+class Snapshot:
+    """A read-only copy of an ORM object's column values."""
+    __slots__ = ("_model", "_values")
+
+    def __init__(self, obj):
+        mapper = inspect(type(obj))
+        object.__setattr__(self, "_model", type(obj))
+        object.__setattr__(self, "_values", {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(f"{self._model.__name__} snapshot has no attribute '{name}'") from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self._model.__name__} snapshot is read-only; use the update_* services")
+
+    def __repr__(self):
+        return self._model.__repr__(self)
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries also expire after ttl seconds."""
+    def __init__(self, name, maxsize=MAX_SIZE, ttl=TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires at, value)
+        # Bumped by every invalidation. A value loaded while one happened may
+        # be the old row, so it is returned but not cached.
+        self._generation = 0
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key, load):
+        """Returns the cached value for key, or calls load() and caches a snapshot of what it returns."""
+        if not enabled:
+            obj = load()
+            return Snapshot(obj) if obj is not None else None
+        now = time.monotonic()
+        hit, value, generation = self._lookup(key, now)
+        if hit:
+            return value
+        return self._store(key, load(), generation, now)
+
+    async def get_async(self, key, load):
+        """get() for a coroutine function load, as used by sitelog.async_services."""
+        if not enabled:
+            obj = await load()
+            return Snapshot(obj) if obj is not None else None
+        now = time.monotonic()
+        hit, value, generation = self._lookup(key, now)
+        if hit:
+            return value
+        return self._store(key, await load(), generation, now)
+
+    def _lookup(self, key, now):
+        """(True, value, None) for a live entry, else (False, None, the generation before loading)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1], None
+            self.misses += 1
+            return False, None, self._generation
+
+    def _store(self, key, obj, generation, now):
+        if obj is None:
+            return None  # not cached, so a later create needs no invalidation
+        value = Snapshot(obj)
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+def set_enabled(value):
+    """Turns every cache on or off. Turning them off also empties them."""
+    global enabled
+    enabled = value
+    if not value:
+        clear_all()
+
+def clear_all():
+    for cache in _caches.values():
+        cache.clear()
+
+def stats():
+    """Returns {cache name: {hits, misses, size, maxsize, ttl}}."""
+    return {name: cache.info() for name, cache in _caches.items()}
+
+def summary():
+    """One line of hit and miss counts for the caches that were used, or ''."""
+    used = [(name, info) for name, info in stats().items() if info["hits"] or info["misses"]]
+    return "Cache: " + ", ".join(f"{name} {info['hits']} hits / {info['misses']} misses" for name, info in used) if used else ""
@@ -0,0 +1,81 @@
+"""
+Change tracking for projects, daily logs, workers and tasks.
+
+SQLite triggers record every insert, update and delete in the changes
+table, whichever code path made it: the ORM, bulk changes, imports, raw SQL
+or a cascaded delete. The table keeps one entry per changed row, its latest
+operation, the time and a sequence number. The sequence is AUTOINCREMENT and
+every change takes a new one, so it only grows. A deleted row leaves a
+tombstone entry, and rows moved by archive_project() are marked 'archive'
+rather than 'delete'. Archived rows have no triggers; when their project is
+deleted, mark_deleted() records their tombstones.
+
+A consumer keeps the last sequence number it has seen and asks for what
+changed since, so a sync costs as much as the churn rather than the
+database. SQLite runs one write transaction at a time, so sequence numbers
+commit in order and a cursor never skips a change that commits later.
+services.iter_changes() reads the feed and services.prune_tombstones()
+clears tombstones every consumer has read past.
+"""
+from sqlalchemy import func, literal, literal_column, select, text
+
+from sitelog.models import Project, DailyLog, Worker, Task, Change
+
+TRACKED = {model.__tablename__: model for model in (Project, Worker, DailyLog, Task)}
+TOMBSTONES = ("delete", "archive")
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+# Replaces the row's previous entry, so the table stays one entry per row
+_RECORD = """
+    DELETE FROM changes WHERE entity = '{table}' AND row_id = {row}.id;
+    INSERT INTO changes (entity, row_id, op, changed_at) VALUES ('{table}', {row}.id, '{op}', {now});
+"""
+
+CHANGE_TRIGGERS = {
+    f"trg_changes_{table}_{op}": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_changes_{table}_{op} AFTER {op.upper()} ON {table}
+        BEGIN {_RECORD.format(table=table, row="OLD" if op == "delete" else "NEW", op=op, now=_NOW)} END"""
+    for table in TRACKED
+    for op in ("insert", "update", "delete")
+}
+
+
+def install_change_tracking(conn):
+    """Creates any missing change triggers. conn may be a Connection or Session."""
+    for ddl in CHANGE_TRIGGERS.values():
+        conn.execute(text(ddl))
+
+def seed_changes(conn):
+    """
+    Records every existing row as inserted, parents first, for a database
+    that had rows before change tracking, so since=0 returns everything.
+    """
+    for table in TRACKED:
+        conn.execute(text(
+            f"INSERT OR IGNORE INTO changes (entity, row_id, op, changed_at) "
+            f"SELECT '{table}', id, 'insert', {_NOW} FROM {table} ORDER BY id"
+        ))
+
+def latest_seq(conn):
+    """The sequence number of the latest change, 0 when there is none."""
+    return conn.execute(select(func.coalesce(func.max(Change.seq), 0))).scalar()
+
+def mark_archived(conn, after_seq, entities=("daily_logs", "tasks")):
+    """Turns the tombstones recorded after after_seq into 'archive' entries: moved, not gone."""
+    conn.execute(
+        Change.__table__.update()
+        .where(Change.seq > after_seq, Change.op == "delete", Change.entity.in_(entities))
+        .values(op="archive")
+    )
+
+def mark_deleted(conn, table, where):
+    """Records tombstones for the rows of table (e.g. an archive table) matching where, before they are deleted."""
+    changes = Change.__table__
+    conn.execute(changes.delete().where(changes.c.entity == table.name,
+                                        changes.c.row_id.in_(select(table.c.id).where(where))))
+    conn.execute(changes.insert().from_select(
+        ["entity", "row_id", "op", "changed_at"],
+        select(literal(table.name), table.c.id, literal("delete"), literal_column(_NOW))
+        .where(where).order_by(table.c.id),
+    ))
@@ -1,18 +1,88 @@
 import click
 from datetime import date
-from sitelog.services import (
-    create_project, list_projects, get_project, update_project, delete_project,
-    create_daily_log, list_daily_logs, get_daily_log, update_daily_log, delete_daily_log,
-    create_worker, list_workers, get_worker, update_worker, delete_worker,
-    create_task, list_tasks, get_task, update_task, delete_task
-)
-from sitelog.models import Project
-from sitelog.db import session
+
+# SQLAlchemy and the database are only loaded by the commands that need them,
+# so --help and argument errors stay instant. Each command imports what it
+# uses from sitelog.services, sitelog.db and friends in its body.
+IMPORT_ENTITIES = ["projects", "daily-logs", "workers", "tasks"]
+REPORT_GROUPINGS = ["project", "worker", "trade", "week"]
+ANALYTICS_GROUPINGS = ["project", "worker", "trade", "status", "week", "month"]
+EXPORTS = ["projects", "daily-logs", "workers", "tasks", "ledger"]
 
 @click.group()
-def cli():
+@click.option('--profile', 'profile_queries', is_flag=True,
+              help="Print query count, SQL time and rows for the command to stderr")
+@click.option('--slow-log', type=click.Path(dir_okay=False),
+              help="Append statements slower than --slow-ms, with their query plan, to this file")
+@click.option('--slow-ms', type=float, default=100, show_default=True, help="Slow-query threshold")
+@click.pass_context
+def cli(ctx, profile_queries, slow_log, slow_ms):
     """SiteLog CLI - Manage your construction site projects and logs."""
-    pass
+    if profile_queries or slow_log:
+        from sitelog.profiling import Profiler
+        profiler = Profiler(slow_log, slow_ms).start()
+        profiler.label = ctx.invoked_subcommand
+
+        def finish():
+            profiler.stop()
+            if profile_queries:
+                from sitelog.cache import summary
+                click.echo(profiler.report(ctx.invoked_subcommand), err=True)
+                if summary():
+                    click.echo(summary(), err=True)
+        ctx.call_on_close(finish)
+
+
+def parse_log_cursor(ctx, param, value):
+    """Turns a daily log cursor, DATE:ID or just DATE, into a keyset tuple."""
+    if value is None:
+        return None
+    log_date, _, log_id = value.partition(':')
+    try:
+        if log_id:
+            return (date.fromisoformat(log_date), int(log_id))
+        return (date.fromisoformat(log_date),)
+    except ValueError:
+        raise click.BadParameter("Use YYYY-MM-DD or YYYY-MM-DD:ID.")
+
+def parse_date(ctx, param, value):
+    """Click callback for optional YYYY-MM-DD options."""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter("Use YYYY-MM-DD.")
+
+def fetch_limit(limit):
+    """What to ask the iterator for: one row past --limit, which tells whether more follow."""
+    return limit + 1 if limit else limit
+
+def echo_rows(rows, heading, footer, empty, fmt, cursor, limit):
+    """
+    Prints rows as they arrive from a streaming iterator, fetched with
+    fetch_limit(limit). When there are rows past --limit, prints the --after
+    value that continues the listing.
+    """
+    count = 0
+    last = None
+    more = False
+    for row in rows:
+        if limit and count == limit:
+            more = True
+            break
+        if count == 0:
+            click.echo(f"\n--- {heading} ---")
+        click.echo(fmt(row))
+        count += 1
+        last = row
+    if count == 0:
+        click.echo(empty)
+        return
+    click.echo(footer)
+    if more:
+        click.echo(f"More results: --after {cursor(last)}")
+
 
 # ---------- Projects ----------
 @cli.command("add-project")
@@ -21,6 +91,7 @@ def cli():
 @click.option('--start-date', prompt='Start date (YYYY-MM-DD)')
 @click.option('--end-date', prompt='End date (YYYY-MM-DD)')
 def add_project(name, location, start_date, end_date):
+    from sitelog.services import create_project
     try:
         start_date_obj = date.fromisoformat(start_date)
         end_date_obj = date.fromisoformat(end_date)
@@ -30,15 +101,16 @@ def add_project(name, location, start_date, end_date):
         click.echo(click.style("Error: Invalid date format. Use YYYY-MM-DD.", fg="red"))
 
 @cli.command("show-projects")
-def show_projects():
-    projects = list_projects()
-    if not projects:
-        click.echo("No projects found.")
-        return
-    click.echo("\n--- Existing Projects ---")
-    for p in projects:
-        click.echo(f'ID: {p.id} | Name: "{p.name}" | Location: {p.location} | Start: {p.start_date} | End: {p.end_date}')
-    click.echo("-------------------------\n")
+@click.option('--limit', type=int, help="Show at most this many projects")
+@click.option('--after', type=int, help="Start after this project ID")
+def show_projects(limit, after):
+    from sitelog.records import iter_projects
+    echo_rows(
+        iter_projects(after, fetch_limit(limit)),
+        "Existing Projects", "-------------------------\n", "No projects found.",
+        lambda p: f'ID: {p.id} | Name: "{p.name}" | Location: {p.location} | Start: {p.start_date} | End: {p.end_date}',
+        lambda p: p.id, limit,
+    )
 
 @cli.command("update-project")
 @click.argument('project_id', type=int)
@@ -47,6 +119,7 @@ def show_projects():
 @click.option('--start-date')
 @click.option('--end-date')
 def update_project_by_id(project_id, name, location, start_date, end_date):
+    from sitelog.services import update_project
     updates = {}
     if name: updates['name'] = name
     if location: updates['location'] = location
@@ -74,24 +147,22 @@ def update_project_by_id(project_id, name, location, start_date, end_date):
         click.echo(click.style("Project not found or update failed.", fg="yellow"))
 
 
-# DELETE PROJECT
-@cli.command()
+@cli.command("delete-project")
 @click.argument("project_id", type=int)
-def delete_project(project_id):
+def delete_project_cmd(project_id):
     """Delete a project by ID."""
-    project = session.query(Project).get(project_id)
-    if not project:
+    from sitelog.services import delete_project
+    if not delete_project(project_id):
         click.echo(f"❌ No project found with ID {project_id}")
         return
-    session.delete(project)
-    session.commit()
     click.echo(f"✅ Project ID {project_id} deleted successfully.")
 
-@cli.command()
+@cli.command("get-project")
 @click.argument("project_id", type=int)
-def get_project(project_id):
+def get_project_cmd(project_id):
     """Get a single project by ID."""
-    project = session.query(Project).filter(Project.id == project_id).first()
+    from sitelog.services import get_project
+    project = get_project(project_id)
     if project:
         click.echo(f"📌 Project ID: {project.id}")
         click.echo(f"🏗️  Name: {project.name}")
@@ -102,50 +173,48 @@ def get_project(project_id):
         click.echo("❌ Project not found.")
 
 
-
-
-
-
-
-
-
-
 # ---------- Daily Logs ----------
 @cli.command("add-daily-log")
-@click.option('--date', prompt='Date (YYYY-MM-DD)')
+@click.option('--date', 'log_date', prompt='Date (YYYY-MM-DD)')
 @click.option('--weather', prompt='Weather')
 @click.option('--summary', prompt='Summary')
 @click.option('--project-id', type=int, prompt='Project ID')
-def add_daily_log(date, weather, summary, project_id):
+def add_daily_log(log_date, weather, summary, project_id):
+    from sitelog.services import create_daily_log
     try:
-        log_date = date.fromisoformat(date)
-        log = create_daily_log(log_date, weather, summary, project_id)
+        log = create_daily_log(date.fromisoformat(log_date), weather, summary, project_id)
         click.echo(f"Daily log created with ID: {log.id}")
     except Exception as e:
         click.echo(click.style(f"Error: {e}", fg="red"))
 
 @cli.command("show-daily-logs")
-def show_daily_logs():
-    logs = list_daily_logs()
-    if not logs:
-        click.echo("No daily logs found.")
-        return
-    click.echo("\n--- Daily Logs ---")
-    for log in logs:
-        click.echo(f'ID: {log.id} | Date: {log.date} | Weather: {log.weather} | Summary: {log.summary} | Project ID: {log.project_id}')
-    click.echo("------------------\n")
+@click.option('--limit', type=int, help="Show at most this many logs")
+@click.option('--after', callback=parse_log_cursor, help="Start after DATE:ID, or after every log on DATE")
+@click.option('--include-archive', is_flag=True, help="Include archived projects' logs and tasks")
+@click.option('--project', 'project_id', type=int, help="Only this project ID")
+@click.option('--from', 'start', callback=parse_date, help="First log date, YYYY-MM-DD")
+@click.option('--to', 'end', callback=parse_date, help="Last log date, YYYY-MM-DD")
+def show_daily_logs(limit, after, include_archive, project_id, start, end):
+    from sitelog.records import iter_daily_logs
+    echo_rows(
+        iter_daily_logs(after, fetch_limit(limit), include_archive=include_archive, project_id=project_id, start=start, end=end),
+        "Daily Logs", "------------------\n", "No daily logs found.",
+        lambda log: f'ID: {log.id} | Date: {log.date} | Weather: {log.weather} | Summary: {log.summary} | Project ID: {log.project_id}',
+        lambda log: f"{log.date}:{log.id}", limit,
+    )
 
 @cli.command("update-daily-log")
 @click.argument('log_id', type=int)
-@click.option('--date')
+@click.option('--date', 'log_date')
 @click.option('--weather')
 @click.option('--summary')
 @click.option('--project-id', type=int)
-def update_daily_log_by_id(log_id, date, weather, summary, project_id):
+def update_daily_log_by_id(log_id, log_date, weather, summary, project_id):
+    from sitelog.services import update_daily_log
     updates = {}
-    if date:
+    if log_date:
         try:
-            updates['date'] = date.fromisoformat(date)
+            updates['date'] = date.fromisoformat(log_date)
         except ValueError:
             click.echo(click.style("Invalid date format.", fg="red"))
             return
@@ -170,6 +239,7 @@ def update_daily_log_by_id(log_id, date, weather, summary, project_id):
 @click.option('--project-id', type=int, prompt='Project ID')
 def add_worker(name, role, project_id):
     """Add a new worker to a project."""
+    from sitelog.services import create_worker
     try:
         worker = create_worker(name, role, project_id)
         click.echo(f"✅ Worker '{worker.name}' added with ID: {worker.id}")
@@ -177,18 +247,17 @@ def add_worker(name, role, project_id):
         click.echo(click.style(f"❌ Error: {e}", fg="red"))
 
 @cli.command("show-workers")
-def show_workers():
+@click.option('--limit', type=int, help="Show at most this many workers")
+@click.option('--after', type=int, help="Start after this worker ID")
+def show_workers(limit, after):
     """Display all workers."""
-    workers = list_workers()
-    if not workers:
-        click.echo("No workers found.")
-        return
-
-    click.echo("\n--- Workers List ---")
-    for w in workers:
-        click.echo(f'ID: {w.id} | Name: {w.name} | Trade: {w.trade} | Contact: {w.contact}')
-
-    click.echo("---------------------\n")
+    from sitelog.records import iter_workers
+    echo_rows(
+        iter_workers(after, fetch_limit(limit)),
+        "Workers List", "---------------------\n", "No workers found.",
+        lambda w: f'ID: {w.id} | Name: {w.name} | Trade: {w.trade} | Contact: {w.contact}',
+        lambda w: w.id, limit,
+    )
 
 @cli.command("update-worker")
 @click.argument('worker_id', type=int)
@@ -197,6 +266,7 @@ def show_workers():
 @click.option('--project-id', type=int, default=None, help="New project ID")
 def update_worker_cmd(worker_id, name, role, project_id):
     """Update a worker's information."""
+    from sitelog.services import update_worker
     updates = {}
     if name: updates['name'] = name
     if role: updates['role'] = role
@@ -216,6 +286,7 @@ def update_worker_cmd(worker_id, name, role, project_id):
 @click.argument('worker_id', type=int)
 def delete_worker_cmd(worker_id):
     """Delete a worker by ID."""
+    from sitelog.services import delete_worker
     success = delete_worker(worker_id)
     if success:
         click.echo(f"✅ Worker {worker_id} deleted.")
@@ -231,23 +302,45 @@ def delete_worker_cmd(worker_id):
 @click.option('--worker-id', type=int, prompt='Worker ID')
 def add_task(description, hours, status, log_id, worker_id):
     """Add a task to a log and worker."""
+    from sitelog.services import create_task
     try:
         task = create_task(description, hours, status, log_id, worker_id)
         click.echo(f"✅ Task created with ID {task.id} and description '{task.description}'")
     except Exception as e:
         click.echo(click.style(f"❌ Error: {e}", fg="red"))
 
+def format_task(t):
+    """One line for a records.TaskDetail."""
+    worker = t.worker_name or "-"
+    project = t.project_name or "-"
+    log_date = t.log_date or "-"
+    return (f'ID: {t.id} | Description: {t.description} | Hours: {t.hours} | Status: {t.status} | '
+            f'Worker: {worker} (ID {t.worker_id}) | Project: {project} | Log: {t.log_id} ({log_date})')
+
 @cli.command("show-tasks")
-def show_tasks():
-    """Show all tasks."""
-    tasks = list_tasks()
-    if not tasks:
-        click.echo("No tasks found.")
-        return
-    click.echo("\n--- Tasks ---")
-    for t in tasks:
-        click.echo(f'ID: {t.id} | Name: {t.name} | Description: {t.description} | Status: {t.status} | Worker ID: {t.worker_id} | Project ID: {t.project_id}')
-    click.echo("--------------")
+@click.option('--limit', type=int, help="Show at most this many tasks")
+@click.option('--after', type=int, help="Start after this task ID")
+@click.option('--include-archive', is_flag=True, help="Include archived projects' logs and tasks")
+@click.option('--project', 'project_id', type=int, help="Only this project ID")
+@click.option('--from', 'start', callback=parse_date, help="First log date, YYYY-MM-DD")
+@click.option('--to', 'end', callback=parse_date, help="Last log date, YYYY-MM-DD")
+@click.option('--worker', 'worker_id', type=int, help="Only this worker ID")
+@click.option('--status', 'statuses', multiple=True, help="Only tasks with this status (repeatable)")
+def show_tasks(limit, after, include_archive, project_id, start, end, worker_id, statuses):
+    """Show all tasks, or the ones matching the filters."""
+    from sitelog.records import iter_task_details
+    where = {}
+    if worker_id is not None:
+        where["worker_id"] = worker_id
+    if statuses:
+        where["status"] = list(statuses)
+    echo_rows(
+        iter_task_details(after, fetch_limit(limit), include_archive=include_archive, where=where,
+                          project_id=project_id, start=start, end=end),
+        "Tasks", "--------------", "No tasks found.",
+        format_task,
+        lambda t: t.id, limit,
+    )
 
 @cli.command("update-task")
 @click.option('--task-id', type=int, prompt='Task ID to update')
@@ -256,6 +349,7 @@ def show_tasks():
 @click.option('--status', prompt='New status', required=False)
 def update_task_cmd(task_id, description, hours, status):
     """Update a task's details."""
+    from sitelog.services import update_task
     updates = {}
     if description:
         updates['description'] = description
@@ -279,6 +373,7 @@ def update_task_cmd(task_id, description, hours, status):
 @click.argument('task_id', type=int)
 def delete_task_cmd(task_id):
     """Delete a task."""
+    from sitelog.services import delete_task
     success = delete_task(task_id)
     if success:
         click.echo(f"✅ Task {task_id} deleted.")
@@ -286,6 +381,429 @@ def delete_task_cmd(task_id):
         click.echo(click.style("❌ Task not found.", fg="yellow"))
 
 
+# ---------- Bulk Changes ----------
+def parse_assignments(ctx, param, values):
+    """Click callback turning repeated COLUMN=VALUE options into a dict."""
+    result = {}
+    for item in values:
+        key, sep, value = item.partition('=')
+        if not sep or not key.strip():
+            raise click.BadParameter(f"Use COLUMN=VALUE, not '{item}'.")
+        result[key.strip()] = value
+    return result
+
+def convert_values(entity, values, lists=False):
+    """
+    Converts COLUMN=VALUE strings with the import converters. An empty value
+    is NULL; with lists=True, a,b,c becomes a list (matched with IN).
+    """
+    from sitelog.importer import ENTITIES
+    columns = ENTITIES[entity][1]
+    converted = {}
+    for key, value in values.items():
+        if key not in columns:
+            raise click.BadParameter(f"unknown column '{key}' for {entity}")
+        try:
+            if value == "":
+                converted[key] = None
+            elif lists and ',' in value:
+                converted[key] = [columns[key](v.strip()) for v in value.split(',')]
+            else:
+                converted[key] = columns[key](value)
+        except ValueError:
+            raise click.BadParameter(f"bad value for '{key}': {value!r}")
+    return converted
+
+def bulk_filters(entity, where, log_id, worker_id):
+    where = convert_values(entity, where, lists=True)
+    if log_id is not None:
+        where['log_id'] = log_id
+    if worker_id is not None:
+        where['worker_id'] = worker_id
+    return where
+
+def bulk_options(command):
+    """The filter options shared by bulk-update and bulk-delete."""
+    for option in reversed((
+        click.argument('entity', type=click.Choice(IMPORT_ENTITIES)),
+        click.option('--where', multiple=True, callback=parse_assignments,
+                     help="COLUMN=VALUE filter, repeatable; a,b,c matches any of them, an empty value matches NULL"),
+        click.option('--log-id', type=int, help="Tasks of this daily log"),
+        click.option('--worker-id', type=int, help="Tasks of this worker"),
+        click.option('--project-id', type=int, help="This project, or its daily logs or tasks"),
+        click.option('--all', 'all_rows', is_flag=True, help="Allow running without any filter"),
+    )):
+        command = option(command)
+    return command
+
+@cli.command("bulk-update")
+@bulk_options
+@click.option('--set', 'values', multiple=True, required=True, callback=parse_assignments,
+              help="COLUMN=VALUE to set, repeatable; an empty value sets NULL")
+def bulk_update_cmd(entity, where, log_id, worker_id, project_id, all_rows, values):
+    """Update every matching row with one UPDATE statement."""
+    from sitelog.importer import ENTITIES
+    from sitelog.services import bulk_update
+    where = bulk_filters(entity, where, log_id, worker_id)
+    if not (where or project_id is not None or all_rows):
+        raise click.UsageError("Give a filter (--where, --log-id, ...) or --all.")
+    try:
+        count = bulk_update(ENTITIES[entity][0], convert_values(entity, values), where, project_id)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"✅ Updated {count} {entity}.")
+
+@cli.command("bulk-delete")
+@bulk_options
+@click.option('--yes', is_flag=True, help="Do not ask for confirmation")
+def bulk_delete_cmd(entity, where, log_id, worker_id, project_id, all_rows, yes):
+    """Delete every matching row with one DELETE statement (logs and tasks cascade)."""
+    from sitelog.importer import ENTITIES
+    from sitelog.services import bulk_delete
+    where = bulk_filters(entity, where, log_id, worker_id)
+    if not (where or project_id is not None or all_rows):
+        raise click.UsageError("Give a filter (--where, --log-id, ...) or --all.")
+    if not yes:
+        click.confirm(f"Delete the matching {entity}, and everything that belongs to them?", abort=True)
+    try:
+        count = bulk_delete(ENTITIES[entity][0], where, project_id)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"✅ Deleted {count} {entity}.")
+
+
+# ---------- Import ----------
+@cli.command("import")
+@click.argument('entity', type=click.Choice(IMPORT_ENTITIES))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help="Defaults to the file extension")
+@click.option('--batch-size', type=int, default=1000, show_default=True, help="Rows per bulk insert")
+@click.option('--commit-size', type=int, default=None, help="Commit every N rows (default: one transaction)")
+def import_cmd(entity, path, fmt, batch_size, commit_size):
+    """Bulk import projects, daily logs, workers or tasks from CSV/JSONL."""
+    from sitelog.importer import import_file
+    try:
+        result = import_file(entity, path, fmt, batch_size, commit_size)
+    except Exception as e:
+        raise click.ClickException(f"Import failed, nothing after the last commit was saved: {e}")
+    click.echo(f"✅ Imported {result.inserted} {entity} in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/s)")
+    if result.rejected:
+        click.echo(click.style(f"⚠️ Rejected {len(result.rejected)} rows:", fg="yellow"))
+        for line_no, reason, _ in result.rejected:
+            click.echo(f"  line {line_no}: {reason}")
+
+
+# ---------- Export ----------
+@cli.command("export")
+@click.argument('entity', type=click.Choice(EXPORTS))
+@click.option('--output', '-o', default='-', show_default=True, help="File to write, - for stdout")
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, default=None, help="Gzip the output (automatic for .gz files)")
+@click.option('--since', callback=parse_date, help="Only rows from logs dated on or after YYYY-MM-DD")
+@click.option('--project', 'project_id', type=int, help="Only rows belonging to this project ID")
+@click.option('--chunk-size', type=int, default=5000, show_default=True, help="Rows fetched per round trip")
+@click.option('--include-archive', is_flag=True, help="Include archived projects' logs and tasks")
+def export_cmd(entity, output, fmt, compress, since, project_id, chunk_size, include_archive):
+    """Stream a table, or the joined task ledger, to CSV or JSONL."""
+    from sitelog.export import export, open_output
+    with open_output(output, compress) as f:
+        count = export(entity, f, fmt, since, project_id, chunk_size, include_archive)
+    if output != '-':
+        click.echo(f"✅ Exported {count} {entity} rows to {output}")
+
+
+# ---------- Change Feed ----------
+@cli.command("changes")
+@click.option('--since', type=int, default=0, show_default=True,
+              help="Cursor: the seq of the last change already read (0 for everything)")
+@click.option('--entity', 'entities', multiple=True, type=click.Choice(IMPORT_ENTITIES),
+              help="Only changes to this table (repeatable)")
+@click.option('--limit', type=int, help="Return at most this many changes")
+@click.option('--output', '-o', default='-', show_default=True, help="File to write, - for stdout")
+def changes_cmd(since, entities, limit, output):
+    """Stream the rows changed since a cursor as JSONL, deletes as tombstones."""
+    import json
+    from sitelog.services import iter_changes
+    entities = [entity.replace("-", "_") for entity in entities]
+    count, cursor = 0, since
+    with click.open_file(output, "w") as f:
+        for change in iter_changes(since, limit, entities):
+            f.write(json.dumps(change) + "\n")
+            count += 1
+            cursor = change["seq"]
+    click.echo(f"{count} changes, next cursor: --since {cursor}", err=True)
+
+@cli.command("prune-changes")
+@click.option('--upto', type=int, required=True, help="Drop tombstones with seq up to this cursor")
+def prune_changes(upto):
+    """Drop delete and archive tombstones every consumer has read past."""
+    from sitelog.services import prune_tombstones
+    count = prune_tombstones(upto)
+    click.echo(f"✅ Dropped {count} tombstones.")
+
+
+# ---------- Archive ----------
+@cli.command("archive")
+@click.option('--project', 'project_id', type=int, help="Archive this project (it must have ended)")
+@click.option('--before', callback=parse_date, help="Archive every project that ended before YYYY-MM-DD (default: today)")
+@click.option('--chunk-size', type=int, default=500, show_default=True, help="Daily logs moved per transaction")
+@click.option('--dry-run', is_flag=True, help="Only list the projects that would be archived")
+def archive_cmd(project_id, before, chunk_size, dry_run):
+    """Move closed projects' daily logs and tasks to the archive database."""
+    from sitelog import db
+    from sitelog.archive import archive_project, closed_projects
+    projects = closed_projects(before)
+    if project_id is not None:
+        projects = [p for p in projects if p.id == project_id]
+        if not projects:
+            click.echo(click.style(f"❌ Project {project_id} has not ended yet, or has nothing left to archive.", fg="yellow"))
+            return
+    if not projects:
+        click.echo("No closed projects to archive.")
+        return
+    for project in projects:
+        if dry_run:
+            click.echo(f"Would archive project {project.id} \"{project.name}\" (ended {project.end_date})")
+            continue
+        result = archive_project(project.id, chunk_size)
+        click.echo(f"✅ Archived project {project.id} \"{project.name}\": {result.logs} daily logs, {result.tasks} tasks")
+    if not dry_run:
+        click.echo(f"Archive: {db.settings.archive_path}")
+
+
+# ---------- Reports ----------
+@cli.group()
+def report():
+    """Reports computed in the database."""
+    pass
+
+@report.command("hours")
+@click.option('--by', 'group_by', multiple=True, type=click.Choice(REPORT_GROUPINGS),
+              help="Group by this (repeatable, default: project)")
+@click.option('--from', 'start', callback=parse_date, help="First log date, YYYY-MM-DD")
+@click.option('--to', 'end', callback=parse_date, help="Last log date, YYYY-MM-DD")
+@click.option('--status', 'statuses', multiple=True, help="Only tasks with this status (repeatable)")
+@click.option('--project', 'project_id', type=int, help="Only this project ID")
+@click.option('--include-archive', is_flag=True, help="Include archived projects' logs and tasks")
+def report_hours(group_by, start, end, statuses, project_id, include_archive):
+    """Total task hours per project, worker, trade and/or ISO week."""
+    from sitelog.reports import hours_report
+    group_by = group_by or ("project",)
+    rows = hours_report(group_by, start, end, statuses, project_id, include_archive)
+    if not rows:
+        click.echo("No tasks match.")
+        return
+    click.echo(f"\n--- Hours by {', '.join(group_by)} ---")
+    total = 0
+    for row in rows:
+        labels = " | ".join(f"{key}: {value}" for key, value in row._mapping.items() if key not in ("hours", "tasks"))
+        click.echo(f"{labels} | Tasks: {row.tasks} | Hours: {row.hours}")
+        total += row.hours
+    click.echo(f"Total hours: {total}")
+    click.echo("---------------------\n")
+
+
+# ---------- Search ----------
+@cli.command("search")
+@click.argument('query', nargs=-1, required=True)
+@click.option('--project', 'project_id', type=int, help="Only this project ID")
+@click.option('--from', 'start', callback=parse_date, help="First log date, YYYY-MM-DD")
+@click.option('--to', 'end', callback=parse_date, help="Last log date, YYYY-MM-DD")
+@click.option('--limit', type=int, default=20, show_default=True, help="Show at most this many hits")
+@click.option('--raw', is_flag=True, help="Pass the query to SQLite FTS5 as-is (OR, NEAR, \"phrases\")")
+def search_cmd(query, project_id, start, end, limit, raw):
+    """Full-text search of log summaries, weather and task descriptions."""
+    from sitelog.services import session_scope
+    from sitelog.search import search
+    try:
+        with session_scope() as session:
+            hits = search(session, " ".join(query), project_id, start, end, limit, raw)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if not hits:
+        click.echo("No matches found.")
+        return
+    click.echo("\n--- Search Results ---")
+    for hit in hits:
+        where = f"Log {hit.log_id}" if hit.kind == "log" else f"Task {hit.id} (Log {hit.log_id})"
+        click.echo(f"{where} | Date: {hit.date} | Project ID: {hit.project_id} | {hit.snippet}")
+    click.echo("----------------------\n")
+
+
+# ---------- Daily Stats ----------
+@cli.group()
+def stats():
+    """Per project, per day task statistics."""
+    pass
+
+@stats.command("show")
+@click.option('--project', 'project_id', type=int, help="Only this project ID")
+@click.option('--from', 'start', callback=parse_date, help="First day, YYYY-MM-DD")
+@click.option('--to', 'end', callback=parse_date, help="Last day, YYYY-MM-DD")
+@click.option('--include-archive', is_flag=True, help="Include archived projects' logs and tasks")
+def stats_show(project_id, start, end, include_archive):
+    """Show tasks completed, pending and hours per project per day."""
+    from sitelog.reports import day_stats
+    rows = day_stats(project_id, start, end, include_archive)
+    if not rows:
+        click.echo("No stats found.")
+        return
+    click.echo("\n--- Daily Stats ---")
+    for r in rows:
+        click.echo(f'Project ID: {r.project_id} | Day: {r.day} | Tasks: {r.tasks} | Completed: {r.completed} | Pending: {r.pending} | Hours: {r.hours}')
+    click.echo("-------------------\n")
+
+@stats.command("rebuild")
+def stats_rebuild():
+    """Recompute the daily stats table from scratch."""
+    from sitelog.services import session_scope
+    from sitelog.stats import rebuild_stats
+    with session_scope() as session:
+        count = rebuild_stats(session)
+    click.echo(f"✅ Rebuilt stats for {count} project days.")
+
+@stats.command("check")
+def stats_check():
+    """Compare the daily stats table with a fresh recomputation."""
+    from sitelog.services import session_scope
+    from sitelog.stats import check_stats
+    with session_scope() as session:
+        mismatches = check_stats(session)
+    if not mismatches:
+        click.echo("✅ Daily stats are consistent.")
+        return
+    click.echo(click.style(f"❌ {len(mismatches)} mismatched rows (run 'stats rebuild'):", fg="red"))
+    for source, row in mismatches:
+        click.echo(f"  {source}: {tuple(row)}")
+    raise SystemExit(1)
+
+
+# ---------- Analytics ----------
+@cli.command("analytics")
+@click.option('--by', 'group_by', multiple=True, type=click.Choice(ANALYTICS_GROUPINGS),
+              help="Group by this (repeatable, default: trade)")
+@click.option('--from', 'start', callback=parse_date, help="First log date, YYYY-MM-DD")
+@click.option('--to', 'end', callback=parse_date, help="Last log date, YYYY-MM-DD")
+@click.option('--days', type=int, help="Only the last N days (instead of --from)")
+@click.option('--project', 'project_id', type=int, help="Only this project ID")
+@click.option('--status', 'statuses', multiple=True, help="Only tasks with this status (repeatable)")
+@click.option('--trade', 'trades', multiple=True, help="Only workers of this trade (repeatable)")
+@click.option('--rebuild', is_flag=True, help="Rebuild the snapshot from scratch instead of refreshing it")
+def analytics_cmd(group_by, start, end, days, project_id, statuses, trades, rebuild):
+    """Task hour distributions from the in-memory columnar snapshot."""
+    import time
+    from datetime import date, timedelta
+    from sitelog import db
+    from sitelog.analytics import load, summarize
+    if days is not None:
+        start = date.today() - timedelta(days=days)
+    began = time.perf_counter()
+    columns, added, rebuilt = load(rebuild=rebuild)
+    loaded = time.perf_counter()
+    mask = columns.select(start, end, project_id, statuses, trades)
+    rows = summarize(columns, group_by or ("trade",), mask)
+    done = time.perf_counter()
+    state = "rebuilt" if rebuilt else f"{added} new tasks"
+    click.echo(f"Snapshot: {len(columns):,} tasks, {columns.nbytes() / 1e6:.1f} MB ({state}, "
+               f"{loaded - began:.2f}s) | query {(done - loaded) * 1000:.0f} ms | {db.settings.analytics_path}")
+    if not rows:
+        click.echo("No tasks match.")
+        return
+    click.echo(f"\n--- Task hours by {', '.join(group_by or ('trade',))} ---")
+    for labels, s in rows:
+        click.echo(f"{' | '.join(labels)} | Tasks: {s['tasks']} | Hours: {s['hours']:.1f} | Mean: {s['mean']:.2f} "
+                   f"| p50: {s['p50']:.1f} | p90: {s['p90']:.1f} | Max: {s['max']:.1f}")
+    click.echo("---------------------\n")
+
+
+# ---------- Database ----------
+@cli.group()
+def db():
+    """Database maintenance and settings."""
+    pass
+
+@db.command("info")
+def db_info_cmd():
+    """Show the database URL, profile and the pragmas in effect."""
+    from sitelog.db import db_info
+    click.echo("\n--- Database ---")
+    for key, value in db_info().items():
+        click.echo(f"{key}: {value}")
+    click.echo("----------------\n")
+
+@db.command("upgrade")
+def db_upgrade():
+    """Add missing tables and indexes to an existing database."""
+    from sitelog.db import upgrade_db
+    created = upgrade_db()
+    if created:
+        click.echo(f"✅ Created: {', '.join(created)}")
+    else:
+        click.echo("✅ Database already up to date.")
+
+@db.command("reindex")
+def db_reindex():
+    """Rebuild the full-text search index from the logs and tasks."""
+    from sitelog.services import session_scope
+    from sitelog.search import rebuild_search
+    with session_scope() as session:
+        rebuild_search(session)
+    click.echo("✅ Search index rebuilt.")
+
+@db.command("explain")
+def db_explain():
+    """Check with EXPLAIN QUERY PLAN that the common lookups use their indexes."""
+    from sitelog.db import check_indexes
+    failed = 0
+    for name, index, plan, used in check_indexes():
+        mark = "✅" if used else "❌"
+        click.echo(f"{mark} {name} ({index})")
+        for line in plan:
+            click.echo(f"     {line}")
+        failed += not used
+    if failed:
+        click.echo(click.style(f"{failed} lookups are not using their index. Run 'db upgrade'.", fg="red"))
+        raise SystemExit(1)
+
+
+# ---------- HTTP API ----------
+@cli.command("serve")
+@click.option('--host', default="127.0.0.1", show_default=True, help="Address to listen on")
+@click.option('--port', type=int, default=8000, show_default=True, help="Port to listen on")
+@click.option('--threads', type=int, default=8, show_default=True,
+              help="Worker threads, each with its own pooled database connection")
+@click.option('--single-writer', is_flag=True,
+              help="Queue writes to one thread that commits them in groups (see sitelog.writer)")
+@click.option('--verbose', is_flag=True, help="Log every request to stderr")
+def serve(host, port, threads, single_writer, verbose):
+    """Serve the services as a JSON API over HTTP (see sitelog.api)."""
+    from sitelog.api import make_server
+    server, journal_mode = make_server(host, port, threads, verbose, single_writer)
+    if journal_mode.lower() != "wal":
+        click.echo(click.style(f"Warning: journal mode is {journal_mode}, so reads wait for writes. "
+                               "Use the balanced or safe profile.", fg="yellow"), err=True)
+    click.echo(f"Serving on http://{host}:{server.server_port} with {threads} threads (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ---------- Shell ----------
+@cli.command("shell")
+@click.argument('script', required=False, type=click.Path(dir_okay=False, allow_dash=True))
+@click.pass_context
+def shell_cmd(ctx, script):
+    """Run commands in one long-lived process, or a SCRIPT file of them in one transaction."""
+    from sitelog.shell import interact, source
+    group = ctx.find_root().command
+    if script is None:
+        interact(group)
+    elif not source(group, script):
+        raise SystemExit(1)
+
 # ---------- CLI Entry ----------
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,140 @@
+import os
+import tomllib
+from pathlib import Path
+
+# The database lives next to the package rather than in whatever directory the
+# CLI happens to be started from.
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "sitelog.db"
+CONFIG_FILES = (Path("sitelog.toml"), Path.home() / ".config" / "sitelog.toml")
+
+# Named sets of SQLite pragmas applied to every new connection.
+#   balanced - WAL with NORMAL sync: readers never block the writer, and a
+#              commit only fsyncs at checkpoints. The right choice for a few
+#              foremen writing at once.
+#   safe     - WAL with FULL sync, for machines that lose power.
+#   bulk     - for big imports on a copy of the data; a crash can lose the
+#              last transactions.
+#   legacy   - SQLite's own defaults (rollback journal).
+PROFILES = {
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # negative means KiB, so 64 MB
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 10000,
+    },
+    "bulk": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+
+class Settings:
+    def __init__(self, url, profile, pragmas, echo=False, source=None, archive_path=None, pool_size=None,
+                 analytics_path=None):
+        self.url = url
+        self.profile = profile
+        self.pragmas = pragmas
+        self.echo = echo
+        self.source = source  # config file the settings came from, if any
+        self.archive_path = archive_path  # SQLite file closed projects are archived to
+        self.pool_size = pool_size  # connections kept open; None is SQLAlchemy's default
+        self.analytics_path = analytics_path  # the analytics snapshot file
+
+    def __repr__(self):
+        return f"<Settings(url='{self.url}', profile='{self.profile}')>"
+
+
+def _truthy(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _companion_path(environ, file_config, source, url, variable, key, suffix):
+    """
+    Where a file that belongs with the database lives: the path in the
+    environment variable, else the config key (relative to the config file),
+    else next to a SQLite database file as <db name><suffix>.
+    """
+    if environ.get(variable):
+        return Path(environ[variable]).expanduser().resolve()
+    if file_config.get(key):
+        return Path(source).resolve().parent / Path(file_config[key]).expanduser()
+    if url.startswith("sqlite:///") and url != "sqlite:///:memory:":
+        db_path = Path(url[len("sqlite:///"):])
+        return db_path.with_name(f"{db_path.stem}{suffix}")
+    return None
+
+
+def load_settings(environ=None):
+    """
+    Builds the database settings. Values come from, in increasing priority:
+    built-in defaults, the [database] table of a sitelog.toml file (the path in
+    SITELOG_CONFIG, else ./sitelog.toml, else ~/.config/sitelog.toml) and the
+    SITELOG_DB_URL / SITELOG_DB_PATH / SITELOG_PROFILE / SITELOG_ECHO /
+    SITELOG_ARCHIVE_PATH / SITELOG_POOL_SIZE / SITELOG_ANALYTICS_PATH
+    environment variables.
+    """
+    environ = os.environ if environ is None else environ
+    source = None
+    file_config = {}
+    candidates = [Path(environ["SITELOG_CONFIG"])] if environ.get("SITELOG_CONFIG") else CONFIG_FILES
+    for candidate in candidates:
+        if candidate.is_file():
+            with candidate.open("rb") as f:
+                file_config = tomllib.load(f).get("database", {})
+            source = str(candidate)
+            break
+
+    url = file_config.get("url")
+    if file_config.get("path"):
+        # Relative paths in a config file are relative to that file
+        db_path = Path(file_config["path"]).expanduser()
+        url = f"sqlite:///{Path(source).resolve().parent / db_path}"
+    if environ.get("SITELOG_DB_URL"):
+        url = environ["SITELOG_DB_URL"]
+    elif environ.get("SITELOG_DB_PATH"):
+        url = f"sqlite:///{Path(environ['SITELOG_DB_PATH']).expanduser().resolve()}"
+    url = url or f"sqlite:///{DEFAULT_DB_PATH}"
+
+    profile = environ.get("SITELOG_PROFILE") or file_config.get("profile", DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'. Choose from: {', '.join(PROFILES)}")
+    pragmas = dict(PROFILES[profile])
+    pragmas.update(file_config.get("pragmas", {}))
+
+    echo = file_config.get("echo", False)
+    if "SITELOG_ECHO" in environ:
+        echo = environ["SITELOG_ECHO"]
+
+    db_suffix = Path(url).suffix or ".db"
+    archive_path = _companion_path(environ, file_config, source, url, "SITELOG_ARCHIVE_PATH", "archive_path",
+                                   f"-archive{db_suffix}")
+    analytics_path = _companion_path(environ, file_config, source, url, "SITELOG_ANALYTICS_PATH", "analytics_path",
+                                     "-analytics.snap")
+
+    pool_size = environ.get("SITELOG_POOL_SIZE") or file_config.get("pool_size")
+    pool_size = int(pool_size) if pool_size else None
+    return Settings(url, profile, pragmas, _truthy(echo), source, archive_path, pool_size, analytics_path)
@@ -1,25 +1,307 @@
-from sqlalchemy import create_engine
+import os
+import sqlite3
+
+from sqlalchemy import create_engine, event, inspect, select
 from sqlalchemy.orm import sessionmaker
-from sitelog.models import Base
+from sqlalchemy.schema import CreateTable
+from sitelog import cache
+from sitelog.config import load_settings
+from sitelog.changes import install_change_tracking, seed_changes
+from sitelog.models import Base, DailyLog, Task, Change
+from sitelog.search import SEARCH_TABLES, install_search, rebuild_search
+from sitelog.stats import install_triggers, rebuild_stats
+
+settings = load_settings()
+
+# Bump whenever the models, indexes or triggers change, so existing databases
+# get upgraded on their next run. Stored in SQLite's PRAGMA user_version.
+SCHEMA_VERSION = 6
+
+_engine = None
+
+
+def apply_pragmas(dbapi_connection, connection_record):
+    """
+    Applies the performance profile's pragmas to every new SQLite connection,
+    and turns on foreign keys, which the ON DELETE rules depend on.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    for name, value in settings.pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def attach_archive(dbapi_connection, connection_record):
+    """Attaches the archive database (see sitelog.archive), once it exists, as "archive"."""
+    path = settings.archive_path
+    if path is not None and path.exists():
+        cursor = dbapi_connection.cursor()
+        cursor.execute("ATTACH DATABASE ? AS archive", (str(path),))
+        cursor.close()
+
+
+def get_engine():
+    """
+    Returns the engine, creating it on first use. A new engine checks the
+    stored schema version and only runs the schema setup when it is out of
+    date, so ordinary commands skip create_all entirely.
+    """
+    global _engine
+    if _engine is None:
+        options = {}
+        if settings.pool_size and settings.url.startswith("sqlite:///") and settings.url != "sqlite:///:memory:":
+            # A fixed set of connections, e.g. one per server thread, so
+            # none of them ever waits for another to be opened
+            options = {"pool_size": settings.pool_size, "max_overflow": 0}
+        engine = create_engine(settings.url, echo=settings.echo, **options)
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", apply_pragmas)
+            event.listen(engine, "connect", attach_archive)
+        ensure_schema(engine)
+        _engine = engine
+    return _engine
 
-# Create the SQLite database engine
+def configure(url=None, profile=None, pool_size=None):
+    """
+    Points sitelog at another database, performance profile and/or
+    connection pool size, e.g. a scratch file in the benchmarks; whatever is
+    not given stays as it is. The current engine is disposed and the next
+    session opens the new one.
+    """
+    global settings, _engine
+    environ = dict(os.environ, SITELOG_DB_URL=url or settings.url, SITELOG_PROFILE=profile or settings.profile,
+                   SITELOG_POOL_SIZE=str(pool_size or settings.pool_size or ""))
+    settings = load_settings(environ)
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    SessionLocal.configure(bind=None)
+    cache.clear_all()
 
-engine = create_engine('sqlite:///sitelog.db', echo=True)
+
+@event.listens_for(Base.metadata, "after_create")
+def create_triggers(target, connection, **kw):
+    """
+    Tables are all there after create_all, so the summary triggers, the
+    full-text search tables and the change tracking triggers can be added.
+    All are SQLite specific.
+    """
+    if connection.dialect.name == "sqlite":
+        install_triggers(connection)
+        install_search(connection)
+        install_change_tracking(connection)
+
+
+class LazySessionmaker(sessionmaker):
+    """A sessionmaker that binds to the engine when the first session is made."""
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
 
 # Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) 
-# Create all tables in the database (if they don't exist yet)
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
+
+
+def schema_version(engine):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def ensure_schema(engine):
+    """Upgrades the schema unless the database says it is already current."""
+    if engine.dialect.name != "sqlite":
+        upgrade_db(engine)
+    elif schema_version(engine) < SCHEMA_VERSION:
+        upgrade_db(engine)
+
 def init_db():
     """
     Creates all defined database tables if they don't already exist.
-    This function should be run once to set up the database.
+    Opening the engine does this when needed, so calling it is optional.
+    """
+    upgrade_db(get_engine())
+
+def upgrade_db(engine=None):
+    """
+    Brings an existing database up to date with the models without touching
+    its rows: creates missing tables and indexes, then runs ANALYZE so the
+    query planner knows about them. A new summary table, search index or
+    change log is filled from the existing rows. Records SCHEMA_VERSION and returns the
+    names of the new tables and indexes.
     """
-    print("Attempting to create database tables...") 
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
     Base.metadata.create_all(bind=engine)
-    print("Database tables created or already existed.") 
+    created = [t.name for t in Base.metadata.sorted_tables if t.name not in existing_tables]
+    if engine.dialect.name == "sqlite":
+        created += [name for name in SEARCH_TABLES if name not in existing_tables]
+        stale = [t for t in Base.metadata.sorted_tables
+                 if t.name in existing_tables and needs_rebuild(engine, inspector, t)]
+        if stale:
+            rebuild_tables(engine, stale)
+            created += [f"{t.name} (rebuilt)" for t in stale]
+    with engine.begin() as conn:
+        if "project_day_stats" in created and existing_tables:
+            rebuild_stats(conn)
+        if any(name in created for name in SEARCH_TABLES) and existing_tables:
+            rebuild_search(conn)
+        if "changes" in created and existing_tables:
+            seed_changes(conn)
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+            version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+            conn.exec_driver_sql(f"PRAGMA user_version = {max(version, SCHEMA_VERSION)}")
+    return created
+
+def needs_rebuild(engine, inspector, table):
+    """
+    True when the stored table lacks the models' ON DELETE rules or
+    AUTOINCREMENT. SQLite cannot ALTER either, so such tables are rebuilt.
+    """
+    def rules(foreign_keys):
+        return {(tuple(columns), (ondelete or "NO ACTION").upper()) for columns, ondelete in foreign_keys}
+    stored = rules((fk["constrained_columns"], fk["options"].get("ondelete")) for fk in inspector.get_foreign_keys(table.name))
+    wanted = rules(([c.name for c in fk.columns], fk.ondelete) for fk in table.foreign_key_constraints)
+    if stored != wanted:
+        return True
+    with engine.connect() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (table.name,)).scalar()
+    return ("AUTOINCREMENT" in ddl.upper()) != bool(table.dialect_options["sqlite"]["autoincrement"])
+
+def rebuild_tables(engine, tables):
+    """
+    Recreates tables from the models, keeping every row and id, by SQLite's
+    create, copy, drop and rename procedure in one transaction with foreign
+    keys off. Triggers name the tables in their bodies, so all of them are
+    dropped first and put back at the end along with the indexes.
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            conn.exec_driver_sql("BEGIN")
+            triggers = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars().all()
+            for name in triggers:
+                conn.exec_driver_sql(f"DROP TRIGGER {name}")
+            for table in tables:
+                stored = {c["name"] for c in inspect(conn).get_columns(table.name)}
+                columns = ", ".join(c.name for c in table.columns if c.name in stored)
+                ddl = str(CreateTable(table).compile(conn))
+                conn.exec_driver_sql(ddl.replace(f"TABLE {table.name} ", f"TABLE new_{table.name} ", 1))
+                conn.exec_driver_sql(f"INSERT INTO new_{table.name} ({columns}) SELECT {columns} FROM {table.name}")
+                conn.exec_driver_sql(f"DROP TABLE {table.name}")
+                conn.exec_driver_sql(f"ALTER TABLE new_{table.name} RENAME TO {table.name}")
+                for index in table.indexes:
+                    index.create(conn)
+            install_triggers(conn)
+            install_search(conn)
+            install_change_tracking(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+            conn.commit()
+
+# The lookups the indexes exist for, with the index each one should use
+INDEX_CHECKS = {
+    "logs of a project by date": (
+        select(DailyLog).where(DailyLog.project_id == 1).order_by(DailyLog.date),
+        "ix_daily_logs_project_date"),
+    "page of logs in date order": (
+        select(DailyLog).where(DailyLog.date > "2024-01-01").order_by(DailyLog.date, DailyLog.id).limit(500),
+        "ix_daily_logs_date"),
+    "tasks of a log": (
+        select(Task).where(Task.log_id == 1),
+        "ix_tasks_log_id"),
+    "pending tasks of a worker": (
+        select(Task).where(Task.worker_id == 1, Task.status == "pending"),
+        "ix_tasks_worker_status"),
+    "tasks by status": (
+        select(Task).where(Task.status == "pending"),
+        "ix_tasks_status"),
+    "latest change to a row": (
+        select(Change).where(Change.entity == "tasks", Change.row_id == 1),
+        "ux_changes_entity_row"),
+}
+
+def explain_query_plan(statement):
+    """
+    Returns SQLite's EXPLAIN QUERY PLAN lines for a SQLAlchemy statement.
+
+    The plan is taken on an empty in-memory copy of the database's schema. On
+    a small database with ANALYZE statistics SQLite rightly prefers a plain
+    scan, which would hide whether the index is usable once the data grows.
+    """
+    engine = get_engine()
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'"
+        ).all()
+    # A virtual table creates its own shadow tables (log_search_data, ...)
+    virtual = [name for name, ddl in rows if ddl.upper().startswith("CREATE VIRTUAL TABLE")]
+    schema = [ddl for name, ddl in rows if not any(name.startswith(f"{v}_") for v in virtual)]
+    scratch = sqlite3.connect(":memory:")
+    try:
+        for ddl in schema:
+            scratch.execute(ddl)
+        rows = scratch.execute(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+    finally:
+        scratch.close()
+    return [row[-1] for row in rows]
+
+def check_indexes():
+    """Yields (lookup, expected index, plan lines, whether the index is used)."""
+    for name, (statement, index) in INDEX_CHECKS.items():
+        plan = explain_query_plan(statement)
+        yield name, index, plan, any(index in line for line in plan)
+
+# PRAGMA reads return numbers for these; show the names the profiles use
+PRAGMA_NAMES = {
+    "synchronous": {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"},
+    "temp_store": {0: "DEFAULT", 1: "FILE", 2: "MEMORY"},
+}
+
+def db_info():
+    """Returns the database settings, with pragma values as SQLite reports them."""
+    info = {
+        "url": settings.url,
+        "config file": settings.source or "(none)",
+        "profile": settings.profile,
+        "echo": settings.echo,
+    }
+    engine = get_engine()
+    info["connection pool"] = engine.pool.status()
+    info["schema version"] = schema_version(engine) if engine.dialect.name == "sqlite" else "-"
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            for name in settings.pragmas:
+                value = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                info[name] = PRAGMA_NAMES.get(name, {}).get(value, value)
+            info["sqlite version"] = conn.exec_driver_sql("SELECT sqlite_version()").scalar()
+    return info
+
+def __getattr__(name):
+    # engine and session used to be created at import time; keep the names
+    # working for old callers without paying for them on every import.
+    if name == "engine":
+        return get_engine()
+    if name == "session":
+        global session
+        session = SessionLocal()
+        return session
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # This block makes the init_db() function run when the script is executed directly
 if __name__ == "__main__":
     init_db()
-
-session = SessionLocal()
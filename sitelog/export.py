@@ -0,0 +1,128 @@
+import csv
+import gzip
+import json
+import sys
+from contextlib import contextmanager
+
+from sqlalchemy import exists, select
+
+from sitelog.archive import with_archive
+from sitelog.models import Project, DailyLog, Worker, Task
+from sitelog.services import session_scope
+
+CHUNK_SIZE = 5000
+
+# The "task ledger": one row per task with its log, project and worker
+LEDGER_COLUMNS = (
+    Task.id.label("task_id"),
+    DailyLog.date.label("date"),
+    Project.id.label("project_id"),
+    Project.name.label("project"),
+    Worker.id.label("worker_id"),
+    Worker.name.label("worker"),
+    Worker.trade.label("trade"),
+    Task.description.label("description"),
+    Task.hours.label("hours"),
+    Task.status.label("status"),
+    DailyLog.id.label("log_id"),
+)
+
+
+def _tasks_on_logs(*conditions):
+    """EXISTS a task on a daily log matching conditions, for the worker export."""
+    return exists().where(Task.worker_id == Worker.id, Task.log_id == DailyLog.id, *conditions)
+
+def export_query(entity, since=None, project_id=None):
+    """
+    Builds the SELECT for one export. since keeps rows from logs dated on or
+    after it (projects still running then, workers who worked then); project_id
+    keeps rows belonging to that project. Both are applied in SQL.
+    """
+    if entity == "projects":
+        query = select(Project.__table__).order_by(Project.id)
+        if since:
+            query = query.where((Project.end_date >= since) | Project.end_date.is_(None))
+        if project_id is not None:
+            query = query.where(Project.id == project_id)
+    elif entity == "daily-logs":
+        query = select(DailyLog.__table__).order_by(DailyLog.id)
+        if since:
+            query = query.where(DailyLog.date >= since)
+        if project_id is not None:
+            query = query.where(DailyLog.project_id == project_id)
+    elif entity == "workers":
+        query = select(Worker.__table__).order_by(Worker.id)
+        conditions = []
+        if since:
+            conditions.append(DailyLog.date >= since)
+        if project_id is not None:
+            conditions.append(DailyLog.project_id == project_id)
+        if conditions:
+            query = query.where(_tasks_on_logs(*conditions))
+    elif entity in ("tasks", "ledger"):
+        columns = LEDGER_COLUMNS if entity == "ledger" else Task.__table__.columns
+        query = select(*columns).select_from(Task).order_by(Task.id)
+        if entity == "ledger" or since or project_id is not None:
+            query = query.outerjoin(DailyLog, Task.log_id == DailyLog.id)
+        if entity == "ledger":
+            query = (query.outerjoin(Project, DailyLog.project_id == Project.id)
+                          .outerjoin(Worker, Task.worker_id == Worker.id))
+        if since:
+            query = query.where(DailyLog.date >= since)
+        if project_id is not None:
+            query = query.where(DailyLog.project_id == project_id)
+    else:
+        raise ValueError(f"Unknown export: {entity}")
+    return query
+
+
+@contextmanager
+def open_output(path, compress=None):
+    """Opens path for text output, gzipped when asked or when it ends in .gz; '-' is stdout."""
+    if path in (None, "-"):
+        if compress:
+            with gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", newline="") as f:
+                yield f
+        else:
+            yield sys.stdout
+        return
+    if compress or (compress is None and str(path).endswith(".gz")):
+        f = gzip.open(path, "wt", encoding="utf-8", newline="")
+    else:
+        f = open(path, "w", encoding="utf-8", newline="")
+    with f:
+        yield f
+
+
+def write_rows(f, fmt, keys, chunks):
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(f)
+        writer.writerow(keys)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            count += len(chunk)
+    elif fmt == "jsonl":
+        for chunk in chunks:
+            for row in chunk:
+                f.write(json.dumps(dict(zip(keys, row)), default=str))
+                f.write("\n")
+            count += len(chunk)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return count
+
+
+def export(entity, f, fmt="csv", since=None, project_id=None, chunk_size=CHUNK_SIZE, include_archive=False):
+    """
+    Streams an entity (or the task ledger) to the open text file f as CSV or
+    JSONL. Rows come from a server-side cursor chunk_size at a time as plain
+    tuples, so memory stays flat whatever the table size. include_archive
+    adds archived logs and tasks. Returns the row count.
+    """
+    query = export_query(entity, since, project_id)
+    if include_archive:
+        query = with_archive(query)
+    with session_scope() as session:
+        result = session.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+        return write_rows(f, fmt, list(result.keys()), result.partitions())
@@ -0,0 +1,196 @@
+import csv
+import json
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import insert, select
+
+from sitelog.db import SessionLocal
+from sitelog.models import Project, DailyLog, Worker, Task
+
+# Column name -> converter for every importable entity. Converters raise
+# ValueError on bad input, which turns the row into a rejected row.
+def _int(value):
+    # int() would truncate 6.5 from JSON and turn true into 1
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    return int(value)
+
+def _date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+def _str(value):
+    return str(value)
+
+ENTITIES = {
+    "projects": (Project, {
+        "id": _int, "name": _str, "location": _str,
+        "start_date": _date, "end_date": _date,
+    }, ("name",)),
+    "daily-logs": (DailyLog, {
+        "id": _int, "date": _date, "weather": _str,
+        "summary": _str, "project_id": _int,
+    }, ("date", "project_id")),
+    "workers": (Worker, {
+        "id": _int, "name": _str, "trade": _str, "contact": _str,
+    }, ("name",)),
+    "tasks": (Task, {
+        "id": _int, "description": _str, "hours": _int, "status": _str,
+        "log_id": _int, "worker_id": _int,
+    }, ("description", "log_id", "worker_id")),
+}
+
+# Foreign key column -> the model it points at. Foreign keys are enforced,
+# so rows pointing at a missing row are rejected instead of failing a batch.
+REFERENCES = {
+    "daily-logs": {"project_id": Project},
+    "tasks": {"log_id": DailyLog, "worker_id": Worker},
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = []  # (line number, reason, raw row)
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+
+def iter_rows(path, fmt=None):
+    """
+    Yields (line number, row dict) from a CSV or JSONL file one row at a time.
+    The format is taken from the file extension unless given explicitly.
+    """
+    path = Path(path)
+    fmt = fmt or ("jsonl" if path.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+    with path.open(newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            # Line 1 is the header, so data starts on line 2
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        elif fmt == "jsonl":
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, ValueError(f"invalid JSON: {e}")
+                    continue
+                yield line_no, row
+        else:
+            raise ValueError(f"Unknown import format: {fmt}")
+
+
+def validate_row(entity, row):
+    """Returns a dict of converted column values, or raises ValueError."""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    _, columns, required = ENTITIES[entity]
+    # Every row carries every column so a batch can go out as one executemany
+    values = dict.fromkeys(columns)
+    for key, value in row.items():
+        if key not in columns:
+            raise ValueError(f"unknown column '{key}'")
+        # Empty CSV cells mean "no value"
+        if value is None or value == "":
+            continue
+        try:
+            values[key] = columns[key](value)
+        except (TypeError, ValueError):
+            raise ValueError(f"bad value for '{key}': {value!r}")
+    missing = [c for c in required if values[c] is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    return values
+
+def check_references(session, entity, batch):
+    """
+    Splits a batch of (line number, values, row) into rows that can be
+    inserted and (line number, reason, row) rejections: rows whose id is
+    taken, by an existing row or an earlier row of the batch, or whose
+    foreign keys don't exist. One query for the ids and one per key.
+    """
+    model = ENTITIES[entity][0]
+    ids = {values["id"] for _, values, _ in batch if values["id"] is not None}
+    # Earlier batches were inserted in this transaction, so they count as existing
+    taken = set(session.scalars(select(model.id).where(model.id.in_(ids)))) if ids else set()
+    missing = {}
+    for column, target in REFERENCES.get(entity, {}).items():
+        ref_ids = {values[column] for _, values, _ in batch if values[column] is not None}
+        if ref_ids:
+            found = set(session.scalars(select(target.id).where(target.id.in_(ref_ids))))
+            missing[column] = ref_ids - found
+    kept, rejected = [], []
+    for line_no, values, row in batch:
+        if values["id"] is not None:
+            if values["id"] in taken:
+                rejected.append((line_no, f"id {values['id']} already exists", row))
+                continue
+            taken.add(values["id"])
+        bad = [c for c, absent in missing.items() if values[c] in absent]
+        if bad:
+            rejected.append((line_no, ", ".join(f"{c} {values[c]} does not exist" for c in bad), row))
+        else:
+            kept.append(values)
+    return kept, rejected
+
+
+def import_rows(entity, rows, batch_size=1000, commit_size=None):
+    """
+    Validates and bulk inserts (line number, row) pairs for one entity.
+
+    Rows are sent to the database in executemany batches of batch_size. With
+    commit_size left as None everything goes in one transaction; otherwise the
+    transaction is committed every commit_size rows.
+    """
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity: {entity}")
+    model = ENTITIES[entity][0]
+    result = ImportResult()
+    started = time.perf_counter()
+    session = SessionLocal()
+    batch = []
+    uncommitted = 0
+
+    def flush(batch):
+        kept, rejected = check_references(session, entity, batch)
+        result.rejected.extend(rejected)
+        if kept:
+            session.execute(insert(model), kept)
+        result.inserted += len(kept)
+        return len(kept)
+
+    try:
+        for line_no, row in rows:
+            try:
+                batch.append((line_no, validate_row(entity, row), row))
+            except ValueError as e:
+                result.rejected.append((line_no, str(e), row))
+                continue
+            if len(batch) >= batch_size:
+                uncommitted += flush(batch)
+                batch = []
+            if commit_size and uncommitted >= commit_size:
+                session.commit()
+                uncommitted = 0
+        if batch:
+            flush(batch)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        result.elapsed = time.perf_counter() - started
+    return result
+
+
+def import_file(entity, path, fmt=None, batch_size=1000, commit_size=None):
+    return import_rows(entity, iter_rows(path, fmt), batch_size, commit_size)
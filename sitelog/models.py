@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
+from sqlalchemy.orm import backref, declarative_base, relationship
 
 Base = declarative_base()
 
@@ -22,9 +22,20 @@ class DailyLog(Base):
     date = Column(Date)
     weather = Column(String)
     summary = Column(String)
-    project_id = Column(Integer, ForeignKey('projects.id'))
+    project_id = Column(Integer, ForeignKey('projects.id', ondelete='CASCADE'))
 
-    project = relationship('Project', backref='daily_logs')
+    # Deleting a project deletes its logs, and their tasks, in the database
+    # (ON DELETE CASCADE); passive_deletes keeps the ORM from loading them first.
+    project = relationship('Project', backref=backref('daily_logs', cascade='all, delete-orphan', passive_deletes=True))
+
+    __table_args__ = (
+        # A project's logs by date, and all logs in date order
+        Index('ix_daily_logs_project_date', 'project_id', 'date'),
+        Index('ix_daily_logs_date', 'date'),
+        # Never reuse the id of a deleted or archived log, so ids stay unique
+        # across the main and archive databases
+        {'sqlite_autoincrement': True},
+    )
 
     def __repr__(self):
         return f"<DailyLog(id={self.id}, date={self.date}, project_id={self.project_id})>"
@@ -47,12 +58,60 @@ class Task(Base):
     description = Column(String)
     hours = Column(Integer)
     status = Column(String)  # e.g., 'pending', 'completed'
-    log_id = Column(Integer, ForeignKey('daily_logs.id'))
-    worker_id = Column(Integer, ForeignKey('workers.id'))
+    log_id = Column(Integer, ForeignKey('daily_logs.id', ondelete='CASCADE'))
+    # A deleted worker's tasks stay in the record, unassigned
+    worker_id = Column(Integer, ForeignKey('workers.id', ondelete='SET NULL'))
+
+    log = relationship('DailyLog', backref=backref('tasks', cascade='all, delete-orphan', passive_deletes=True))
+    worker = relationship('Worker', backref=backref('tasks', passive_deletes=True))
 
-    log = relationship('DailyLog', backref='tasks')
-    worker = relationship('Worker', backref='tasks')
+    __table_args__ = (
+        # A log's tasks, a worker's tasks (optionally by status), and tasks by status
+        Index('ix_tasks_log_id', 'log_id'),
+        Index('ix_tasks_worker_status', 'worker_id', 'status'),
+        Index('ix_tasks_status', 'status'),
+        {'sqlite_autoincrement': True},
+    )
 
     def __repr__(self):
         return f"<Task(id={self.id}, desc='{self.description}', worker_id={self.worker_id})>"
 
+class ProjectDayStat(Base):
+    """
+    Per project and log date task counts and hours, kept current by the
+    SQLite triggers in sitelog.stats.
+    """
+    __tablename__ = 'project_day_stats'
+
+    project_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    tasks = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    pending = Column(Integer, nullable=False, default=0)
+    hours = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProjectDayStat(project_id={self.project_id}, day={self.day}, tasks={self.tasks}, hours={self.hours})>"
+
+class Change(Base):
+    """
+    The latest change to each project, daily log, worker and task, recorded
+    by the SQLite triggers in sitelog.changes. seq grows with every change.
+    """
+    __tablename__ = 'changes'
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # the changed row's table
+    row_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # 'insert', 'update', 'delete' or 'archive'
+    changed_at = Column(String, nullable=False)  # UTC, ISO 8601
+
+    __table_args__ = (
+        # One entry per row: a new change replaces the row's previous one
+        Index('ux_changes_entity_row', 'entity', 'row_id', unique=True),
+        # Never hand out a sequence number twice, so cursors stay valid
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f"<Change(seq={self.seq}, entity='{self.entity}', row_id={self.row_id}, op='{self.op}')>"
@@ -0,0 +1,157 @@
+"""
+Query instrumentation built on SQLAlchemy engine and pool events.
+
+A Profiler records every statement any engine runs while it is started:
+how long it took and how many rows it returned. Its report groups identical
+statements, which shows N+1 patterns (one statement run once per row) at a
+glance. Statements slower than a threshold can be appended to a slow-query
+log together with SQLite's query plan, where a "SCAN table" line is a full
+table scan.
+
+Times cover executing a statement up to its first row. SQLite produces the
+remaining rows as they are fetched, so that time shows up in the wall time.
+
+    profiler = Profiler(slow_log="slow.log", slow_ms=50).start()
+    ...
+    print(profiler.report("show-tasks"))
+    profiler.stop()
+"""
+import sqlite3
+import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+SLOW_MS = 100
+# A statement run this often in one command, a row or less at a time, is
+# reported as a likely N+1 pattern. Keyset paging also repeats a statement,
+# but fetches whole pages each time.
+REPEAT_WARNING = 10
+
+
+class QueryStat:
+    def __init__(self, statement, parameters):
+        self.statement = statement
+        self.parameters = parameters
+        self.duration = 0.0
+        self.rows = 0
+
+    def __repr__(self):
+        return f"<QueryStat({self.duration * 1000:.2f} ms, {self.rows} rows: {self.statement[:40]!r})>"
+
+
+class Profiler:
+    def __init__(self, slow_log=None, slow_ms=SLOW_MS):
+        self.slow_log = slow_log
+        self.slow_ms = slow_ms
+        self.label = None  # written to the slow-query log with each statement
+        self.queries = []
+        self.started = None
+        self._lock = threading.Lock()
+        self._cursors = weakref.WeakKeyDictionary()  # DBAPI cursor -> its QueryStat
+
+    # --- Events ---
+    def start(self):
+        self.started = time.perf_counter()
+        event.listen(Engine, "before_cursor_execute", self._before_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_execute)
+        event.listen(Pool, "checkout", self._checkout)
+        event.listen(Pool, "checkin", self._checkin)
+        return self
+
+    def stop(self):
+        event.remove(Engine, "before_cursor_execute", self._before_execute)
+        event.remove(Engine, "after_cursor_execute", self._after_execute)
+        event.remove(Pool, "checkout", self._checkout)
+        event.remove(Pool, "checkin", self._checkin)
+
+    def reset(self):
+        with self._lock:
+            self.queries = []
+        self.started = time.perf_counter()
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        # sqlite3 calls the row factory once per fetched row, which gives an
+        # exact row count for each statement without touching the results.
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            dbapi_connection.row_factory = self._count_row
+
+    def _checkin(self, dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            dbapi_connection.row_factory = None
+
+    def _count_row(self, cursor, row):
+        stat = self._cursors.get(cursor)
+        if stat is not None:
+            stat.rows += 1
+        return row
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stat = QueryStat(statement, parameters)
+        if isinstance(cursor, sqlite3.Cursor):
+            self._cursors[cursor] = stat
+        conn.info.setdefault("sitelog_profile", []).append((stat, time.perf_counter()))
+        with self._lock:
+            self.queries.append(stat)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        pending = conn.info.get("sitelog_profile")
+        if not pending:
+            return  # started before the profiler was
+        stat, started = pending.pop()
+        stat.duration = time.perf_counter() - started
+        if not isinstance(cursor, sqlite3.Cursor) and cursor.rowcount and cursor.rowcount > 0:
+            stat.rows = cursor.rowcount
+        if self.slow_log and stat.duration * 1000 >= self.slow_ms:
+            self._log_slow(conn, stat)
+
+    def _log_slow(self, conn, stat):
+        plan = []
+        if conn.dialect.name == "sqlite" and stat.statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            try:
+                raw = conn.connection.dbapi_connection
+                rows = raw.execute(f"EXPLAIN QUERY PLAN {stat.statement}", stat.parameters or ()).fetchall()
+                plan = [row[-1] for row in rows]
+            except Exception:
+                pass  # the plan is a nice-to-have; never break the query
+        lines = [f"{datetime.now().isoformat(timespec='seconds')} {self.label or '-'} "
+                 f"{stat.duration * 1000:.1f} ms (statement only, rows not yet fetched)",
+                 f"  {' '.join(stat.statement.split())}",
+                 f"  params: {stat.parameters!r}"]
+        lines += [f"  plan: {line}" for line in plan]
+        with self._lock, open(self.slow_log, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n\n")
+
+    # --- Results ---
+    def totals(self):
+        """Returns (queries, seconds spent in them, rows returned)."""
+        queries = list(self.queries)
+        return len(queries), sum(q.duration for q in queries), sum(q.rows for q in queries)
+
+    def by_statement(self):
+        """Groups identical SQL: [(statement, times run, total seconds, total rows)], most time first."""
+        groups = defaultdict(lambda: [0, 0.0, 0])
+        for q in list(self.queries):
+            group = groups[q.statement]
+            group[0] += 1
+            group[1] += q.duration
+            group[2] += q.rows
+        return sorted(((s, *g) for s, g in groups.items()), key=lambda g: g[2], reverse=True)
+
+    def report(self, label=None, top=5):
+        count, seconds, rows = self.totals()
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        lines = [f"Profile{f' of {label}' if label else ''}: {count} queries, "
+                 f"{seconds * 1000:.1f} ms executing SQL, {rows} rows, {wall * 1000:.1f} ms wall"]
+        for statement, runs, total, returned in self.by_statement()[:top]:
+            sql = " ".join(statement.split())
+            lines.append(f"  {runs:5d}x {total * 1000:9.2f} ms {returned:8d} rows  {sql[:90]}")
+            if runs >= REPEAT_WARNING and returned <= runs:
+                lines.append(f"         ^ ran {runs} times, possibly an N+1 pattern")
+        return "\n".join(lines)
+
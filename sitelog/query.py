@@ -0,0 +1,124 @@
+"""
+Query building shared by the list functions of sitelog.services,
+sitelog.records and sitelog.async_services: the WHERE clauses for their
+filters and keyset pagination.
+
+Keyset pagination orders by a unique key and resumes each page after the
+last key of the previous one, rather than using OFFSET, so every page costs
+the same however deep into the table it is. The caller supplies the query
+for one page; iter_keyset() and aiter_keyset() drive the pages.
+
+    def fetch(after, size):
+        query = select(Task).where(*filters(Task, {"status": "pending"}, project_id=3))
+        if after is not None:
+            query = query.where(after_clause((Task.id,), after))
+        with session_scope() as session:
+            return session.scalars(query.order_by(Task.id).limit(size)).all()
+
+    for task in iter_keyset(fetch, lambda task: (task.id,), after=120, limit=50):
+        ...
+"""
+from sqlalchemy import and_, inspect, or_, select
+
+from sitelog.archive import archived
+from sitelog.models import DailyLog, Project, Task
+
+CHUNK_SIZE = 500
+
+
+# --- Filters ---
+def log_filters(logs, project_id=None, start=None, end=None):
+    """WHERE clauses on daily logs for a project and an inclusive date range."""
+    conditions = []
+    if project_id is not None:
+        conditions.append(logs.project_id == project_id)
+    if start is not None:
+        conditions.append(logs.date >= start)
+    if end is not None:
+        conditions.append(logs.date <= end)
+    return conditions
+
+def filters(model, where=None, project_id=None, start=None, end=None):
+    """
+    WHERE clauses from {column: value}: a list or tuple is an IN, None is
+    IS NULL. project_id and the start/end dates filter daily logs, and tasks
+    through their log; project_id alone also picks out a project. model may
+    be an archived() entity.
+    """
+    mapper = inspect(model).mapper
+    conditions = []
+    for key, value in (where or {}).items():
+        if key not in mapper.columns:
+            raise ValueError(f"Unknown column for {mapper.local_table.name}: {key}")
+        column = getattr(model, key)
+        if value is None:
+            conditions.append(column.is_(None))
+        elif isinstance(value, (list, tuple)):
+            conditions.append(column.in_(value))
+        else:
+            conditions.append(column == value)
+    if project_id is None and start is None and end is None:
+        return conditions
+    if mapper.class_ is DailyLog:
+        conditions.extend(log_filters(model, project_id, start, end))
+    elif mapper.class_ is Task:
+        # Served by ix_daily_logs_project_date, then ix_tasks_log_id
+        logs = DailyLog if model is Task else archived(DailyLog)
+        conditions.append(model.log_id.in_(select(logs.id).where(*log_filters(logs, project_id, start, end))))
+    elif mapper.class_ is Project and start is None and end is None:
+        conditions.append(model.id == project_id)
+    else:
+        raise ValueError(f"{mapper.local_table.name} cannot be filtered by project or date")
+    return conditions
+
+
+# --- Keyset pagination ---
+def after_clause(columns, values):
+    """
+    Builds "row comes after values" for an ORDER BY over columns, i.e. a
+    lexicographic greater-than that follows SQLite's NULLs-first ordering.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [c.is_(None) if v is None else c == v
+                 for c, v in zip(columns[:i], values[:i])]
+        greater = column.is_not(None) if value is None else column > value
+        clauses.append(and_(*equal, greater))
+    return or_(*clauses)
+
+def cursor(after):
+    """A cursor as a key tuple: a bare id or date becomes a one-column prefix."""
+    return after if after is None or isinstance(after, tuple) else (after,)
+
+def iter_keyset(fetch, key, after=None, limit=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields up to limit rows, chunk_size per page. fetch(after, size) returns
+    the page of at most size rows following the after cursor (None for the
+    first page), and key(row) a row's cursor.
+    """
+    after = cursor(after)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows = fetch(after, size)
+        yield from rows
+        if len(rows) < size:
+            return
+        after = key(rows[-1])
+        if remaining is not None:
+            remaining -= len(rows)
+
+async def aiter_keyset(fetch, key, after=None, limit=None, chunk_size=CHUNK_SIZE):
+    """iter_keyset() for a coroutine function fetch, as an async generator."""
+    after = cursor(after)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows = await fetch(after, size)
+        for row in rows:
+            yield row
+        if len(rows) < size:
+            return
+        after = key(rows[-1])
+        if remaining is not None:
+            remaining -= len(rows)
@@ -0,0 +1,125 @@
+"""
+Read-only records for listing rows, built straight from column queries.
+
+The iter_*/list_* functions here mirror the ones in sitelog.services (same
+arguments, filters, ordering and cursors) but select only the columns and
+return named tuples instead of ORM objects: no identity map, no
+instrumentation, no lazy loading to trip over once the session is gone.
+Records are immutable and about a third the size of an ORM object.
+TaskDetail carries the task's log date, project and worker names
+flattened in, from one joined SELECT.
+
+Use these for showing rows; use the services when a row is going to be
+changed.
+
+    for task in iter_task_details(project_id=3):
+        print(task.id, task.worker_name, task.log_date)
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from sitelog.archive import archived
+from sitelog.models import Project, DailyLog, Worker, Task
+from sitelog.query import CHUNK_SIZE, after_clause, filters, iter_keyset
+from sitelog.services import session_scope
+
+
+def _record(name, model, extra=()):
+    """A named tuple type with model's columns, then extra fields. __slots__ = () keeps it dict-free."""
+    fields = tuple(model.__table__.columns.keys()) + tuple(extra)
+    return type(name, (namedtuple(name, fields),), {"__slots__": ()})
+
+ProjectRecord = _record("ProjectRecord", Project)
+DailyLogRecord = _record("DailyLogRecord", DailyLog)
+WorkerRecord = _record("WorkerRecord", Worker)
+TaskRecord = _record("TaskRecord", Task)
+TaskDetail = _record("TaskDetail", Task, ("log_date", "project_id", "project_name", "worker_name", "worker_trade"))
+
+
+def _columns(model, record):
+    """model's columns in the record's field order. model may be an archived() entity."""
+    return [getattr(model, name) for name in record._fields]
+
+def _iter_records(statement, record, order_by, after=None, limit=None, chunk_size=CHUNK_SIZE):
+    """
+    Streams records through query.iter_keyset(), from a Core SELECT of the
+    record's fields. order_by must be columns of those fields.
+    """
+    keys = [column.key for column in order_by]
+
+    def fetch(after, size):
+        query = statement if after is None else statement.where(after_clause(order_by, after))
+        with session_scope() as session:
+            return list(map(record._make, session.execute(query.order_by(*order_by).limit(size))))
+    return iter_keyset(fetch, lambda row: tuple(getattr(row, key) for key in keys), after, limit, chunk_size)
+
+
+# --- Projects and workers ---
+def iter_projects(after=None, limit=None, chunk_size=CHUNK_SIZE, where=None):
+    """Streams ProjectRecords ordered by id, starting after an id."""
+    statement = select(*_columns(Project, ProjectRecord)).where(*filters(Project, where))
+    return _iter_records(statement, ProjectRecord, (Project.id,), after, limit, chunk_size)
+
+def list_projects(after=None, limit=None, where=None):
+    return list(iter_projects(after, limit, where=where))
+
+def iter_workers(after=None, limit=None, chunk_size=CHUNK_SIZE, where=None):
+    """Streams WorkerRecords ordered by id, starting after an id."""
+    statement = select(*_columns(Worker, WorkerRecord)).where(*filters(Worker, where))
+    return _iter_records(statement, WorkerRecord, (Worker.id,), after, limit, chunk_size)
+
+def list_workers(after=None, limit=None, where=None):
+    return list(iter_workers(after, limit, where=where))
+
+
+# --- Daily logs and tasks ---
+def iter_daily_logs(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+                    where=None, project_id=None, start=None, end=None):
+    """Streams DailyLogRecords like services.iter_daily_logs, by (date, id)."""
+    logs = archived(DailyLog) if include_archive else DailyLog
+    statement = select(*_columns(logs, DailyLogRecord)).where(*filters(logs, where, project_id, start, end))
+    return _iter_records(statement, DailyLogRecord, (logs.date, logs.id), after, limit, chunk_size)
+
+def list_daily_logs(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                    start=None, end=None):
+    return list(iter_daily_logs(after, limit, include_archive=include_archive, where=where,
+                                project_id=project_id, start=start, end=end))
+
+def iter_tasks(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+               where=None, project_id=None, start=None, end=None):
+    """Streams TaskRecords like services.iter_tasks, by id."""
+    tasks = archived(Task) if include_archive else Task
+    statement = select(*_columns(tasks, TaskRecord)).where(*filters(tasks, where, project_id, start, end))
+    return _iter_records(statement, TaskRecord, (tasks.id,), after, limit, chunk_size)
+
+def list_tasks(after=None, limit=None, include_archive=False, where=None, project_id=None,
+               start=None, end=None):
+    return list(iter_tasks(after, limit, include_archive=include_archive, where=where,
+                           project_id=project_id, start=start, end=end))
+
+def iter_task_details(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+                      where=None, project_id=None, start=None, end=None):
+    """
+    Streams TaskDetails: the task's columns plus its log's date and project
+    and its worker's name and trade, joined in the same SELECT. Arguments as
+    for iter_tasks.
+    """
+    tasks = archived(Task) if include_archive else Task
+    logs = archived(DailyLog) if include_archive else DailyLog
+    statement = (
+        select(*_columns(tasks, TaskRecord), logs.date.label("log_date"), logs.project_id,
+               Project.name.label("project_name"), Worker.name.label("worker_name"),
+               Worker.trade.label("worker_trade"))
+        .select_from(tasks)
+        .outerjoin(logs, logs.id == tasks.log_id)
+        .outerjoin(Project, Project.id == logs.project_id)
+        .outerjoin(Worker, Worker.id == tasks.worker_id)
+        .where(*filters(tasks, where, project_id, start, end))
+    )
+    return _iter_records(statement, TaskDetail, (tasks.id,), after, limit, chunk_size)
+
+def list_task_details(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                      start=None, end=None):
+    return list(iter_task_details(after, limit, include_archive=include_archive, where=where,
+                                  project_id=project_id, start=start, end=end))
@@ -0,0 +1,87 @@
+from sqlalchemy import Integer, cast, func, select
+
+from sitelog.archive import archived, with_archive
+from sitelog.models import Project, DailyLog, Worker, Task, ProjectDayStat
+from sitelog.services import session_scope
+
+# ISO 8601 week of a log date, e.g. "2024-W09". The Thursday of a date's week
+# always falls in the week's ISO year, and its day of the year gives the week.
+_thursday = func.date(DailyLog.date, "-3 days", "weekday 4")
+ISO_WEEK = func.printf(
+    "%s-W%02d",
+    func.strftime("%Y", _thursday),
+    (cast(func.strftime("%j", _thursday), Integer) + 6) // 7,
+)
+
+# Grouping name -> labelled columns it adds to the report
+GROUPINGS = {
+    "project": (Project.id.label("project_id"), Project.name.label("project")),
+    "worker": (Worker.id.label("worker_id"), Worker.name.label("worker")),
+    "trade": (Worker.trade.label("trade"),),
+    "week": (ISO_WEEK.label("week"),),
+}
+
+
+def hours_query(group_by=("project",), start=None, end=None, statuses=None, project_id=None):
+    """
+    Builds the SELECT behind hours_report(): task hours grouped by any of
+    project, worker, trade and ISO week in one GROUP BY over tasks ->
+    daily_logs -> projects. The date range (on the log date, inclusive),
+    statuses and project are filtered in SQL.
+    """
+    unknown = set(group_by) - set(GROUPINGS)
+    if unknown:
+        raise ValueError(f"Unknown grouping: {', '.join(sorted(unknown))}")
+    columns = [column for name in group_by for column in GROUPINGS[name]]
+    query = (
+        select(
+            *columns,
+            func.coalesce(func.sum(Task.hours), 0).label("hours"),
+            func.count(Task.id).label("tasks"),
+        )
+        .select_from(Task)
+        .join(DailyLog, Task.log_id == DailyLog.id)
+        .join(Project, DailyLog.project_id == Project.id)
+    )
+    if "worker" in group_by or "trade" in group_by:
+        query = query.outerjoin(Worker, Task.worker_id == Worker.id)
+    if start:
+        query = query.where(DailyLog.date >= start)
+    if end:
+        query = query.where(DailyLog.date <= end)
+    if statuses:
+        query = query.where(Task.status.in_(statuses))
+    if project_id is not None:
+        query = query.where(DailyLog.project_id == project_id)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    return query
+
+def hours_report(group_by=("project",), start=None, end=None, statuses=None, project_id=None,
+                 include_archive=False):
+    """
+    Runs hours_query(), over archived projects too with include_archive.
+    Returns rows with the grouping columns plus hours and tasks.
+    """
+    query = hours_query(group_by, start, end, statuses, project_id)
+    if include_archive:
+        query = with_archive(query)
+    with session_scope() as session:
+        return session.execute(query).all()
+
+
+def day_stats_query(project_id=None, start=None, end=None, include_archive=False):
+    stats = archived(ProjectDayStat) if include_archive else ProjectDayStat
+    query = select(stats).order_by(stats.project_id, stats.day)
+    if project_id is not None:
+        query = query.where(stats.project_id == project_id)
+    if start:
+        query = query.where(stats.day >= start)
+    if end:
+        query = query.where(stats.day <= end)
+    return query
+
+def day_stats(project_id=None, start=None, end=None, include_archive=False):
+    """Reads the per project, per day summary kept by sitelog.stats, and by the archive."""
+    with session_scope() as session:
+        return session.scalars(day_stats_query(project_id, start, end, include_archive)).all()
@@ -0,0 +1,134 @@
+"""
+Full-text search over daily log summaries and weather and task descriptions.
+
+The FTS5 tables are external-content tables: they store only the search
+index and read the text itself from daily_logs and tasks. Triggers keep
+them in sync on insert, update and delete, whichever code path made the change.
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+SEARCH_TABLES = {
+    "log_search": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS log_search USING fts5(
+            summary, weather,
+            content='daily_logs', content_rowid='id', tokenize='porter unicode61'
+        )""",
+    "task_search": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5(
+            description,
+            content='tasks', content_rowid='id', tokenize='porter unicode61'
+        )""",
+}
+
+SEARCH_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_search_log_insert AFTER INSERT ON daily_logs BEGIN
+        INSERT INTO log_search (rowid, summary, weather) VALUES (NEW.id, NEW.summary, NEW.weather);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_search_log_delete AFTER DELETE ON daily_logs BEGIN
+        INSERT INTO log_search (log_search, rowid, summary, weather)
+        VALUES ('delete', OLD.id, OLD.summary, OLD.weather);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_search_log_update AFTER UPDATE OF summary, weather ON daily_logs BEGIN
+        INSERT INTO log_search (log_search, rowid, summary, weather)
+        VALUES ('delete', OLD.id, OLD.summary, OLD.weather);
+        INSERT INTO log_search (rowid, summary, weather) VALUES (NEW.id, NEW.summary, NEW.weather);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_search_task_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_search (rowid, description) VALUES (NEW.id, NEW.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_search_task_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO task_search (task_search, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_search_task_update AFTER UPDATE OF description ON tasks BEGIN
+        INSERT INTO task_search (task_search, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        INSERT INTO task_search (rowid, description) VALUES (NEW.id, NEW.description);
+    END""",
+)
+
+
+def install_search(conn):
+    """
+    Creates any missing search tables and triggers. Returns the names of the
+    tables it created, which still need rebuild_search() to index old rows.
+    """
+    existing = set(conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )).scalars())
+    created = [name for name in SEARCH_TABLES if name not in existing]
+    for ddl in SEARCH_TABLES.values():
+        conn.execute(text(ddl))
+    for ddl in SEARCH_TRIGGERS:
+        conn.execute(text(ddl))
+    return created
+
+def rebuild_search(conn):
+    """Reindexes every daily log and task from scratch."""
+    for name in SEARCH_TABLES:
+        conn.execute(text(f"INSERT INTO {name} ({name}) VALUES ('rebuild')"))
+
+
+def to_match_query(words):
+    """
+    Turns plain words into an FTS5 query that needs all of them, so input
+    like "east-slab pour" is not read as FTS5 operators. A trailing * keeps
+    prefix matching: "conc*" finds "concrete".
+    """
+    terms = []
+    for word in re.findall(r'[\w*]+', words):
+        prefix = word.endswith("*")
+        word = word.strip("*")
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def _filters(project_id, start, end, params):
+    clauses = []
+    if project_id is not None:
+        clauses.append("l.project_id = :project_id")
+        params["project_id"] = project_id
+    if start:
+        clauses.append("l.date >= :start")
+        params["start"] = start.isoformat()
+    if end:
+        clauses.append("l.date <= :end")
+        params["end"] = end.isoformat()
+    return "".join(f" AND {c}" for c in clauses)
+
+def search(conn, query, project_id=None, start=None, end=None, limit=20, raw=False):
+    """
+    Ranks daily logs and tasks matching query by BM25, best first. Summary
+    matches count double a weather match. Returns rows of kind ('log' or
+    'task'), id, log_id, date, project_id, snippet and rank. raw=True passes
+    query to FTS5 unchanged so its operators (OR, NEAR, "phrases") can be used;
+    one FTS5 can't parse raises ValueError with its message.
+    """
+    match = query if raw else to_match_query(query)
+    if not match:
+        return []
+    params = {"match": match, "limit": limit}
+    where = _filters(project_id, start, end, params)
+    sql = f"""
+        SELECT 'log' AS kind, l.id AS id, l.id AS log_id, l.date AS date, l.project_id AS project_id,
+               snippet(log_search, -1, '[', ']', '…', 12) AS snippet,
+               bm25(log_search, 2.0, 1.0) AS rank
+        FROM log_search JOIN daily_logs l ON l.id = log_search.rowid
+        WHERE log_search MATCH :match{where}
+        UNION ALL
+        SELECT 'task', t.id, l.id, l.date, l.project_id,
+               snippet(task_search, 0, '[', ']', '…', 12),
+               bm25(task_search)
+        FROM task_search JOIN tasks t ON t.id = task_search.rowid
+        JOIN daily_logs l ON l.id = t.log_id
+        WHERE task_search MATCH :match{where}
+        ORDER BY rank
+        LIMIT :limit
+    """
+    try:
+        return conn.execute(text(sql), params).all()
+    except OperationalError as e:
+        if not raw:
+            raise
+        raise ValueError(f"Bad search query: {e.orig}") from e
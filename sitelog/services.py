@@ -1,214 +1,473 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.orm import joinedload
+
+from sitelog.archive import archived, delete_archived
+from sitelog.cache import TTLCache, clear_all
+from sitelog.changes import TOMBSTONES, TRACKED
 from sitelog.db import SessionLocal
-from sitelog.models import Project, DailyLog, Worker, Task
+from sitelog.models import Project, DailyLog, Worker, Task, Change
+from sitelog.query import CHUNK_SIZE, after_clause, filters, iter_keyset
+
+CHANGES_CHUNK_SIZE = 5000
+
+_current_uow = ContextVar("sitelog_unit_of_work", default=None)
+
+# get_project() and get_worker() read through these; see sitelog.cache
+project_cache = TTLCache("projects")
+worker_cache = TTLCache("workers")
+
+
+# --- Sessions ---
+class UnitOfWork:
+    """
+    A session and transaction shared by every service call made inside a
+    unit_of_work() block. Objects stay attached until the block ends, so their
+    relationships can be used there.
+    """
+    def __init__(self, session):
+        self.session = session
+        self.after_commit = []  # callables run once the commit succeeded
+
+    def flush(self):
+        self.session.flush()
+
+@contextmanager
+def unit_of_work():
+    """
+    Groups several service calls into one transaction:
+
+        with unit_of_work() as uow:
+            log = create_daily_log(...)
+            create_task(..., log.id, ...)
+
+    Creates flush so new ids are available straight away, updates and deletes
+    are flushed together at commit. Commits once when the block exits and rolls
+    everything back if it raises. Nested blocks join the outer one.
+    """
+    current = _current_uow.get()
+    if current is not None:
+        yield current
+        return
+    uow = UnitOfWork(SessionLocal(expire_on_commit=False))
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+        uow.session.commit()
+    except BaseException:
+        uow.session.rollback()
+        raise
+    finally:
+        _current_uow.reset(token)
+        uow.session.close()
+    for callback in uow.after_commit:
+        callback()
+
+def current_unit_of_work():
+    """The unit of work active in this thread or task, or None."""
+    return _current_uow.get()
+
+@contextmanager
+def session_scope():
+    """
+    Yields the active unit of work's session, or a session of its own that is
+    committed and closed on exit for a standalone call.
+    """
+    uow = _current_uow.get()
+    if uow is not None:
+        yield uow.session
+        return
+    session = SessionLocal(expire_on_commit=False)
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _invalidate(cache, key):
+    """
+    Drops key from cache once a change to its row is committed. Inside a unit
+    of work that is when the block commits; until then the old row is what
+    other sessions still see anyway.
+    """
+    uow = _current_uow.get()
+    if uow is not None:
+        uow.after_commit.append(lambda: cache.invalidate(key))
+    else:
+        cache.invalidate(key)
+
+
+# --- Keyset pagination ---
+def _iter_keyset(model, order_by, after=None, limit=None, chunk_size=CHUNK_SIZE, options=(), where=()):
+    """
+    Streams model rows in order_by order through query.iter_keyset(), one
+    query per chunk. options are loader options and where are filters
+    applied to every chunk's query.
+    """
+    def fetch(after, size):
+        with session_scope() as session:
+            query = session.query(model).options(*options).filter(*where)
+            if after is not None:
+                query = query.filter(after_clause(order_by, after))
+            return query.order_by(*order_by).limit(size).all()
+    return iter_keyset(fetch, lambda row: tuple(getattr(row, c.key) for c in order_by), after, limit, chunk_size)
+
 
 # --- Project CRUD ---
 def create_project(name, location, start_date, end_date):
-    session = SessionLocal()
-    new_project = Project(
-        name=name,
-        location=location,
-        start_date=start_date,
-        end_date=end_date
-    )
-    session.add(new_project)
-    session.commit()
-    session.refresh(new_project)
-    session.close()
+    with session_scope() as session:
+        new_project = Project(
+            name=name,
+            location=location,
+            start_date=start_date,
+            end_date=end_date
+        )
+        session.add(new_project)
+        session.flush()
     return new_project
 
+def _load_project(project_id):
+    with session_scope() as session:
+        return session.get(Project, project_id)
+
 def get_project(project_id):
-    session = SessionLocal()
-    project = session.query(Project).filter(Project.id == project_id).first()
-    session.close()
-    return project
+    """
+    Returns a read-only snapshot of the project, cached for a while. Inside a
+    unit of work the cache is skipped and the attached Project is returned.
+    """
+    if _current_uow.get() is not None:
+        return _load_project(project_id)
+    return project_cache.get(project_id, lambda: _load_project(project_id))
 
 def update_project(project_id, **kwargs):
-    session = SessionLocal()
-    project = session.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        session.close()
-        return None
-    for key, value in kwargs.items():
-        if hasattr(project, key):
-            setattr(project, key, value)
-    session.commit()
-    session.refresh(project)
-    session.close()
+    with session_scope() as session:
+        project = session.get(Project, project_id)
+        if not project:
+            return None
+        for key, value in kwargs.items():
+            if hasattr(project, key):
+                setattr(project, key, value)
+    _invalidate(project_cache, project_id)
     return project
 
 def delete_project(project_id):
-    session = SessionLocal()
-    project = session.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        session.close()
-        return False
-    session.delete(project)
-    session.commit()
-    session.close()
+    """Deletes a project; the database cascades it to its logs and tasks, and its archived ones go too."""
+    with session_scope() as session:
+        project = session.get(Project, project_id)
+        if not project:
+            return False
+        delete_archived(session, [project_id])
+        session.delete(project)
+    _invalidate(project_cache, project_id)
     return True
 
-def list_projects():
-    session = SessionLocal()
-    projects = session.query(Project).all()
-    session.close()
-    return projects
+def iter_projects(after=None, limit=None, chunk_size=CHUNK_SIZE, where=None):
+    """Streams projects ordered by id, starting after an id. where filters as in query.filters()."""
+    return _iter_keyset(Project, (Project.id,), after, limit, chunk_size, where=filters(Project, where))
+
+def list_projects(after=None, limit=None, where=None):
+    return list(iter_projects(after, limit, where=where))
 
 
 # --- DailyLog CRUD ---
 def create_daily_log(date, weather, summary, project_id):
-    session = SessionLocal()
-    new_log = DailyLog(
-        date=date,
-        weather=weather,
-        summary=summary,
-        project_id=project_id
-    )
-    session.add(new_log)
-    session.commit()
-    session.refresh(new_log)
-    session.close()
+    with session_scope() as session:
+        new_log = DailyLog(
+            date=date,
+            weather=weather,
+            summary=summary,
+            project_id=project_id
+        )
+        session.add(new_log)
+        session.flush()
     return new_log
 
 def get_daily_log(log_id):
-    session = SessionLocal()
-    log = session.query(DailyLog).filter(DailyLog.id == log_id).first()
-    session.close()
-    return log
+    with session_scope() as session:
+        return session.get(DailyLog, log_id)
 
 def update_daily_log(log_id, **kwargs):
-    session = SessionLocal()
-    log = session.query(DailyLog).filter(DailyLog.id == log_id).first()
-    if not log:
-        session.close()
-        return None
-    for key, value in kwargs.items():
-        if hasattr(log, key):
-            setattr(log, key, value)
-    session.commit()
-    session.refresh(log)
-    session.close()
+    with session_scope() as session:
+        log = session.get(DailyLog, log_id)
+        if not log:
+            return None
+        for key, value in kwargs.items():
+            if hasattr(log, key):
+                setattr(log, key, value)
     return log
 
 def delete_daily_log(log_id):
-    session = SessionLocal()
-    log = session.query(DailyLog).filter(DailyLog.id == log_id).first()
-    if not log:
-        session.close()
-        return False
-    session.delete(log)
-    session.commit()
-    session.close()
+    with session_scope() as session:
+        log = session.get(DailyLog, log_id)
+        if not log:
+            return False
+        session.delete(log)
     return True
 
-def list_daily_logs():
-    session = SessionLocal()
-    logs = session.query(DailyLog).all()
-    session.close()
-    return logs
+def iter_daily_logs(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+                    where=None, project_id=None, start=None, end=None):
+    """
+    Streams daily logs ordered by (date, id), starting after a (date, id)
+    cursor, or after every log on the day when given a bare date.
+    include_archive adds the logs of archived projects; where, project_id
+    and the start/end dates (inclusive) filter as in query.filters().
+    """
+    logs = archived(DailyLog) if include_archive else DailyLog
+    return _iter_keyset(logs, (logs.date, logs.id), after, limit, chunk_size,
+                        where=filters(logs, where, project_id, start, end))
+
+def list_daily_logs(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                    start=None, end=None):
+    return list(iter_daily_logs(after, limit, include_archive=include_archive, where=where,
+                                project_id=project_id, start=start, end=end))
 
 
 # --- Worker CRUD ---
 def create_worker(name, trade, contact):
-    session = SessionLocal()
-    new_worker = Worker(
-        name=name,
-        trade=trade,
-        contact=contact
-    )
-    session.add(new_worker)
-    session.commit()
-    session.refresh(new_worker)
-    session.close()
+    with session_scope() as session:
+        new_worker = Worker(
+            name=name,
+            trade=trade,
+            contact=contact
+        )
+        session.add(new_worker)
+        session.flush()
     return new_worker
 
+def _load_worker(worker_id):
+    with session_scope() as session:
+        return session.get(Worker, worker_id)
+
 def get_worker(worker_id):
-    session = SessionLocal()
-    worker = session.query(Worker).filter(Worker.id == worker_id).first()
-    session.close()
-    return worker
+    """
+    Returns a read-only snapshot of the worker, cached for a while. Inside a
+    unit of work the cache is skipped and the attached Worker is returned.
+    """
+    if _current_uow.get() is not None:
+        return _load_worker(worker_id)
+    return worker_cache.get(worker_id, lambda: _load_worker(worker_id))
 
 def update_worker(worker_id, **kwargs):
-    session = SessionLocal()
-    worker = session.query(Worker).filter(Worker.id == worker_id).first()
-    if not worker:
-        session.close()
-        return None
-    for key, value in kwargs.items():
-        if hasattr(worker, key):
-            setattr(worker, key, value)
-    session.commit()
-    session.refresh(worker)
-    session.close()
+    with session_scope() as session:
+        worker = session.get(Worker, worker_id)
+        if not worker:
+            return None
+        for key, value in kwargs.items():
+            if hasattr(worker, key):
+                setattr(worker, key, value)
+    _invalidate(worker_cache, worker_id)
     return worker
 
 def delete_worker(worker_id):
-    session = SessionLocal()
-    worker = session.query(Worker).filter(Worker.id == worker_id).first()
-    if not worker:
-        session.close()
-        return False
-    session.delete(worker)
-    session.commit()
-    session.close()
+    with session_scope() as session:
+        worker = session.get(Worker, worker_id)
+        if not worker:
+            return False
+        session.delete(worker)
+    _invalidate(worker_cache, worker_id)
     return True
 
-def list_workers():
-    session = SessionLocal()
-    workers = session.query(Worker).all()
-    session.close()
-    return workers
+def iter_workers(after=None, limit=None, chunk_size=CHUNK_SIZE, where=None):
+    """Streams workers ordered by id, starting after an id. where filters as in query.filters()."""
+    return _iter_keyset(Worker, (Worker.id,), after, limit, chunk_size, where=filters(Worker, where))
+
+def list_workers(after=None, limit=None, where=None):
+    return list(iter_workers(after, limit, where=where))
 
 
 # --- Task CRUD ---
 def create_task(description, hours, status, log_id, worker_id):
-    session = SessionLocal()
-    new_task = Task(
-        description=description,
-        hours=hours,
-        status=status,
-        log_id=log_id,
-        worker_id=worker_id
-    )
-    session.add(new_task)
-    session.commit()
-    session.refresh(new_task)
-    session.close()
+    with session_scope() as session:
+        new_task = Task(
+            description=description,
+            hours=hours,
+            status=status,
+            log_id=log_id,
+            worker_id=worker_id
+        )
+        session.add(new_task)
+        session.flush()
     return new_task
 
 def get_task(task_id):
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    session.close()
-    return task
+    with session_scope() as session:
+        return session.get(Task, task_id)
 
 def update_task(task_id, **kwargs):
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        session.close()
-        return None
-    for key, value in kwargs.items():
-        if hasattr(task, key):
-            setattr(task, key, value)
-    session.commit()
-    session.refresh(task)
-    session.close()
+    with session_scope() as session:
+        task = session.get(Task, task_id)
+        if not task:
+            return None
+        for key, value in kwargs.items():
+            if hasattr(task, key):
+                setattr(task, key, value)
     return task
 
 def delete_task(task_id):
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        session.close()
-        return False
-    session.delete(task)
-    session.commit()
-    session.close()
+    with session_scope() as session:
+        task = session.get(Task, task_id)
+        if not task:
+            return False
+        session.delete(task)
     return True
 
-def list_tasks():
-    session = SessionLocal()
-    tasks = session.query(Task).all()
-    session.close()
-    return tasks
-    
\ No newline at end of file
+def iter_tasks(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+               where=None, project_id=None, start=None, end=None):
+    """
+    Streams tasks ordered by id, starting after an id. include_archive adds
+    archived tasks; where (e.g. {"worker_id": 3, "status": "pending"}),
+    project_id and the start/end log dates filter as in query.filters().
+    """
+    tasks = archived(Task) if include_archive else Task
+    return _iter_keyset(tasks, (tasks.id,), after, limit, chunk_size,
+                        where=filters(tasks, where, project_id, start, end))
+
+def list_tasks(after=None, limit=None, include_archive=False, where=None, project_id=None,
+               start=None, end=None):
+    return list(iter_tasks(after, limit, include_archive=include_archive, where=where,
+                           project_id=project_id, start=start, end=end))
+
+# Worker, log and the log's project, joined into the same SELECT as the tasks
+TASK_DETAILS = (
+    joinedload(Task.worker),
+    joinedload(Task.log).joinedload(DailyLog.project),
+)
+
+def iter_task_details(after=None, limit=None, chunk_size=CHUNK_SIZE, include_archive=False,
+                      where=None, project_id=None, start=None, end=None):
+    """
+    Streams tasks like iter_tasks with task.worker, task.log and
+    task.log.project already loaded, one query per chunk, so they can be used
+    after the session is gone.
+    """
+    if not include_archive:
+        return _iter_keyset(Task, (Task.id,), after, limit, chunk_size, TASK_DETAILS,
+                            filters(Task, where, project_id, start, end))
+    tasks, logs = archived(Task), archived(DailyLog)
+    details = (
+        joinedload(tasks.worker),
+        joinedload(tasks.log.of_type(logs)).joinedload(logs.project),
+    )
+    return _iter_keyset(tasks, (tasks.id,), after, limit, chunk_size, details,
+                        filters(tasks, where, project_id, start, end))
+
+def list_task_details(after=None, limit=None, include_archive=False, where=None, project_id=None,
+                      start=None, end=None):
+    return list(iter_task_details(after, limit, include_archive=include_archive, where=where,
+                                  project_id=project_id, start=start, end=end))
+
+
+# --- Bulk changes ---
+def _execute_bulk(session, statement):
+    """
+    Runs a bulk UPDATE/DELETE as is, without the ORM first working out which
+    loaded objects it touches. Inside a unit of work, pending changes are
+    flushed first and everything loaded is expired afterwards instead.
+    """
+    session.flush()
+    count = session.execute(statement, execution_options={"synchronize_session": False}).rowcount
+    session.expire_all()
+    return count
+
+def _after_bulk(model):
+    # Which cached rows changed is unknown, so drop them all
+    if model in (Project, Worker):
+        uow = _current_uow.get()
+        if uow is not None:
+            uow.after_commit.append(clear_all)
+        else:
+            clear_all()
+
+def bulk_update(model, values, where=None, project_id=None):
+    """
+    Sets values on every row of model matching the filters (see
+    query.filters) in one UPDATE statement. Returns the number of rows changed.
+    """
+    unknown = set(values) - set(model.__table__.columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown column for {model.__tablename__}: {', '.join(sorted(unknown))}")
+    statement = update(model).where(*filters(model, where, project_id)).values(**values)
+    with session_scope() as session:
+        count = _execute_bulk(session, statement)
+    _after_bulk(model)
+    return count
+
+def bulk_delete(model, where=None, project_id=None):
+    """
+    Deletes every row of model matching the filters in one DELETE statement.
+    The database cascades it to daily logs and tasks and unassigns the tasks
+    of deleted workers, and deleted projects' archived logs and tasks go
+    too. Returns the number of rows deleted.
+    """
+    conditions = filters(model, where, project_id)
+    statement = delete(model).where(*conditions)
+    with session_scope() as session:
+        if model is Project:
+            delete_archived(session, select(Project.id).where(*conditions))
+        count = _execute_bulk(session, statement)
+    _after_bulk(model)
+    return count
+
+
+# --- Change feed ---
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def iter_changes(since=0, limit=None, entities=None, chunk_size=CHANGES_CHUNK_SIZE):
+    """
+    Yields the changes after the since cursor in sequence order, as dicts of
+    seq, entity, id, op, changed_at and row: the row's current values, or
+    None for tombstones. entities limits them to some of the tracked tables.
+    Rows are read as plain tuples, not ORM objects, since a first sync reads
+    the whole database.
+    """
+    changes_table = Change.__table__
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        # Each chunk reads its changes and the rows they point at together
+        with session_scope() as session:
+            query = select(changes_table).where(changes_table.c.seq > since).order_by(changes_table.c.seq).limit(size)
+            if entities:
+                query = query.where(changes_table.c.entity.in_(entities))
+            changes = session.execute(query).all()
+            # The chunk's rows of each table, joined to its slice of the
+            # change log (a seq range) rather than looked up by a long IN list
+            rows = {}
+            present = {c.entity for c in changes if c.op not in TOMBSTONES}
+            for entity in present:
+                table = TRACKED[entity].__table__
+                query = (
+                    select(table)
+                    .join(changes_table, and_(changes_table.c.entity == entity, changes_table.c.row_id == table.c.id))
+                    .where(changes_table.c.seq > since, changes_table.c.seq <= changes[-1].seq)
+                )
+                result = session.execute(query)
+                keys = tuple(result.keys())
+                for values in result:
+                    rows[entity, values[0]] = dict(zip(keys, map(_json_value, values)))
+        for c in changes:
+            yield {"seq": c.seq, "entity": c.entity, "id": c.row_id, "op": c.op,
+                   "changed_at": c.changed_at, "row": rows.get((c.entity, c.row_id))}
+        if len(changes) < size:
+            return
+        since = changes[-1].seq
+        if remaining is not None:
+            remaining -= len(changes)
+
+def prune_tombstones(upto_seq):
+    """
+    Deletes the tombstones at or before upto_seq, once every consumer has read
+    past it. Entries for rows that still exist are kept. Returns the count.
+    """
+    with session_scope() as session:
+        return session.execute(
+            delete(Change).where(Change.seq <= upto_seq, Change.op.in_(TOMBSTONES))
+        ).rowcount
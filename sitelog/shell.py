@@ -0,0 +1,317 @@
+"""
+An interactive shell that runs the CLI's commands in one process.
+
+Every `python -m sitelog.cli ...` pays for importing SQLAlchemy, opening the
+engine and checking the schema before it does any work. The shell pays that
+once: each line is parsed like a command line and dispatched to the same
+Click commands, against the same warm engine, connection pool and row
+caches. Tab completes commands, options, choices and, for project, log,
+worker and task IDs, the IDs in the database. History is kept in
+~/.sitelog_history (SITELOG_HISTORY to move it) where readline is available.
+
+A script is a file of the same lines, run in one transaction: every command
+is saved, or none is.
+
+    # tuesday.sitelog
+    add-daily-log --date 2024-05-14 --weather Sunny --summary "Slab pour" --project-id 3
+    add-task --description "Pour slab" --hours 6 --status done --log-id 812 --worker-id 14
+"""
+import os
+import shlex
+from pathlib import Path
+
+import click
+
+try:
+    import readline
+except ImportError:  # Windows without pyreadline
+    readline = None
+
+PROMPT = "sitelog> "
+HISTORY_PATH = Path(os.environ.get("SITELOG_HISTORY", Path.home() / ".sitelog_history"))
+HISTORY_LENGTH = 1000
+MAX_COMPLETIONS = 50
+BUILTINS = ["help", "source", "exit", "quit"]
+
+# Parameter names whose values are row IDs, completed from these tables
+ID_PARAMS = {"project_id": "projects", "log_id": "daily_logs", "worker_id": "workers", "task_id": "tasks"}
+
+# Commands that open their own connections or transactions, so they can't be
+# part of a script's single transaction
+SCRIPT_EXCLUDED = [("shell",), ("serve",), ("import",), ("archive",), ("db",), ("stats", "rebuild")]
+
+
+class ScriptError(Exception):
+    """A script line failed; the script's transaction was rolled back."""
+    def __init__(self, path, number, line, reason):
+        super().__init__(f"{path}, line {number}: {line}\n{reason}")
+
+
+# --- Parsing ---
+def _option(command, word):
+    """command's option named by word (--name or --name=value), or None."""
+    name = word.split("=", 1)[0]
+    for param in command.params:
+        if isinstance(param, click.Option) and name in param.opts + param.secondary_opts:
+            return param
+    return None
+
+def locate(group, words):
+    """
+    Follows the words of a command line through group: (path, command,
+    param). path is the subcommand names, command the innermost one named,
+    and param the option or argument the next word would be the value of
+    (None when it would be an option name or subcommand). command is None
+    for an unknown subcommand.
+    """
+    path, command, positional, expecting = (), group, 0, None
+    for word in words:
+        if expecting is not None:
+            expecting = None
+        elif word.startswith("-"):
+            option = _option(command, word)
+            if option is not None and not option.is_flag and not option.count and "=" not in word:
+                expecting = option
+        elif isinstance(command, click.Group):
+            command = command.commands.get(word)
+            if command is None:
+                return path, None, None
+            path, positional = path + (word,), 0
+        else:
+            positional += 1
+    if expecting is not None or isinstance(command, click.Group):
+        return path, command, expecting
+    arguments = [param for param in command.params if isinstance(param, click.Argument)]
+    if positional < len(arguments):
+        return path, command, arguments[positional]
+    if arguments and arguments[-1].nargs == -1:
+        return path, command, arguments[-1]
+    return path, command, None
+
+def parse_script(lines):
+    """Yields (line number, line, words) for each command in a script, skipping blanks and # comments."""
+    for number, line in enumerate(lines, 1):
+        words = shlex.split(line, comments=True)
+        if words:
+            yield number, line.strip(), words
+
+
+# --- Completion ---
+def complete_ids(table, prefix, limit=MAX_COMPLETIONS):
+    """
+    IDs in table that start with the digits typed so far, shortest first.
+    Those are the ranges [p, p+1), [10p, 10p+10), ... so each is one
+    primary key range read rather than a scan of the table.
+    """
+    from sqlalchemy import func, select
+    from sitelog.changes import TRACKED
+    from sitelog.services import session_scope
+
+    if prefix and (not prefix.isdigit() or prefix.startswith("0")):
+        return []
+    model = TRACKED[table]
+    ids = []
+    with session_scope() as session:
+        if not prefix:
+            return [str(i) for i in session.scalars(select(model.id).order_by(model.id).limit(limit))]
+        top = session.scalar(select(func.max(model.id))) or 0
+        low, width = int(prefix), 1
+        while low <= top and len(ids) < limit:
+            ids += session.scalars(
+                select(model.id).where(model.id >= low, model.id < low + width)
+                .order_by(model.id).limit(limit - len(ids))
+            )
+            low, width = low * 10, width * 10
+    return [str(i) for i in ids]
+
+def candidates(group, line, text):
+    """What text, the word being typed at the end of line, could complete to."""
+    try:
+        words = shlex.split(line)
+    except ValueError:  # inside an open quote
+        return []
+    path, command, param = locate(group, words)
+    if command is None:
+        return []
+    if param is None:
+        if text.startswith("-") or not isinstance(command, click.Group):
+            names = [name for p in command.params if isinstance(p, click.Option)
+                     for name in p.opts + p.secondary_opts] + ["--help"]
+        else:
+            names = list(command.commands) + (BUILTINS if not path else [])
+        return sorted(name for name in names if name.startswith(text))
+    if isinstance(param.type, click.Choice):
+        return [choice for choice in param.type.choices if choice.startswith(text)]
+    if param.name in ID_PARAMS:
+        return complete_ids(ID_PARAMS[param.name], text)
+    return []
+
+def _completer(group):
+    """A readline completer: works out the matches on the first call, then hands them out."""
+    matches = []
+
+    def complete(text, state):
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_begidx()]
+            try:
+                matches[:] = [match + " " for match in candidates(group, line, text)]
+            except Exception:  # never let a completion error kill the prompt
+                matches[:] = []
+        return matches[state] if state < len(matches) else None
+    return complete
+
+def _setup_readline(group):
+    if readline is None:
+        return
+    try:
+        readline.read_history_file(HISTORY_PATH)
+    except OSError:
+        pass
+    readline.set_history_length(HISTORY_LENGTH)
+    readline.set_completer_delims(" \t\n")
+    readline.set_completer(_completer(group))
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+
+def _save_history():
+    if readline is None:
+        return
+    try:
+        readline.write_history_file(HISTORY_PATH)
+    except OSError:
+        pass
+
+
+# --- Running commands ---
+def dispatch(group, words):
+    """
+    Runs one command line's words through the CLI group, as a fresh process
+    would. Returns True when it succeeded. Usage errors and aborts are
+    reported and return False; any other exception is raised.
+    """
+    try:
+        code = group.main(words, prog_name="sitelog", standalone_mode=False)
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        return False
+    except click.ClickException as e:
+        e.show()
+        return False
+    except SystemExit as e:
+        return not e.code
+    # --help and the like exit through main, which then returns their code
+    return not isinstance(code, int) or code == 0
+
+def run_script(group, path, lines):
+    """
+    Runs a script's commands in one unit of work. Each command's changes are
+    flushed before the next runs, so later lines see them and a constraint
+    error is reported at the line that caused it. If a command fails, the
+    whole script is rolled back and ScriptError says which line. Returns the
+    number of commands run.
+    """
+    from sitelog.services import unit_of_work
+
+    commands = list(parse_script(lines))
+    for number, line, words in commands:
+        command_path, command, _ = locate(group, words)
+        if any(command_path[:len(excluded)] == excluded for excluded in SCRIPT_EXCLUDED):
+            raise ScriptError(path, number, line, f"'{' '.join(command_path)}' can't run inside a script's transaction.")
+    with unit_of_work() as uow:
+        for number, line, words in commands:
+            try:
+                # A command that reports its own database error returns
+                # normally but leaves the session needing a rollback
+                ok = dispatch(group, words) and uow.session.is_active
+                if ok:
+                    uow.flush()
+            except Exception as e:
+                raise ScriptError(path, number, line, f"{type(e).__name__}: {e}") from e
+            if not ok:
+                raise ScriptError(path, number, line, "The command failed.")
+    return len(commands)
+
+def source(group, path):
+    """Runs a script file and reports the outcome. Returns True when it was committed."""
+    try:
+        if path == "-":
+            count = run_script(group, "<stdin>", click.get_text_stream("stdin"))
+        else:
+            with open(path, encoding="utf-8") as f:
+                count = run_script(group, path, f)
+    except OSError as e:
+        click.echo(click.style(f"Can't read the script: {e}", fg="red"), err=True)
+        return False
+    except ValueError as e:  # unbalanced quotes
+        click.echo(click.style(f"Can't parse the script: {e}", fg="red"), err=True)
+        return False
+    except ScriptError as e:
+        click.echo(click.style(f"{e}\nRolled back: nothing from the script was saved.", fg="red"), err=True)
+        return False
+    click.echo(f"✅ Ran {count} commands in one transaction.")
+    return True
+
+def _builtin(group, words):
+    """Handles the shell's own commands. Returns False to leave the shell, None if words isn't one."""
+    name = words[0]
+    if name in ("exit", "quit"):
+        return False
+    if name == "help":
+        dispatch(group, words[1:] + ["--help"])
+        click.echo("\nShell: source FILE runs a script in one transaction; exit or Ctrl+D leaves.")
+        return True
+    if name == "source":
+        if len(words) != 2:
+            click.echo("Usage: source FILE", err=True)
+        else:
+            source(group, words[1])
+        return True
+    if name == "shell":
+        click.echo("Already in the shell.", err=True)
+        return True
+    return None
+
+def warm_up():
+    """Opens the engine and one pooled connection, so the first command doesn't pay for them."""
+    from sitelog import db
+    with db.get_engine().connect():
+        pass
+    return db.settings
+
+def interact(group):
+    """Reads and runs commands until exit, quit or end of input."""
+    settings = warm_up()
+    _setup_readline(group)
+    click.echo(f"SiteLog shell on {settings.url}. Tab completes, help lists the commands, exit leaves.")
+    try:
+        while True:
+            try:
+                line = input(PROMPT)
+            except KeyboardInterrupt:  # Ctrl+C drops the line being typed
+                click.echo()
+                continue
+            except EOFError:
+                click.echo()
+                break
+            try:
+                words = shlex.split(line)
+            except ValueError as e:
+                click.echo(click.style(f"Can't parse that: {e}", fg="red"), err=True)
+                continue
+            if not words:
+                continue
+            handled = _builtin(group, words)
+            if handled is False:
+                break
+            if handled:
+                continue
+            try:
+                dispatch(group, words)
+            except KeyboardInterrupt:
+                click.echo("Interrupted.", err=True)
+            except Exception as e:
+                click.echo(click.style(f"Error: {type(e).__name__}: {e}", fg="red"), err=True)
+    finally:
+        _save_history()
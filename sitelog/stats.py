@@ -0,0 +1,95 @@
+"""
+Maintenance of the project_day_stats summary table.
+
+SQLite triggers keep the table current, so ORM writes, bulk imports and raw
+SQL are all counted. A task change adds or subtracts its own numbers from its
+(project, day) row. A daily log change recomputes the days it moved from and
+to, which is cheap thanks to the log and task indexes, and stays correct
+whatever order SQLite fires cascaded deletes in.
+"""
+from sqlalchemy import text
+
+# A task's contribution to its day, signed: sign * (1 task, completed?, pending?, hours)
+_TASK_DELTA = """
+    INSERT INTO project_day_stats (project_id, day, tasks, completed, pending, hours)
+    SELECT project_id, date, {sign}1,
+           {sign}coalesce({row}.status = 'completed', 0),
+           {sign}coalesce({row}.status = 'pending', 0),
+           {sign}coalesce({row}.hours, 0)
+    FROM daily_logs
+    WHERE id = {row}.log_id AND project_id IS NOT NULL AND date IS NOT NULL
+    ON CONFLICT (project_id, day) DO UPDATE SET
+        tasks = tasks + excluded.tasks,
+        completed = completed + excluded.completed,
+        pending = pending + excluded.pending,
+        hours = hours + excluded.hours;
+"""
+
+_DROP_EMPTY = "DELETE FROM project_day_stats WHERE tasks = 0;"
+
+# Recompute one (project, day) row from scratch
+_RECOMPUTE_DAY = """
+    DELETE FROM project_day_stats WHERE project_id = {project} AND day = {day};
+    INSERT INTO project_day_stats (project_id, day, tasks, completed, pending, hours)
+    SELECT l.project_id, l.date, count(t.id),
+           coalesce(sum(t.status = 'completed'), 0),
+           coalesce(sum(t.status = 'pending'), 0),
+           coalesce(sum(t.hours), 0)
+    FROM daily_logs l JOIN tasks t ON t.log_id = l.id
+    WHERE l.project_id = {project} AND l.date = {day}
+    GROUP BY l.project_id, l.date;
+"""
+
+TRIGGERS = {
+    "trg_stats_task_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_task_insert AFTER INSERT ON tasks
+        BEGIN {_TASK_DELTA.format(sign="", row="NEW")} END""",
+    "trg_stats_task_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_task_delete AFTER DELETE ON tasks
+        BEGIN {_TASK_DELTA.format(sign="-", row="OLD")} {_DROP_EMPTY} END""",
+    "trg_stats_task_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_task_update AFTER UPDATE OF status, hours, log_id ON tasks
+        BEGIN {_TASK_DELTA.format(sign="-", row="OLD")} {_TASK_DELTA.format(sign="", row="NEW")} {_DROP_EMPTY} END""",
+    "trg_stats_log_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_log_update AFTER UPDATE OF project_id, date ON daily_logs
+        BEGIN {_RECOMPUTE_DAY.format(project="OLD.project_id", day="OLD.date")}
+              {_RECOMPUTE_DAY.format(project="NEW.project_id", day="NEW.date")} END""",
+    "trg_stats_log_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_log_delete AFTER DELETE ON daily_logs
+        BEGIN {_RECOMPUTE_DAY.format(project="OLD.project_id", day="OLD.date")} END""",
+}
+
+_AGGREGATE = """
+    SELECT l.project_id, l.date AS day, count(t.id) AS tasks,
+           coalesce(sum(t.status = 'completed'), 0) AS completed,
+           coalesce(sum(t.status = 'pending'), 0) AS pending,
+           coalesce(sum(t.hours), 0) AS hours
+    FROM daily_logs l JOIN tasks t ON t.log_id = l.id
+    WHERE l.project_id IS NOT NULL AND l.date IS NOT NULL
+    GROUP BY l.project_id, l.date
+"""
+_STORED = "SELECT project_id, day, tasks, completed, pending, hours FROM project_day_stats"
+
+
+def install_triggers(conn):
+    """Creates any missing stats triggers. conn may be a Connection or Session."""
+    for ddl in TRIGGERS.values():
+        conn.execute(text(ddl))
+
+def rebuild_stats(conn):
+    """Recomputes the whole summary table from tasks and daily logs."""
+    conn.execute(text("DELETE FROM project_day_stats"))
+    result = conn.execute(text(
+        "INSERT INTO project_day_stats (project_id, day, tasks, completed, pending, hours) " + _AGGREGATE
+    ))
+    return result.rowcount
+
+def check_stats(conn):
+    """
+    Compares the summary table with a fresh aggregate. Returns the rows that
+    differ as (source, row) pairs, where source is "stored" for rows only in
+    the table and "expected" for rows only in the recomputation.
+    """
+    stored_only = conn.execute(text(f"{_STORED} EXCEPT {_AGGREGATE}")).all()
+    expected_only = conn.execute(text(f"{_AGGREGATE} EXCEPT {_STORED}")).all()
+    return [("stored", row) for row in stored_only] + [("expected", row) for row in expected_only]
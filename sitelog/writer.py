@@ -0,0 +1,186 @@
+"""
+Single-writer mode: group commit of service writes.
+
+SQLite lets one connection write at a time. When many threads call
+create_* at once, each takes the write lock and commits on its own, the
+others wait in the busy handler, and the slowest ones time out with
+"database is locked". A Writer instead queues the writes for one thread,
+which runs everything that arrives within max_delay seconds (or max_batch
+writes) in one transaction with one commit. If a write fails, the group is
+run again with a savepoint around each write, so only the failing ones are
+rolled back.
+
+    writer = Writer().start()
+    future = writer.create_task("Pour slab", 6, "pending", log_id, worker_id)
+    task_id = future.result()   # resolves once the group is committed
+    writer.stop()
+
+create_* futures resolve with the new id, update_* with the id (None when
+the row doesn't exist) and delete_* with True or False. In asyncio code,
+await asyncio.wrap_future(future).
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sitelog import services
+
+MAX_BATCH = 200
+MAX_DELAY = 0.005  # seconds the first write of a group waits for company
+
+# Service functions a Writer exposes as methods returning futures
+WRITES = {
+    name: getattr(services, name)
+    for action in ("create", "update", "delete")
+    for name in (f"{action}_project", f"{action}_daily_log", f"{action}_worker", f"{action}_task")
+}
+
+_STOP = object()
+
+
+class Writer:
+    def __init__(self, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.commits = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()  # orders submit() against the thread closing
+
+    def start(self):
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sitelog-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Commits whatever is queued, then stops the writer thread."""
+        if self._thread is not None:
+            with self._lock:
+                if not self._closed:
+                    self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) to run on the writer thread, inside its
+        unit of work. Returns a Future for fn's result; ORM objects are
+        replaced by their id.
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None or self._closed:
+                raise RuntimeError("The writer is not running; call start() first.")
+            self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def __getattr__(self, name):
+        if name in WRITES:
+            return lambda *args, **kwargs: self.submit(WRITES[name], *args, **kwargs)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _next_group(self):
+        """Blocks for a write, then gathers more for up to max_delay. Returns (group, stopping)."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        group = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+        return group, False
+
+    def _run(self):
+        group, stopping = [], False
+        error = RuntimeError("The writer was stopped before running this write.")
+        try:
+            while not stopping:
+                group, stopping = self._next_group()
+                if group:
+                    self._commit(group)
+        except BaseException as e:
+            # Only Exceptions are handled per group; anything else a write
+            # raises (SystemExit, KeyboardInterrupt, ...) ends the thread
+            error = RuntimeError(f"The writer thread stopped: {type(e).__name__}: {e}")
+            error.__cause__ = e
+            raise
+        finally:
+            self._close(group, error)
+
+    def _close(self, group, error):
+        """Refuses new writes and fails the futures of those the thread will never run."""
+        with self._lock:
+            self._closed = True
+        leftovers = list(group)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        for future, *_ in leftovers:
+            if not future.done():
+                future.set_exception(error)
+
+    def _run_group(self, group, savepoints):
+        """
+        Runs the group's writes in one unit of work and commits. Without
+        savepoints the first failing write aborts the whole group; with them
+        it is rolled back on its own. Returns [(future, result, error)].
+        """
+        outcomes = []
+        with services.unit_of_work() as uow:
+            for future, fn, args, kwargs in group:
+                if not savepoints:
+                    result = fn(*args, **kwargs)
+                    outcomes.append((future, getattr(result, "id", result), None))
+                    continue
+                savepoint = uow.session.begin_nested()
+                try:
+                    result = fn(*args, **kwargs)
+                    savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((future, None, e))
+                    continue
+                outcomes.append((future, getattr(result, "id", result), None))
+        return outcomes
+
+    def _commit(self, group):
+        group = [item for item in group if item[0].set_running_or_notify_cancel()]
+        try:
+            try:
+                outcomes = self._run_group(group, savepoints=False)
+            except Exception:
+                # Something failed. Redo the group with a savepoint around
+                # each write (two more statements per write, so not by
+                # default), so only the failing ones are lost.
+                outcomes = self._run_group(group, savepoints=True)
+        except Exception as e:
+            # The commit itself failed, so nothing in the group was saved
+            for future, *_ in group:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        self.writes += len(group)
+        # Only now is every write in the group durable
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def info(self):
+        return {"commits": self.commits, "writes": self.writes, "queued": self._queue.qsize()}
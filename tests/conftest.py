@@ -0,0 +1,24 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from sitelog import db, services
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh database file for the test; the previous settings come back afterwards."""
+    url = db.settings.url
+    db.configure(url=f"sqlite:///{tmp_path / 'sitelog.db'}")
+    yield tmp_path
+    db.configure(url=url)
+
+
+@pytest.fixture
+def site(database):
+    """A project with one daily log and one worker, by id."""
+    project = services.create_project("Tower", "Leeds", date(2024, 1, 1), date(2024, 12, 31))
+    log = services.create_daily_log(date(2024, 5, 14), "dry", "slab", project.id)
+    worker = services.create_worker("Ana", "mason", "555-0100")
+    return SimpleNamespace(project_id=project.id, log_id=log.id, worker_id=worker.id)
@@ -0,0 +1,16 @@
+import pytest
+
+from sitelog.analytics import percentile
+
+
+@pytest.mark.parametrize("ordered, fraction, expected", [
+    (range(1, 11), 0.5, 5),
+    (range(1, 11), 0.9, 9),
+    (range(1, 11), 1.0, 10),
+    (range(1, 11), 0.0, 1),
+    ([3, 6], 0.5, 3),
+    ([7], 0.9, 7),
+    ([], 0.5, 0.0),
+])
+def test_percentile_is_nearest_rank(ordered, fraction, expected):
+    assert percentile(ordered, fraction) == expected
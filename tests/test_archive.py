@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from sitelog import async_services, services
+from sitelog.archive import archive_project
+from sitelog.models import Project
+from sitelog.reports import day_stats
+
+
+@pytest.fixture
+def archived_sites(site):
+    """Two projects with their logs and tasks moved to the archive, by project id."""
+    other = services.create_project("Depot", "York", date(2024, 1, 1), date(2024, 12, 31)).id
+    log = services.create_daily_log(date(2024, 5, 15), "wet", "yard", other).id
+    services.create_task("Fence", 3, "pending", log, site.worker_id)
+    services.create_task("Pour", 4, "completed", site.log_id, site.worker_id)
+    for project_id in (site.project_id, other):
+        assert archive_project(project_id).logs == 1
+    return site.project_id, other
+
+def archived_rows(project_id):
+    logs = services.list_daily_logs(include_archive=True, project_id=project_id)
+    tasks = services.list_tasks(include_archive=True, project_id=project_id)
+    return len(logs), len(tasks), len(day_stats(project_id, include_archive=True))
+
+def ops():
+    return {(change["entity"], change["op"]) for change in services.iter_changes(entities=["daily_logs", "tasks"])}
+
+
+def test_deleting_a_project_deletes_its_archived_rows(archived_sites):
+    gone, kept = archived_sites
+    assert archived_rows(gone) == (1, 1, 1)
+    assert services.delete_project(gone)
+    assert archived_rows(gone) == (0, 0, 0)
+    assert archived_rows(kept) == (1, 1, 1)
+    assert ops() == {("daily_logs", "delete"), ("tasks", "delete"), ("daily_logs", "archive"), ("tasks", "archive")}
+
+def test_bulk_delete_deletes_archived_rows(archived_sites):
+    gone, kept = archived_sites
+    assert services.bulk_delete(Project, {"name": "Tower"}) == 1
+    assert archived_rows(gone) == (0, 0, 0)
+    assert archived_rows(kept) == (1, 1, 1)
+
+def test_async_delete_deletes_archived_rows(archived_sites):
+    gone, kept = archived_sites
+
+    async def scenario():
+        try:
+            return await async_services.delete_project(gone)
+        finally:
+            await async_services.dispose()
+
+    assert asyncio.run(scenario())
+    assert archived_rows(gone) == (0, 0, 0)
+    assert archived_rows(kept) == (1, 1, 1)
+
+def test_archived_rows_roll_back_with_the_project(archived_sites):
+    gone, _ = archived_sites
+    with pytest.raises(RuntimeError):
+        with services.unit_of_work():
+            services.delete_project(gone)
+            raise RuntimeError("give up")
+    assert services.get_project(gone) is not None
+    assert archived_rows(gone) == (1, 1, 1)
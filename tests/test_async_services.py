@@ -0,0 +1,93 @@
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from sitelog import async_services
+from sitelog.cache import Snapshot
+from sitelog.models import Task
+
+WRITERS = 50
+
+
+def run(coro):
+    """Runs coro in a new event loop, closing the async engine's connections before it ends."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_services.dispose()
+    return asyncio.run(main())
+
+
+async def _log():
+    project = await async_services.create_project("Tower", "Leeds", date(2024, 1, 1), date(2024, 12, 31))
+    log = await async_services.create_daily_log(date(2024, 5, 14), "dry", "slab", project.id)
+    worker = await async_services.create_worker("Ana", "mason", "555-0100")
+    return log.id, worker.id
+
+async def _task_count():
+    async with async_services.session_scope() as session:
+        return await session.scalar(select(func.count(Task.id)))
+
+
+def test_concurrent_writers_each_commit(database):
+    async def scenario():
+        log_id, worker_id = await _log()
+        await asyncio.gather(*(
+            async_services.create_task(f"task {i}", 2, "pending", log_id, worker_id) for i in range(WRITERS)
+        ))
+        return await _task_count()
+
+    assert run(scenario()) == WRITERS
+
+
+def test_concurrent_writers_share_a_unit_of_work(database):
+    async def scenario():
+        log_id, worker_id = await _log()
+        async with async_services.unit_of_work():
+            tasks = await asyncio.gather(*(
+                async_services.create_task(f"task {i}", 2, "pending", log_id, worker_id) for i in range(WRITERS)
+            ))
+        return len({task.id for task in tasks}), await _task_count()
+
+    assert run(scenario()) == (WRITERS, WRITERS)
+
+
+def test_unit_of_work_rolls_back_every_writer(database):
+    async def scenario():
+        log_id, worker_id = await _log()
+        with pytest.raises(RuntimeError):
+            async with async_services.unit_of_work():
+                await asyncio.gather(*(
+                    async_services.create_task(f"task {i}", 2, "pending", log_id, worker_id) for i in range(WRITERS)
+                ))
+                raise RuntimeError("give up")
+        return await _task_count()
+
+    assert run(scenario()) == 0
+
+
+def test_get_project_returns_a_cached_snapshot(database):
+    async def scenario():
+        project = await async_services.create_project("Tower", "Leeds", date(2024, 1, 1), date(2024, 12, 31))
+        return await async_services.get_project(project.id), await async_services.get_project(project.id)
+
+    first, second = run(scenario())
+    assert isinstance(first, Snapshot)
+    assert first is second
+
+
+def test_cache_is_invalidated_after_the_unit_of_work_commits(database):
+    from sitelog import services
+
+    async def scenario():
+        project = await async_services.create_project("Tower", "Leeds", date(2024, 1, 1), date(2024, 12, 31))
+        async with async_services.unit_of_work():
+            await async_services.update_project(project.id, name="Tower B")
+            # A reader fills the cache with the committed row meanwhile
+            before = services.get_project(project.id).name
+        return before, services.get_project(project.id).name
+
+    assert run(scenario()) == ("Tower", "Tower B")
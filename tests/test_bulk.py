@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+from click.testing import CliRunner
+
+from sitelog import services
+from sitelog.cli import cli
+
+
+def invoke(*args, exit_code=0):
+    result = CliRunner().invoke(cli, [str(arg) for arg in args])
+    assert result.exit_code == exit_code, result.output
+    return result.output
+
+@pytest.fixture
+def sites(site):
+    """site plus a second project with its own log and task."""
+    other = services.create_project("Depot", "York", date(2024, 1, 1), date(2024, 12, 31)).id
+    log = services.create_daily_log(date(2024, 5, 15), "wet", "yard", other).id
+    services.create_task("Fence", 3, "pending", log, site.worker_id)
+    services.create_task("Pour", 4, "pending", site.log_id, site.worker_id)
+    services.create_task("Strip", 2, "completed", site.log_id, site.worker_id)
+    site.other_id = other
+    return site
+
+def statuses(project_id):
+    return sorted(task.status for task in services.list_tasks(project_id=project_id))
+
+
+def test_bulk_update_by_project(sites):
+    assert "Updated 1 projects" in invoke("bulk-update", "projects", "--project-id", sites.project_id, "--set", "location=Hull")
+    assert [p.location for p in services.list_projects()] == ["Hull", "York"]
+
+    assert "Updated 1 tasks" in invoke("bulk-update", "tasks", "--project-id", sites.project_id,
+                                       "--where", "status=pending", "--set", "status=completed")
+    assert statuses(sites.project_id) == ["completed", "completed"]
+    assert statuses(sites.other_id) == ["pending"]
+
+def test_bulk_update_where_lists_and_nulls(sites):
+    invoke("bulk-update", "tasks", "--where", "description=Pour,Fence", "--set", "hours=")
+    assert sorted((t.description, t.hours) for t in services.list_tasks()) == [
+        ("Fence", None), ("Pour", None), ("Strip", 2),
+    ]
+    assert "Updated 2 tasks" in invoke("bulk-update", "tasks", "--where", "hours=", "--set", "hours=1")
+
+def test_bulk_filters_are_required_and_checked(sites):
+    assert "or --all" in invoke("bulk-delete", "tasks", "--yes", exit_code=2)
+    assert "workers cannot be filtered by project" in invoke(
+        "bulk-update", "workers", "--project-id", sites.project_id, "--set", "trade=x", exit_code=2)
+    assert "unknown column 'colour'" in invoke("bulk-update", "tasks", "--where", "colour=red", "--set", "hours=1", exit_code=2)
+
+def test_bulk_delete_project_cascades(sites):
+    assert "Deleted 1 projects" in invoke("bulk-delete", "projects", "--project-id", sites.project_id, "--yes")
+    assert [p.id for p in services.list_projects()] == [sites.other_id]
+    assert {log.project_id for log in services.list_daily_logs()} == {sites.other_id}
+    assert [t.description for t in services.list_tasks()] == ["Fence"]
+
+def test_bulk_delete_logs_cascades_to_tasks(sites):
+    assert "Deleted 1 daily-logs" in invoke("bulk-delete", "daily-logs", "--where", "weather=wet", "--yes")
+    assert sorted(t.description for t in services.list_tasks()) == ["Pour", "Strip"]
+    assert statuses(sites.other_id) == []
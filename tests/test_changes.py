@@ -0,0 +1,50 @@
+from sitelog import services
+from sitelog.archive import archive_project
+
+
+def feed(since=0, **kwargs):
+    return [(c["entity"], c["id"], c["op"]) for c in services.iter_changes(since, **kwargs)]
+
+def cursor(since=0):
+    """Where a consumer that read everything after since now stands."""
+    return max([c["seq"] for c in services.iter_changes(since)], default=since)
+
+
+def test_an_update_moves_the_row_to_a_new_seq(site):
+    task = services.create_task("Pour", 2, "pending", site.log_id, site.worker_id).id
+    seen = cursor()
+    assert feed(seen) == []
+    services.update_task(task, status="completed")
+    changes = list(services.iter_changes(seen))
+    assert [(c["entity"], c["id"], c["op"]) for c in changes] == [("tasks", task, "update")]
+    assert changes[0]["seq"] > seen
+    assert changes[0]["row"]["status"] == "completed"
+    # One entry per row: the insert's entry was replaced, not kept
+    assert [c for c in feed() if c[:2] == ("tasks", task)] == [("tasks", task, "update")]
+
+def test_the_feed_pages_and_filters(site):
+    tasks = [services.create_task(f"t{i}", 2, "pending", site.log_id, site.worker_id).id for i in range(5)]
+    assert [c[1] for c in feed(entities=["tasks"], chunk_size=2)] == tasks
+    assert [c[1] for c in feed(entities=["tasks"], limit=3, chunk_size=2)] == tasks[:3]
+
+def test_tombstones_are_pruned_once_every_consumer_has_read_past_them(site):
+    task = services.create_task("Pour", 2, "pending", site.log_id, site.worker_id).id
+    slow = cursor()
+    services.delete_task(task)
+    fast = cursor(slow)
+    assert feed(slow) == [("tasks", task, "delete")]
+
+    assert services.prune_tombstones(min(slow, fast)) == 0
+    assert feed(slow) == [("tasks", task, "delete")]  # the slow consumer still sees it
+    slow = cursor(slow)
+    assert services.prune_tombstones(min(slow, fast)) == 1
+    assert feed() == [("projects", site.project_id, "insert"), ("daily_logs", site.log_id, "insert"),
+                      ("workers", site.worker_id, "insert")]
+
+def test_archived_rows_leave_archive_tombstones(site):
+    task = services.create_task("Pour", 2, "pending", site.log_id, site.worker_id).id
+    archive_project(site.project_id)
+    assert sorted(feed(entities=["daily_logs", "tasks"])) == [
+        ("daily_logs", site.log_id, "archive"), ("tasks", task, "archive"),
+    ]
+    assert services.prune_tombstones(cursor()) == 2
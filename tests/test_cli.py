@@ -0,0 +1,37 @@
+import pytest
+from click.testing import CliRunner
+
+from sitelog import services
+from sitelog.cli import cli
+
+
+def invoke(*args):
+    result = CliRunner().invoke(cli, [str(arg) for arg in args], catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+@pytest.fixture
+def tasks(site):
+    return [services.create_task(f"task {i}", 2, "pending", site.log_id, site.worker_id).id for i in range(3)]
+
+
+def test_after_hint_when_more_rows_follow(tasks):
+    output = invoke("show-tasks", "--limit", 2)
+    assert f"ID: {tasks[1]} " in output
+    assert f"ID: {tasks[2]} " not in output
+    assert f"More results: --after {tasks[1]}" in output
+
+def test_no_after_hint_when_the_page_ends_on_the_last_row(tasks):
+    output = invoke("show-tasks", "--limit", 2, "--after", tasks[0])
+    assert f"ID: {tasks[2]} " in output
+    assert "More results" not in output
+
+def test_no_after_hint_without_a_limit(tasks):
+    assert "More results" not in invoke("show-tasks")
+
+def test_raw_search_reports_a_bad_query(site):
+    assert "slab" in invoke("search", "--raw", "slab OR pour")
+    result = CliRunner().invoke(cli, ["search", "--raw", "slab AND"], catch_exceptions=False)
+    assert result.exit_code == 2
+    assert "Bad search query: fts5: syntax error" in result.output
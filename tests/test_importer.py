@@ -0,0 +1,78 @@
+import json
+
+from click.testing import CliRunner
+
+from sitelog import services
+from sitelog.cli import cli
+from sitelog.importer import import_file
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    return path
+
+def reasons(result):
+    return {line_no: reason for line_no, reason, _ in result.rejected}
+
+
+def test_duplicate_ids_are_rejected_per_row(site, tmp_path):
+    path = write_jsonl(tmp_path / "workers.jsonl", [
+        {"id": site.worker_id, "name": "Existing id", "trade": "x", "contact": "1"},
+        {"id": 900, "name": "New", "trade": "x", "contact": "1"},
+        {"id": 900, "name": "Same batch", "trade": "x", "contact": "1"},
+        {"id": 901, "name": "Other", "trade": "x", "contact": "1"},
+        {"id": 901, "name": "Later batch", "trade": "x", "contact": "1"},
+    ])
+    result = import_file("workers", path, batch_size=4)
+    assert result.inserted == 2
+    assert reasons(result) == {
+        1: f"id {site.worker_id} already exists",
+        3: "id 900 already exists",
+        5: "id 901 already exists",
+    }
+    assert services.get_worker(900).name == "New"
+
+def test_integers_must_be_whole_numbers(site, tmp_path):
+    task = {"description": "Pour", "status": "done", "log_id": site.log_id, "worker_id": site.worker_id}
+    path = write_jsonl(tmp_path / "tasks.jsonl", [
+        dict(task, hours=6.5), dict(task, hours=6.0), dict(task, hours=True),
+    ])
+    result = import_file("tasks", path)
+    assert result.inserted == 1
+    assert reasons(result) == {1: "bad value for 'hours': 6.5", 3: "bad value for 'hours': True"}
+    assert [t.hours for t in services.list_tasks()] == [6]
+
+def test_missing_references_are_rejected(site, tmp_path):
+    path = tmp_path / "tasks.csv"
+    path.write_text(
+        "description,hours,status,log_id,worker_id\n"
+        f"Fine,2,done,{site.log_id},{site.worker_id}\n"
+        f"No log,2,done,999,{site.worker_id}\n"
+        f"No worker,2,done,{site.log_id},999\n"
+        f"Neither,2,done,998,997\n",
+        encoding="utf-8",
+    )
+    result = import_file("tasks", path)
+    assert result.inserted == 1
+    assert reasons(result) == {
+        3: "log_id 999 does not exist",
+        4: "worker_id 999 does not exist",
+        5: "log_id 998 does not exist, worker_id 997 does not exist",
+    }
+
+def test_a_failed_import_exits_non_zero(database, tmp_path):
+    path = tmp_path / "workers.csv"
+    path.write_bytes(b"name,trade,contact\n\xff\xfe,x,1\n")  # not UTF-8
+    result = CliRunner().invoke(cli, ["import", "workers", str(path)])
+    assert result.exit_code == 1
+    assert "Import failed" in result.output
+
+def test_rejected_rows_do_not_fail_the_command(site, tmp_path):
+    path = write_jsonl(tmp_path / "workers.jsonl", [
+        {"id": site.worker_id, "name": "Existing id", "trade": "x", "contact": "1"},
+        {"name": "New", "trade": "x", "contact": "1"},
+    ])
+    result = CliRunner().invoke(cli, ["import", "workers", str(path)])
+    assert result.exit_code == 0
+    assert "Imported 1 workers" in result.output
+    assert f"line 1: id {site.worker_id} already exists" in result.output
@@ -0,0 +1,22 @@
+import pytest
+from sqlalchemy import text
+
+from sitelog import db
+
+
+@pytest.fixture
+def checks(database):
+    db.get_engine()  # builds the schema
+    return {name: (index, plan, used) for name, index, plan, used in db.check_indexes()}
+
+
+@pytest.mark.parametrize("lookup", list(db.INDEX_CHECKS))
+def test_lookup_uses_its_index(checks, lookup):
+    index, plan, used = checks[lookup]
+    assert used, f"{lookup} does not use {index}: {plan}"
+
+def test_a_dropped_index_is_reported(checks):
+    with db.get_engine().begin() as conn:
+        conn.execute(text("DROP INDEX ix_tasks_log_id"))
+    used = {name: used for name, _, _, used in db.check_indexes()}
+    assert not used["tasks of a log"]
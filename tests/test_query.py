@@ -0,0 +1,76 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from sitelog import async_services, records, services
+from sitelog.archive import archive_project
+
+CASES = [
+    {},
+    {"where": {"status": "pending"}},
+    {"where": {"status": ["pending", "completed"], "hours": None}},
+    {"project_id": "tower"},
+    {"project_id": "depot", "start": date(2024, 5, 2)},
+    {"start": date(2024, 5, 2), "end": date(2024, 5, 3)},
+    {"where": {"status": "pending"}, "project_id": "tower", "end": date(2024, 5, 2)},
+    {"after": "third"},
+    {"after": "third", "project_id": "depot", "limit": 3},
+    {"limit": 4},
+]
+
+
+@pytest.fixture
+def tasks(site):
+    """Tasks over two projects and three days: (ids by position, {"tower": id, "depot": id})."""
+    depot = services.create_project("Depot", "York", date(2024, 1, 1), date(2024, 12, 31)).id
+    projects = {"tower": site.project_id, "depot": depot}
+    ids = []
+    for day in (1, 2, 3):
+        for project_id in projects.values():
+            log = services.create_daily_log(date(2024, 5, day), "dry", "work", project_id).id
+            for status, hours in (("pending", 2), ("completed", None), ("in progress", 3)):
+                ids.append(services.create_task("t", hours, status, log, site.worker_id).id)
+    return ids, projects
+
+def resolve(case, tasks):
+    ids, projects = tasks
+    kwargs = dict(case)
+    if "project_id" in kwargs:
+        kwargs["project_id"] = projects[kwargs["project_id"]]
+    if kwargs.get("after") == "third":
+        kwargs["after"] = ids[2]
+    return kwargs
+
+def listings(**kwargs):
+    """Task ids from each implementation of list_tasks, by name."""
+    async def from_async():
+        try:
+            return await async_services.list_tasks(**kwargs)
+        finally:
+            await async_services.dispose()
+
+    return {
+        "services": [t.id for t in services.list_tasks(**kwargs)],
+        "paged": [t.id for t in services.iter_tasks(chunk_size=2, **kwargs)],
+        "records": [t.id for t in records.list_tasks(**kwargs)],
+        "async": [t.id for t in asyncio.run(from_async())],
+    }
+
+
+@pytest.mark.parametrize("case", CASES, ids=repr)
+def test_sync_async_and_records_agree(tasks, case):
+    kwargs = resolve(case, tasks)
+    results = listings(**kwargs)
+    assert results["services"]
+    assert all(ids == results["services"] for ids in results.values()), results
+
+@pytest.mark.parametrize("case", CASES, ids=repr)
+def test_they_agree_through_the_archive(tasks, case):
+    _, projects = tasks
+    archive_project(projects["depot"])
+    assert services.list_tasks(project_id=projects["depot"]) == []
+    kwargs = resolve(case, tasks)
+    results = listings(include_archive=True, **kwargs)
+    assert results["services"]
+    assert all(ids == results["services"] for ids in results.values()), results
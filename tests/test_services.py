@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+from sitelog import services
+
+
+def test_unit_of_work_rolls_back_every_write(site):
+    with pytest.raises(RuntimeError):
+        with services.unit_of_work():
+            log = services.create_daily_log(date(2024, 5, 15), "wet", "rebar", site.project_id)
+            services.create_task("Tie rebar", 4, "pending", log.id, site.worker_id)
+            services.update_project(site.project_id, name="Renamed")
+            raise RuntimeError("give up")
+    assert [log.id for log in services.list_daily_logs()] == [site.log_id]
+    assert services.list_tasks() == []
+    assert services.get_project(site.project_id).name == "Tower"
+
+def test_nested_unit_of_work_joins_the_outer_one(site):
+    with pytest.raises(RuntimeError):
+        with services.unit_of_work() as outer:
+            services.create_task("Outer", 1, "pending", site.log_id, site.worker_id)
+            with services.unit_of_work() as inner:
+                assert inner is outer
+                services.create_task("Inner", 1, "pending", site.log_id, site.worker_id)
+            # The inner block ending committed nothing
+            assert services.current_unit_of_work() is outer
+            raise RuntimeError("give up")
+    assert services.list_tasks() == []
+
+def test_unit_of_work_commits_once_at_the_end(site):
+    with services.unit_of_work():
+        log = services.create_daily_log(date(2024, 5, 15), "wet", "rebar", site.project_id)
+        with services.unit_of_work():
+            services.create_task("Tie rebar", 4, "pending", log.id, site.worker_id)
+    assert [t.description for t in services.list_tasks()] == ["Tie rebar"]
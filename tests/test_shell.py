@@ -0,0 +1,40 @@
+import pytest
+from click.testing import CliRunner
+
+from sitelog import services
+from sitelog.cli import cli
+from sitelog.shell import ScriptError, run_script
+
+ADD_PROJECT = "add-project --name Depot --location York --start-date 2024-01-01 --end-date 2024-12-31"
+
+
+def run(tmp_path, *lines):
+    path = tmp_path / "script.sitelog"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return CliRunner().invoke(cli, ["shell", str(path)])
+
+def project_names():
+    return [project.name for project in services.list_projects()]
+
+
+def test_a_script_commits_every_line(site, tmp_path):
+    result = run(tmp_path, "# two writes", ADD_PROJECT, "", ADD_PROJECT.replace("Depot", "Yard"))
+    assert result.exit_code == 0, result.output
+    assert "Ran 2 commands in one transaction" in result.output
+    assert project_names() == ["Tower", "Depot", "Yard"]
+
+@pytest.mark.parametrize("second", [
+    "add-task --description Pour --hours 2 --status done --log-id 999 --worker-id 1",  # no such log
+    "add-worker --name Ben --colour red",  # usage error
+])
+def test_a_failing_line_rolls_back_the_lines_before_it(site, tmp_path, second):
+    result = run(tmp_path, ADD_PROJECT, second)
+    assert result.exit_code == 1
+    assert "line 2" in result.output
+    assert "nothing from the script was saved" in result.output
+    assert project_names() == ["Tower"]
+
+def test_commands_with_their_own_transactions_are_refused(site):
+    with pytest.raises(ScriptError, match="can't run inside a script's transaction"):
+        run_script(cli, "<test>", [ADD_PROJECT, "stats rebuild"])
+    assert project_names() == ["Tower"]
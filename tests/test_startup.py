@@ -0,0 +1,43 @@
+"""
+Cold start of the CLI. The budgets are shared with benchmarks/run.py, which
+reports the same timings at scale.
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cold start of a fresh process, in seconds. --help must not load SQLAlchemy
+# at all; a one-row listing pays for SQLAlchemy and the schema version check.
+STARTUP_BUDGETS = {
+    "help": 0.5,
+    "show-projects --limit 1": 1.5,
+}
+
+# Modules only some commands need, which importing the CLI must not load
+LAZY_MODULES = ["sqlalchemy", "sqlalchemy.orm", "sitelog.db", "sitelog.analytics", "aiosqlite"]
+
+TRIES = 3
+
+
+def test_importing_the_cli_loads_no_heavy_modules():
+    code = f"import sys, sitelog.cli; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert loaded.stdout.split() == []
+
+@pytest.mark.parametrize("name", STARTUP_BUDGETS)
+def test_startup_is_within_budget(database, name):
+    env = dict(os.environ, SITELOG_DB_URL=f"sqlite:///{database / 'startup.db'}")
+    args = ["--help"] if name == "help" else name.split()
+    timings = []
+    for _ in range(TRIES):  # the first run also creates the schema
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", *args], cwd=ROOT, env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    assert min(timings) <= STARTUP_BUDGETS[name]
@@ -0,0 +1,65 @@
+from collections import defaultdict
+from datetime import date
+
+from click.testing import CliRunner
+from sqlalchemy import select, text
+
+from sitelog import services
+from sitelog.cli import cli
+from sitelog.models import ProjectDayStat
+from sitelog.stats import check_stats
+
+
+def stored():
+    with services.session_scope() as session:
+        return {(s.project_id, s.day): (s.tasks, s.completed, s.pending, s.hours)
+                for s in session.scalars(select(ProjectDayStat))}
+
+def recomputed():
+    """The summary worked out in Python from the tasks and their logs."""
+    logs = {log.id: log for log in services.list_daily_logs()}
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for task in services.list_tasks():
+        log = logs[task.log_id]
+        row = totals[log.project_id, log.date]
+        row[0] += 1
+        row[1] += task.status == "completed"
+        row[2] += task.status == "pending"
+        row[3] += task.hours or 0
+    return {key: tuple(row) for key, row in totals.items()}
+
+
+def test_triggers_keep_the_stats_current(site):
+    other = services.create_project("Depot", "York", date(2024, 1, 1), date(2024, 12, 31)).id
+    day1, day2 = date(2024, 5, 14), date(2024, 5, 15)
+    log2 = services.create_daily_log(day2, "wet", "rebar", site.project_id).id
+    log3 = services.create_daily_log(day1, "dry", "yard", other).id
+    task = lambda status, hours, log_id: services.create_task("t", hours, status, log_id, site.worker_id).id
+    a = task("completed", 4, site.log_id)
+    b = task("pending", 3, site.log_id)
+    c = task("in progress", 2, log2)
+    d = task("pending", 5, log3)
+    assert stored() == recomputed()
+
+    services.update_task(a, status="pending", hours=6)
+    services.update_task(b, log_id=log3)  # moves to another project
+    services.update_task(c, log_id=site.log_id)  # empties day 2
+    services.delete_task(d)
+    assert stored() == recomputed()
+    assert (site.project_id, day2) not in stored()
+
+    services.update_daily_log(log3, date=day2, project_id=site.project_id)
+    assert stored() == recomputed()
+    services.delete_daily_log(site.log_id)  # cascades to its tasks
+    assert stored() == recomputed()
+    with services.session_scope() as session:
+        assert check_stats(session) == []
+
+def test_stats_check_reports_drift(site):
+    services.create_task("t", 4, "completed", site.log_id, site.worker_id)
+    assert CliRunner().invoke(cli, ["stats", "check"]).exit_code == 0
+    with services.session_scope() as session:
+        session.execute(text("UPDATE project_day_stats SET hours = hours + 1"))
+    result = CliRunner().invoke(cli, ["stats", "check"])
+    assert result.exit_code == 1
+    assert "2 mismatched rows" in result.output  # the stored row and the recomputed one
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from sitelog import services
+from sitelog.writer import Writer
+
+WAIT = 5  # seconds to wait for a future
+
+
+class Fatal(BaseException):
+    pass
+
+def fatal():
+    raise Fatal("pulled the plug")
+
+
+@pytest.fixture
+def writer(site):
+    # Long enough for every write a test submits to land in one group
+    writer = Writer(max_delay=0.5).start()
+    yield writer
+    writer.stop()
+
+
+def test_writes_are_committed_as_one_group(site, writer):
+    futures = [writer.create_task(f"task {i}", 2, "pending", site.log_id, site.worker_id) for i in range(20)]
+    ids = [future.result(WAIT) for future in futures]
+    assert writer.info() == {"commits": 1, "writes": 20, "queued": 0}
+    assert sorted(ids) == sorted(task.id for task in services.list_tasks())
+
+def test_a_failing_write_does_not_sink_its_group(site, writer):
+    first = writer.create_task("Pour", 2, "pending", site.log_id, site.worker_id)
+    bad = writer.create_task("Nowhere", 2, "pending", 999, site.worker_id)
+    last = writer.update_task(999, status="done")
+    other = writer.create_worker("Ben", "joiner", "555-0101")
+    assert last.result(WAIT) is None
+    with pytest.raises(IntegrityError):
+        bad.result(WAIT)
+    assert services.get_task(first.result(WAIT)).description == "Pour"
+    assert services.get_worker(other.result(WAIT)).name == "Ben"
+    assert writer.info()["commits"] == 1
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_a_dying_thread_fails_its_outstanding_writes(site, writer):
+    futures = [writer.create_task("Pour", 2, "pending", site.log_id, site.worker_id),
+               writer.submit(fatal),
+               writer.create_worker("Ben", "joiner", "555-0101")]
+    for future in futures:
+        error = future.exception(WAIT)
+        assert isinstance(error, RuntimeError)
+        assert isinstance(error.__cause__, Fatal)
+    with pytest.raises(RuntimeError):
+        writer.create_worker("Cy", "roofer", "555-0102")
+    assert services.list_tasks() == []
+    assert [w.name for w in services.list_workers()] == ["Ana"]